@@ -2,7 +2,9 @@
 Scrapes the data required for my Analysis of UK School Performance project
 
 Scrapes the parliamentary constituencies from wikipedia [1] and stores them 
-in the .txt file 'uk_parliamentary_constituencies.txt'. 
+in the .txt file 'uk_parliamentary_constituencies.txt'. Only the section 
+of the article listing the constituencies in England is requested, through
+the MediaWiki parse endpoint, unless it is unavailable.
 
 Aquires the following data for all primary schools in the UK:
     - school name
@@ -55,13 +57,129 @@ Creates the file 'uk_primary_school_data.csv'. If the file already exists,
 it will output a message saying that the file already exists before 
 rewriting the file. 
 
+The local authority and England averages are the same for many schools, 
+so they are written once to the files 'uk_local_authority_averages.csv'
+and 'uk_england_averages.csv' rather than for every school. They can be
+joined back to the schools with 'load_all_school_data()'.
+
 TODO: Take into account additional measures
 TODO: Take into account results by pupil characteristics 
 
 Parameters
 ----------
-user_agent : str
-    The user agent to be used when making html requests.
+stage : str
+    The stage to be run. One of 'constituencies', 'identification' or 
+    'schools'. Each stage reuses the files created by the stages before
+    it, and runs them if the files do not exist.
+--user-agent : str, optional
+    The user agent to be used when making html requests. Defaults to the
+    contents of the file 'user_agent.txt' in the cache directory.
+--workers : int, optional
+    The number of joblib workers. Defaults to -2.
+--adaptive-concurrency : int, optional
+    Makes requests from threads and adjusts the number in flight, up to
+    the given maximum, using an AIMD controller driven by the observed 
+    latency, timeouts and 429/5xx responses.
+--rate-limit : float, optional
+    The maximum number of requests per second across all workers.
+--http-backend : str, optional
+    The HTTP client used to make requests. One of 'requests', which 
+    opens a HTTP/1.1 connection for every request, or 'http2', which 
+    multiplexes the requests of every thread of a worker over a few 
+    HTTP/2 connections and requires the packages 'httpx' and 'h2'. 
+    Defaults to 'requests'.
+--hedge-percentile : float, optional
+    Sends a duplicate of any request still running after the given 
+    percentile of the recent request latencies, keeping whichever 
+    response arrives first.
+--hedge-budget : float, optional
+    The largest proportion of requests that may be hedged. Defaults to
+    0.05.
+--cache-dir : str, optional
+    The directory used to store intermediate data files. Defaults to
+    'data'.
+--output-dir : str, optional
+    The directory the final data set is written to. Defaults to the cache
+    directory.
+--dry-run
+    Prints the number of requests the run will make and its estimated 
+    duration without making any requests.
+re-extract stage : str
+    Reruns the parsers of the given stage on the raw HTML archive, using 
+    every CPU and making no requests. Every fetched page is appended to 
+    the archive in the directory 'html_archive' in the cache directory.
+    Pages whose download stopped after the table that was needed are 
+    marked as truncated, and are only re-extracted by the same parser.
+    Pages that are not in the archive are recorded as unfinished work.
+--no-archive
+    Does not write fetched pages to the raw HTML archive.
+crawl action [stage] : str
+    Runs a stage as a sharded crawl. 'init' shards the work by the 
+    consistent hash of each URN or constituency into a queue, 'work' runs
+    a worker in each joblib worker process, which can be done on any 
+    number of hosts sharing the queue, and 'merge' writes the results.
+    The shards of dead workers are leased again when their lease expires.
+--no-database
+    Does not write the scraped data to the SQLite database 
+    'uk_school_data.sqlite' in the cache directory, which can be queried
+    with 'query_schools()'.
+--no-parse-memo
+    Parses every page. By default, the records extracted from each page 
+    are memoised in 'parse_memo.sqlite' in the cache directory by the 
+    hash of the page and the version of the extractor, so pages whose 
+    content has not changed, e.g. when re-extracting, are not parsed 
+    again.
+--parse-memo-size : float, optional
+    The largest size of the parse memo in megabytes, beyond which the 
+    least recently used records are evicted. Defaults to 64.
+--no-negative-cache
+    Requests every school page. By default, the URN, page and academic 
+    year of every school page found to have no data, e.g. of a closed 
+    school or one whose data is suppressed, are recorded in 
+    'negative_cache.sqlite' in the cache directory, and the page is not
+    requested again until the recheck interval has passed or the 
+    extractor of the page is changed.
+--negative-cache-recheck DAYS
+    The number of days after which a school page known to have no data
+    is requested again. Defaults to 30.
+--connect-timeout SECONDS, --read-timeout SECONDS
+    The longest time to wait for a connection, and for each read of a 
+    response. Default to 10 and 30 seconds. Every timeout is appended to
+    'fetch_timeouts.jsonl' in the cache directory and the timeouts of 
+    each endpoint are printed at the end of the run.
+--task-deadline SECONDS, --deadline SECONDS
+    The longest time each batch of work, and the whole run, may take. 
+    The constituencies or schools not obtained in time, or whose requests 
+    timed out, are recorded in 'unfinished_work.jsonl' in the cache 
+    directory rather than holding up the run.
+identification --unfinished, schools --unfinished
+    Only obtains the work recorded as unfinished by earlier runs and adds
+    it to the output of the stage.
+--result-transfer {arrow,pickle}
+    How the worker processes pass the data they scraped back. 'arrow', 
+    the default, writes each large batch to an Arrow file in the 
+    directory 'result_batches' in the cache directory, which is 
+    memory-mapped and concatenated without copying. 'pickle' returns it 
+    through joblib. The work is run in batches of 10 constituencies or 
+    schools, so that the streaming aggregates are updated and failures 
+    lose little work, and such small batches are pickled faster than 
+    they are converted to Arrow. The results of both the identification 
+    and schools stages are therefore always pickled; only results of at
+    least 'RESULT_BATCH_SPILL_MINIMUM_SIZE' values are written to Arrow 
+    files.
+schools --sample FRACTION [--sample-seed SEED]
+    Obtains the data for a stratified sample of the given fraction of the
+    schools in each parliamentary constituency and type of school, and 
+    writes it with a 'sampling_weight' column to 
+    'uk_primary_school_sample.csv'. The sample is the same for the same 
+    seed, and rerunning with a larger fraction only fetches the schools 
+    added to the sample.
+summary
+    Prints the count, mean, standard deviation and quantiles of every 
+    school measure, and the covariance of the percentage of EAL students
+    with each progress score, from the streaming aggregates checkpointed
+    to the directory 'streaming_aggregates' in the cache directory. Can 
+    be run while the 'schools' stage or a crawl of it is in progress.
 
 Notes
 -----
@@ -70,7 +188,13 @@ https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/User-Agent [2].
 
 Examples
 --------
->>> python DataAquisition.py "Mozilla/5.0 (Windows NT 6.1; Win64; x64; rv:47.0) Gecko/20100101 Firefox/47.0"
+>>> python DataAcquisition.py schools --dry-run --workers 8 --rate-limit 5
+>>> python DataAcquisition.py re-extract identification
+>>> python DataAcquisition.py schools --sample 0.1
+>>> python DataAcquisition.py schools --deadline 36000 --task-deadline 600
+>>> python DataAcquisition.py schools --unfinished
+>>> python DataAcquisition.py summary
+>>> python DataAcquisition.py schools --user-agent "Mozilla/5.0 (Windows NT 6.1; Win64; x64; rv:47.0) Gecko/20100101 Firefox/47.0"
 
 References
 ----------
@@ -89,466 +213,6501 @@ References
     
 """
 
-from typing import List, Tuple
-from bs4 import BeautifulSoup
-import requests
+from __future__ import annotations
+
+from typing import Callable, Iterator, List, Tuple, TYPE_CHECKING
+from contextlib import closing, contextmanager
 import os
-import pandas as pd
-from joblib import Parallel, delayed
+import sys
+import threading
+import time
 
-def get_user_agent() -> str:
-    """
-    Returns the user agent to be used when making html requests. 
+# pandas, bs4, requests and joblib take most of a second to import, so 
+# they are imported inside the functions that use them. This keeps the 
+# command line utilities and the start up of the joblib workers fast.
+if TYPE_CHECKING:
+    import argparse
+    import concurrent.futures
+    import sqlite3
+    import httpx
+    import pandas as pd
+    import requests
+    from bs4 import BeautifulSoup
 
-    Reads the user agent from the file 'user_agent.txt' and returns it.
-    If the file 'user_agent.txt' does not exist, then a FileNotFoundError
-    is raised.
+CACHE_DIRECTORY_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_CACHE_DIRECTORY'
+OUTPUT_DIRECTORY_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_OUTPUT_DIRECTORY'
+N_JOBS_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_N_JOBS'
+RATE_LIMIT_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_RATE_LIMIT'
+USER_AGENT_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_USER_AGENT'
+ARCHIVE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_ARCHIVE'
+OFFLINE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_OFFLINE'
+DATABASE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_DATABASE'
+ADAPTIVE_CONCURRENCY_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_ADAPTIVE_CONCURRENCY'
+HEDGE_PERCENTILE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_HEDGE_PERCENTILE'
+HEDGE_BUDGET_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_HEDGE_BUDGET'
+HTTP_BACKEND_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_HTTP_BACKEND'
+PARSE_MEMO_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_PARSE_MEMO'
+PARSE_MEMO_SIZE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_PARSE_MEMO_SIZE'
+RESULT_TRANSFER_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_RESULT_TRANSFER'
+CONNECT_TIMEOUT_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_CONNECT_TIMEOUT'
+READ_TIMEOUT_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_READ_TIMEOUT'
+TASK_DEADLINE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_TASK_DEADLINE'
+RUN_DEADLINE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_RUN_DEADLINE'
+NEGATIVE_CACHE_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_NEGATIVE_CACHE'
+NEGATIVE_CACHE_RECHECK_ENVIRONMENT_VARIABLE = 'UK_SCHOOL_NEGATIVE_CACHE_RECHECK'
 
-    Returns
-    -------
-    user_agent : str
-        The user agent to be used when making html requests.
-    """
+DEFAULT_CACHE_DIRECTORY = 'data'
+DEFAULT_N_JOBS = -2
 
-    try:
-        with open('data/user_agent.txt', 'r') as file:
-            user_agent = file.read()
-    except FileNotFoundError:
-        raise FileNotFoundError("The file 'user_agent.txt' does not exist. Please create a file 'user_agent.txt' in the 'data' directory and enter your user agent.")
+STAGES = ('constituencies', 'identification', 'schools')
 
-    return user_agent
+# The first line of every cache file. Increase CACHE_FILE_VERSION whenever
+# the contents of a cache file are changed, so that the files written 
+# before are created again.
+CACHE_FILE_HEADER_PREFIX = '# uk-school-cache '
+CACHE_FILE_VERSION = 1
 
-def read_parliamentary_constituencies() -> List[str]:
-    """
-    Returns a list of all the parliamentary constituencies in the UK. 
+# The revision of the constituency article in reference [1], and the 
+# MediaWiki parse endpoint rendering only its section 4 ('England'), 
+# which holds the table 'table#England'
+PARLIAMENTARY_DATA_URL = "https://en.wikipedia.org/w/index.php?title=Constituencies_of_the_Parliament_of_the_United_Kingdom&oldid=1204196556"
+PARLIAMENTARY_DATA_SECTION_URL = "https://en.wikipedia.org/w/api.php?action=parse&oldid=1204196556&section=4&prop=text&disableeditsection=1&disablelimitreport=1&format=json&formatversion=2"
 
-    This function is only called if the file 
-    'uk_parliamentary_constituencies.txt' exists. It reads the file 
-    'uk_parliamentary_constituencies.txt' and returns a list of all the 
-    parliamentary constituencies contained within the file. 
+# Used by the dry run when the number of constituencies or schools is not
+# yet known because the corresponding file has not been created.
+ESTIMATED_NUMBER_OF_CONSTITUENCIES = 543
+ESTIMATED_NUMBER_OF_SCHOOLS = 16000
+ESTIMATED_REQUEST_LATENCY = 1.0
 
-    Returns
-    -------
-    uk_parliamentary_constituencies() : List[str]
-        A list of all the parliamentary constituencies in the UK.
-    """
+ARCHIVE_DIRECTORY_NAME = 'html_archive'
+ARROW_DATA_FILE_NAME = 'uk_primary_school_data.arrow'
+DATABASE_FILE_NAME = 'uk_school_data.sqlite'
+CRAWL_QUEUE_FILE_NAME = 'crawl_queue.sqlite'
+PARSE_MEMO_FILE_NAME = 'parse_memo.sqlite'
+RESULT_BATCHES_DIRECTORY_NAME = 'result_batches'
+TIMEOUTS_FILE_NAME = 'fetch_timeouts.jsonl'
+UNFINISHED_WORK_FILE_NAME = 'unfinished_work.jsonl'
+NEGATIVE_CACHE_FILE_NAME = 'negative_cache.sqlite'
 
-    with open('data/uk_parliamentary_constituencies.txt', 'r') as file:
-        uk_parliamentary_constituencies = file.readlines() 
+# The largest size of the parse memo in megabytes. Increase 
+# EXTRACTOR_VERSION whenever the code of an extractor in PAGE_EXTRACTORS
+# is changed, so that the records it memoised are not used.
+DEFAULT_PARSE_MEMO_SIZE = 64
+EXTRACTOR_VERSION = 2
 
-    uk_parliamentary_constituencies = [constituency.strip('\n') for constituency in uk_parliamentary_constituencies]
-    
-    return uk_parliamentary_constituencies
+# The number of parse memo hits whose last use and count are kept in 
+# memory before they are written to the memo
+PARSE_MEMO_HIT_BATCH_SIZE = 256
 
-def scrape_parliamentary_constituencies() -> List[str]:
-    """
-    Returns a list of all the parliamentary constituencies in the UK. 
+DEFAULT_NUMBER_OF_SHARDS = 64
+DEFAULT_LEASE_DURATION = 600.0
+HASH_RING_VIRTUAL_NODES = 64
 
-    This function is only called if the file 
-    'uk_parliamentary_constituencies.txt' does not exists. It scrapes 
-    wikipedia to obtain and return a list of all the parliamentary 
-    constituencies in the UK and creates the file 
-    'uk_parliamentary_constituencies.txt'. 
+DEFAULT_HEDGE_BUDGET = 0.05
+MAXIMUM_HEDGE_THREADS = 32
 
-    Returns
-    -------
-    uk_parliamentary_constituencies : List[str]
-        A list of all the parliamentary constituencies in the UK.
-    """
+STREAM_CHUNK_SIZE = 16384
 
-    PARLIAMENTARY_DATA_URL = "https://en.wikipedia.org/w/index.php?title=Constituencies_of_the_Parliament_of_the_United_Kingdom&oldid=1204196556"
+# The longest time in seconds to wait for a connection to be made, and 
+# for each read of the response once it has been made
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
 
-    soup = get_soup(PARLIAMENTARY_DATA_URL)
+HTTP_BACKENDS = ('requests', 'http2')
+HTTP2_MAXIMUM_CONNECTIONS = 4
 
-    rows = soup.select("table#England tr")
+RESULT_TRANSFERS = ('arrow', 'pickle')
 
-    uk_parliamentary_constituencies = []
+# The number of days after which a school page known to have no data is
+# requested again, and the false positive rate of the Bloom filter in 
+# front of the negative cache
+DEFAULT_NEGATIVE_CACHE_RECHECK = 30.0
+NEGATIVE_CACHE_FALSE_POSITIVE_RATE = 0.01
+NEGATIVE_CACHE_MINIMUM_CAPACITY = 1024
 
-    for row in rows[1:]:
-        cells = row.select("td")
-        constituency = cells[0].text.strip()
-        uk_parliamentary_constituencies.append(constituency)
+# The values shown on the school pages in place of data that is 
+# suppressed, not published, not applicable, has no entries or has low 
+# coverage. A page whose per-school fields only have these values has no
+# data, while a page with none of its fields may only have changed layout.
+NO_DATA_VALUES = frozenset(('SUPP', 'NP', 'NA', 'NE', 'LOWCOV'))
 
-    with open('data/uk_parliamentary_constituencies.txt', 'w') as file:
-        for constituency in uk_parliamentary_constituencies:
-            file.write(constituency + '\n')
+# The status codes of the responses whose pages may be recorded as having
+# no data, and of those whose pages do not exist and so have no data. The
+# pages of other responses, such as 429 or 5xx responses, are only empty 
+# for now.
+NEGATIVE_CACHE_STATUS_CODES = (200, 404, 410)
+MISSING_PAGE_STATUS_CODES = (404, 410)
 
-    return uk_parliamentary_constituencies
+# The smallest number of values (rows times columns) in a result which is 
+# spilled to an Arrow file. Converting a pd.DataFrame to Arrow and 
+# memory-mapping it costs about a millisecond per batch whatever its 
+# size, which the 'transfer' benchmark found to cost more of the parent's
+# time than pickling below about 250 schools of 30 columns. The scrapers'
+# batches of 10 constituencies or schools, about 1,200 and 300 values, 
+# are therefore always pickled.
+RESULT_BATCH_SPILL_MINIMUM_SIZE = 7500
 
-def get_parliamentary_constituencies() -> List[str]:
+# The academic year of the data on each school page, at the time of writing.
+SCHOOL_PRIMARY_ACADEMIC_YEAR = '2022/2023'
+SCHOOL_ABSENCE_AND_PUPIL_ACADEMIC_YEAR = '2021/2022'
+SCHOOL_DATASET_ACADEMIC_YEARS = {
+    'school_primary': SCHOOL_PRIMARY_ACADEMIC_YEAR,
+    'school_absence_and_pupil': SCHOOL_ABSENCE_AND_PUPIL_ACADEMIC_YEAR,
+}
+
+_last_request_time = 0.0
+_rate_limit_lock = threading.Lock()
+_concurrency_controller = None
+_hedging_policy = None
+_hedge_executor = None
+_http2_client = None
+_archive_index = None
+_archive_index_key = None
+_archive_lock = threading.Lock()
+_parse_memo_lock = threading.Lock()
+_parse_memo_connection = None
+_parse_memo_connection_key = None
+_parse_memo_pending_hits = {}
+_parse_memo_number_of_pending_hits = 0
+_task_deadline = threading.local()
+_last_status_code = threading.local()
+_negative_cache_lock = threading.Lock()
+_negative_cache_filter = None
+_negative_cache_filter_key = None
+_streaming_aggregates = None
+_streaming_aggregates_key = None
+_streaming_aggregates_lock = threading.Lock()
+
+def get_cache_directory() -> str:
     """
-    Returns a list of all the parliamentary constituencies in the UK. 
+    Returns the directory used to store intermediate data files.
 
-    First checks if there exists a file called 
-    'uk_parliamentary_constituencies.txt' If such a file exists, it is 
-    calls the function 'read_parliamentary_constituencies(). If such a 
-    file does not exist, it calls the function
-    'scrape_parliamentary_constituencies()'.
+    The directory is read from the environment variable 
+    'UK_SCHOOL_CACHE_DIRECTORY' so that it is inherited by the joblib 
+    worker processes. If the variable is not set, 'data' is returned.
 
     Returns
     -------
-    uk_parliamentary_constituencies() : List[str]
-        A list of all the parliamentary constituencies in the UK.
+    cache_directory : str
+        The directory containing 'user_agent.txt' and the cached 
+        constituency and school identification files.
     """
 
-    with open('data/uk_parliamentary_constituencies.txt', 'a+') as file:
-        uk_parliamentary_constituencies = file.readlines()
-
-        if not uk_parliamentary_constituencies:
-            uk_parliamentary_constituencies = scrape_parliamentary_constituencies()
-        else:
-            uk_parliamentary_constituencies = read_parliamentary_constituencies()
-
-    return uk_parliamentary_constituencies
+    return os.environ.get(CACHE_DIRECTORY_ENVIRONMENT_VARIABLE, DEFAULT_CACHE_DIRECTORY)
 
-def read_school_identification_information() -> pd.DataFrame:
+def get_output_directory() -> str:
     """
-    Returns a pd.DataFrame containing the name and URN of all UK schools. 
+    Returns the directory that the final data set is written to.
 
-    This function is only called if the file 
-    'uk_school_identification_information.csv' exists. 
-    It returns the pd.DataFrame stored within the
-    'uk_school_identification_information.csv' file.
-    This pd.DataFrame contains the name and Unique Identification Number
-    (URN) for every school in the UK.
+    The directory is read from the environment variable 
+    'UK_SCHOOL_OUTPUT_DIRECTORY'. If the variable is not set, the cache
+    directory is returned.
 
     Returns
     -------
-    uk_school_identification_information : pd.DataFrame
-        A pd.DataFrame containing the name and URN of every UK school.
+    output_directory : str
+        The directory that 'uk_primary_school_data.csv' is written to.
     """
 
-    with open('data/uk_school_identification_information.csv', 'r') as file:
-        uk_school_identification_information = pd.read_csv(file, index_col=0)
-
-    return uk_school_identification_information
+    return os.environ.get(OUTPUT_DIRECTORY_ENVIRONMENT_VARIABLE, get_cache_directory())
 
-def scrape_school_identification_information() -> pd.DataFrame:
+def get_cache_path(file_name: str) -> str:
     """
-    Returns a pd.DataFrame containing the name and URN of all UK schools. 
+    Returns the path to the given file in the cache directory.
 
-    This function is only called if the file
-    'uk_school_identification_information.csv' does not exist. 
-    It scrapes the gov.uk website to obtain and return a pd.DataFrame 
-    containing the name and Unique Identification Number (URN) for every
-    school in the UK. It then saves this pd.DataFrame in the file 
-    'uk_school_identification_information.csv'.S
+    Parameters
+    ----------
+    file_name : str
+        The name of the file. 
 
     Returns
     -------
-    uk_school_identification_information : pd.DataFrame
-        A pd.DataFrame containing the name and URN of every UK school.
+    cache_path : str
+        The path to the file in the cache directory.
     """
 
-    parliamentary_constituencies = get_parliamentary_constituencies()
+    return os.path.join(get_cache_directory(), file_name)
 
-    parliamentary_constituency_subsets = [parliamentary_constituencies[i:i+10] for i in range(0, len(parliamentary_constituencies), 10)]
+def lock_file(file) -> None:
+    """
+    Takes an exclusive lock on an open file, waiting until it is released
+    by any other process or thread holding it.
 
-    school_identification_dataframes = Parallel(n_jobs=-2)(delayed(scrape_school_identification_information_subset_of_constituencies)(parliamentary_constituency_subset) for parliamentary_constituency_subset in parliamentary_constituency_subsets)
+    Uses fcntl.flock() on POSIX systems and msvcrt.locking() on Windows.
 
-    if school_identification_dataframes:
-        filtered_dataframes = [df for df in school_identification_dataframes if df is not None]
+    Parameters
+    ----------
+    file : file object
+        The file to be locked, opened for writing.
+    """
 
-    uk_school_identification_information = pd.concat(filtered_dataframes)
+    if os.name == 'nt':
+        import msvcrt
 
-    uk_school_identification_information.to_csv('data/uk_school_identification_information.csv')
+        file.seek(0)
 
-    uk_school_identification_information['school_urn'] = uk_school_identification_information['school_urn'].astype('int64')
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    else:
+        import fcntl
 
-    return uk_school_identification_information
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
 
-def scrape_school_identification_information_subset_of_constituencies(parliamentary_constituencies: list[str]) -> pd.DataFrame:
+def unlock_file(file) -> None:
     """
-    Returns a pd.DataFrame containing the name and URN of all primary schools in the given parliamentary constituencies.
-
-    Calls the scrape_single_parliamentary_constituency_school_identification_information() function for each parliamentary constituency
-    in the given list of parliamentary constituencies and concatenates the resulting pd.DataFrames to obtain a single pd.DataFrame 
-    containing the name and URN of every primary school in the given parliamentary constituencies.
+    Releases the lock taken on a file by 'lock_file()'.
 
     Parameters
     ----------
-    parliamentary_constituencies : list[str]
-        A list of the parliamentary constituencies whose data is to be obtained.
-
-    Returns
-    -------
-    parliamentary_constituency_school_identification_information : pd.DataFrame
-        A pd.DataFrame containing the name and URN of every primary school in the given parliamentary constituencies.
+    file : file object
+        The locked file.
     """
 
-    parliamentary_constituency_school_identification_information = pd.DataFrame()
+    if os.name == 'nt':
+        import msvcrt
 
-    for parliamentary_constituency in parliamentary_constituencies:
-        parliamentary_constituency_school_identification_information = pd.concat([parliamentary_constituency_school_identification_information, scrape_single_parliamentary_constituency_school_identification_information(parliamentary_constituency)])
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
 
-    return parliamentary_constituency_school_identification_information
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
 
-def get_single_parliamentary_constituency_url(parliamentary_constituency: str) -> str:
+@contextmanager
+def lock_cache_file(path: str) -> Iterator[None]:
     """
-    Returns the URL to the .gov Web page containing the list of primary schools in the specified parliamentary constituency.
+    Holds an exclusive lock on a cache file while the block runs.
+
+    The lock is taken on the file '<path>.lock' rather than on the cache 
+    file itself, since the cache file is replaced when it is written. It
+    is used by the 'get_*()' functions so that only one process or thread
+    creates a cache file, while the others wait and then read it.
 
     Parameters
     ----------
-    parliamentary_constituency : str
-        The name of the parliamentary constituency whose data is to be obtained. 
+    path : str
+        The path to the cache file.
+    """
 
-    Returns
-    -------
-    parliamentary_constituency_url : str
-        The url to the Web page containing the list of primary schools in the specified parliamentary constituency.
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    with open(f'{path}.lock', 'a+') as lock:
+        lock_file(lock)
+
+        try:
+            yield
+        finally:
+            unlock_file(lock)
 
+def write_cache_file(path: str, text: str) -> None:
     """
-    parliamentary_constituency_words = parliamentary_constituency.split()
-    formatted_parliamentary_constituency = '+'.join(parliamentary_constituency_words)
+    Writes a cache file atomically, with a checksum and version header.
 
-    parliamentary_constituency_url = f'https://www.compare-school-performance.service.gov.uk/schools-by-type?step=default&table=schools&parliamentary={formatted_parliamentary_constituency}&geographic=parliamentary&for=primary'
+    The first line of the file is 
+    '# uk-school-cache version=<CACHE_FILE_VERSION> sha256=<checksum>', 
+    where the checksum is that of the rest of the file. The file is 
+    written to a temporary file which then replaces the cache file, so 
+    readers see either the previous file or the whole new one.
 
-    return parliamentary_constituency_url
+    Parameters
+    ----------
+    path : str
+        The path to the cache file.
+    text : str
+        The contents of the cache file.
+    """
 
-def scrape_single_parliamentary_constituency_school_identification_information(parliamentary_constituency: str) -> pd.DataFrame:
+    import hashlib
+
+    content = text.encode('utf-8')
+    header = f"{CACHE_FILE_HEADER_PREFIX}version={CACHE_FILE_VERSION} sha256={hashlib.sha256(content).hexdigest()}\n".encode('utf-8')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    with open(temporary_path, 'wb') as file:
+        file.write(header + content)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary_path, path)
+
+def read_cache_file(path: str) -> str:
     """
-    Returns a pd.DataFrame containing the name and URN of all primary schools in the specified parliamentary constituency. 
+    Returns the contents of a cache file written by 'write_cache_file()'.
 
-    Scrapes the gov.uk website to obtain and return a pd.DataFrame containing the name and Unique Identification Number (URN) for every primary school in the specified parliamentary constituency.
+    Files without a header, written before cache files had one, are 
+    returned unchecked unless they are empty.
 
     Parameters
     ----------
-    parliamentary_constituency : str
-        The name of the parliamentary constituency whose data is to be obtained. 
+    path : str
+        The path to the cache file.
 
     Returns
     -------
-    parliamentary_constituency_school_identification_information : pd.DataFrame
-        A pd.DataFrame containing the name and URN of every primary school in the specified parliamentary constituency.
+    text : str
+        The contents of the cache file, without its header.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the cache file does not exist.
+    ValueError
+        If the cache file is empty, was written by another version or 
+        does not match its checksum.
     """
 
-    parliamentary_constituency_url = get_single_parliamentary_constituency_url(parliamentary_constituency)
+    import hashlib
 
-    soup = get_soup(parliamentary_constituency_url)
+    with open(path, 'rb') as file:
+        content = file.read()
 
-    rows = soup.select("table#establishment-list-view tbody tr")
+    if content.startswith(CACHE_FILE_HEADER_PREFIX.encode('utf-8')):
+        header, content = content.split(b'\n', 1) if b'\n' in content else (content, b'')
+        header_fields = dict(field.split('=', 1) for field in header.decode('utf-8')[len(CACHE_FILE_HEADER_PREFIX):].split())
 
-    school_names = []
-    school_urns = []
-    school_types = []
+        if header_fields.get('version') != str(CACHE_FILE_VERSION):
+            raise ValueError(f"The cache file '{path}' was written by version {header_fields.get('version')} rather than {CACHE_FILE_VERSION}.")
+        if header_fields.get('sha256') != hashlib.sha256(content).hexdigest():
+            raise ValueError(f"The cache file '{path}' does not match its checksum.")
+    elif not content:
+        raise ValueError(f"The cache file '{path}' is empty.")
 
-    for row in rows:
-        if len(row['class']) > 0:
-            continue
+    return content.decode('utf-8')
 
-        school_urn = row['data-urn']
-        school_name = row.select('th a')[0].text.strip()
-        school_type = row.select('td[data-title="Type of school"] span.value')[0].text.strip()
+def is_cache_file_valid(path: str) -> bool:
+    """
+    Returns whether a cache file exists and can be read by 
+    'read_cache_file()'.
+
+    Parameters
+    ----------
+    path : str
+        The path to the cache file.
 
-        school_urns.append(school_urn)
-        school_names.append(school_name)
-        school_types.append(school_type)
+    Returns
+    -------
+    cache_file_valid : bool
+        True if the cache file can be reused.
+    """
 
-    parliamentary_constituency_school_identification_information = pd.DataFrame({'school_name': school_names, 'school_urn': school_urns, 'type_of_school': school_types})
+    try:
+        read_cache_file(path)
+    except (FileNotFoundError, ValueError):
+        return False
 
-    return parliamentary_constituency_school_identification_information
+    return True
 
-def get_school_identification_information() -> pd.DataFrame:
+def get_n_jobs() -> int:
     """
-    Returns a pd.DataFrame containing the name and URN of all UK schools. 
+    Returns the number of joblib workers to use.
 
-    First checks if there exists a file called
-    'uk_school_identification_information.csv'. 
-    If such a file exists, it calls the function 
-    'read_school_identification_information()'.
-    If such a file does not exist, it calls the function
-    'scrape_school_identification_information()'
+    The number of workers is read from the environment variable 
+    'UK_SCHOOL_N_JOBS'. If the variable is not set, -2 is returned, which 
+    joblib interprets as all but one of the CPUs.
 
     Returns
     -------
-    uk_school_identification_information : pd.DataFrame
-        A pd.DataFrame containing the name and URN of every UK school.
+    n_jobs : int
+        The 'n_jobs' argument passed to joblib.
     """
 
-    if os.path.isfile('data/uk_school_identification_information.csv'):
-        uk_school_identification_information = read_school_identification_information()
-    else:
-        uk_school_identification_information = scrape_school_identification_information()
-
-    return uk_school_identification_information
+    return int(os.environ.get(N_JOBS_ENVIRONMENT_VARIABLE, DEFAULT_N_JOBS))
 
-def get_soup(url: str) -> BeautifulSoup:
+def get_number_of_workers() -> int:
     """
-    Returns a BeautifulSoup object representing 
-    the parsed webpage that was specified. 
+    Returns the number of worker processes that 'get_n_jobs()' represents.
 
-    Parameters
-    ----------
-    url : str
-        The url of the website which is to be parsed. 
+    Negative values of 'n_jobs' are converted in the same way as joblib,
+    so that -1 is every CPU and -2 is all but one of the CPUs.
 
     Returns
-    ------
-    soup : BeautifulSoup
-        The BeautifulSoup object representing the webpage to be parsed.
+    -------
+    number_of_workers : int
+        The number of worker processes making requests at the same time.
     """
 
-    user_agent = get_user_agent()
-    headers = {'User-Agent': user_agent}
+    n_jobs = get_n_jobs()
 
-    page = requests.get(url, headers=headers)
-    soup = BeautifulSoup(page.content, 'html.parser')
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
 
-    return soup
+    return max(n_jobs, 1)
 
-def get_single_school_primary_url(school_name: str, school_urn: str) -> str:
+def get_maximum_concurrency() -> int:
     """
-    Returns the URL to the school's primary page
-
-    Returns the URL to the Web page containing the school's primary 
-    results data. At the time of writing, this data is for pupils who
-    completed key stage 2 in the summer of 2023.
+    Returns the largest number of requests the adaptive concurrency 
+    controller may have in flight.
 
-    Parameters
-    ----------
-    school_name : str
-        The name of the school whose data is to be obtained. 
-    school_urn : str
-        The Unique Identification Number (URN) of the school whose data
-        is to be obtained.
+    The value is read from the environment variable 
+    'UK_SCHOOL_ADAPTIVE_CONCURRENCY'. If the variable is not set, adaptive
+    concurrency is disabled and 0 is returned.
 
     Returns
     -------
-    school_primary_url : str
-        The url to the Web page containing the school's primary results 
-        data. 
+    maximum_concurrency : int
+        The largest concurrency window, or 0 if adaptive concurrency is 
+        disabled.
     """
 
-    formatted_school_name = school_name.replace(' ', '-').replace(',', '%2c').lower()
+    return int(os.environ.get(ADAPTIVE_CONCURRENCY_ENVIRONMENT_VARIABLE, 0))
 
-    school_primary_url = f"https://www.compare-school-performance.service.gov.uk/school/{school_urn}/{formatted_school_name}/primary"
+def get_parallel_arguments() -> dict:
+    """
+    Returns the arguments to be passed to joblib's Parallel.
 
-    return school_primary_url
+    Without adaptive concurrency, the scrapers run in 'get_n_jobs()' 
+    worker processes, each making one request at a time. With adaptive 
+    concurrency, they run in one thread per request that may be in flight
+    so that a single concurrency controller sees every request, and the 
+    controller decides how many of them are in flight at once.
 
-def get_single_school_primary_data(school_name: str, school_urn: str) -> pd.DataFrame:
+    Returns
+    -------
+    parallel_arguments : dict
+        The keyword arguments for joblib's Parallel.
     """
-    Returns the results data for a given school
 
-    Scrapes the gov.uk website to obtain the required primary results data
-    for the specified school. Returns a pd.DataFrame containing the 
-    primary results data for the school.  At the time of writing, this 
-    data is for pupils who completed key stage 2 in the summer of 2023.
+    maximum_concurrency = get_maximum_concurrency()
 
-    Parameters
-    ----------
-    school_name : str
-        The name of the school whose data is to be obtained. 
-    school_urn : str
-        The Unique Identification Number (URN) of the school whose data
-        is to be obtained.
+    if maximum_concurrency > 0:
+        return {'n_jobs': maximum_concurrency, 'prefer': 'threads'}
+
+    return {'n_jobs': get_n_jobs()}
+
+def get_number_of_processes() -> int:
+    """
+    Returns the number of processes making requests at the same time.
 
     Returns
     -------
-    school_primary_data : pd.DataFrame
-        A pd.DataFrame containing the primary results data for the given 
-        school. 
+    number_of_processes : int
+        1 if adaptive concurrency is enabled, since every request is then 
+        made from threads in one process, and 'get_number_of_workers()' 
+        otherwise.
     """
 
-    return None
+    if get_maximum_concurrency() > 0:
+        return 1
 
-def get_single_school_absence_and_pupil_url(school_name: str, school_urn: str) -> str:
-    """
-    Returns the URL to the school's absence page
+    return get_number_of_workers()
 
-    Returns the URL to the Web page containing the school's absence and 
-    pupil population information. At the time of writing, this data is 
-    for the 2021/2022 school year.
+def get_result_transfer() -> str:
+    """
+    Returns how the scrapers' worker processes pass their results back.
 
-    Parameters
-    ----------
-    school_name : str
-        The name of the school whose data is to be obtained. 
-    school_urn : str
-        The Unique Identification Number (URN) of the school whose data
-        is to be obtained.
+    The transfer is read from the environment variable 
+    'UK_SCHOOL_RESULT_TRANSFER'. If the variable is not set, 'arrow' is 
+    used.
 
     Returns
     -------
-    school_primary_absence_and_pupil_url : str
-        The url to the Web page containing the school's absence and 
-        pupil population information.
+    result_transfer : str
+        'arrow' if the workers write their results to Arrow files which 
+        the parent memory-maps, as described in 
+        'run_and_spill_result_batch()', or 'pickle' if they are returned 
+        through joblib.
     """
 
-    formatted_school_name = school_name.replace(' ', '-').replace(',', '%2c').lower()
-
-    school_absence_and_pupil_url = f"https://www.compare-school-performance.service.gov.uk/school/{school_urn}/{formatted_school_name}/absence-and-pupil-population"
+    result_transfer = os.environ.get(RESULT_TRANSFER_ENVIRONMENT_VARIABLE, 'arrow')
 
-    return school_absence_and_pupil_url
+    if result_transfer not in RESULT_TRANSFERS:
+        raise ValueError(f"Unknown result transfer '{result_transfer}'. Expected one of {RESULT_TRANSFERS}.")
 
+    return result_transfer
 
-def get_single_school_absence_and_pupil_data(school_name: str, school_urn: str) -> pd.DataFrame: 
+def run_and_spill_result_batch(function, *arguments):
     """
-    Returns the population data for the school
+    Calls the given function in a worker and writes the pd.DataFrame it 
+    returns to an Arrow file in the directory 'result_batches' in the 
+    cache directory.
 
-    Scrapes the gov.uk website to obtain the required absence and pupil
-    population information for the specified school. Returns a 
-    pd.DataFrame containing the school's absence and pupil population 
-    information. At the time of writing, this data is for the 
-    2021/2022 school year.
+    joblib pickles the results of its worker processes, and the parent 
+    unpickles them before concatenating them, copying every result 
+    several times. Only the path to the Arrow file is returned instead, 
+    and 'collect_result_batches()' memory-maps the files, so the parent 
+    assembles the batches by reference and copies them once, when they 
+    are converted to a single pd.DataFrame.
+
+    The result is returned unchanged if it is not a pd.DataFrame, if it 
+    has fewer than 'RESULT_BATCH_SPILL_MINIMUM_SIZE' values, if the 
+    result transfer is 'pickle', if the scrapers run in threads, where 
+    nothing is pickled, if pyarrow is not installed or if the 
+    pd.DataFrame cannot be converted to Arrow, e.g. because a column 
+    mixes strings and numbers. The parse memo hits of the batch are 
+    written with 'write_parse_memo_hits()' once the function returns.
 
     Parameters
     ----------
-    school_name : str
-        The name of the school whose data is to be obtained. 
-    school_urn : str
-        The Unique Identification Number (URN) of the school whose data
-        is to be obtained.
+    function : callable
+        The function to be called, returning a pd.DataFrame or None.
+    *arguments
+        The arguments of the function.
 
     Returns
     -------
-    school_absence_and_pupil_data : pd.DataFrame
+    result_batch : str or pd.DataFrame or None
+        The path to the Arrow file, or the result of the function.
+    """
+
+    import pandas as pd
+
+    try:
+        result = function(*arguments)
+    finally:
+        write_parse_memo_hits()
+
+    if not isinstance(result, pd.DataFrame) or result.size < RESULT_BATCH_SPILL_MINIMUM_SIZE or get_result_transfer() != 'arrow' or 'prefer' in get_parallel_arguments():
+        return result
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return result
+
+    try:
+        table = pa.Table.from_pandas(result, preserve_index=True)
+    except pa.ArrowException:
+        return result
+
+    import uuid
+
+    result_batches_directory = get_cache_path(RESULT_BATCHES_DIRECTORY_NAME)
+    os.makedirs(result_batches_directory, exist_ok=True)
+
+    result_batch_path = os.path.join(result_batches_directory, f'{os.getpid()}-{uuid.uuid4().hex}.arrow')
+
+    with pa.OSFile(result_batch_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    return result_batch_path
+
+def collect_result_batches(result_batches: list) -> pd.DataFrame:
+    """
+    Returns the concatenation of the results of 'run_and_spill_result_batch()'.
+
+    The Arrow files are memory-mapped and concatenated without copying, 
+    and the concatenated table is converted to a pd.DataFrame once. The 
+    files are deleted once they have been read. The results are 
+    concatenated with pd.concat instead if any of them were returned as 
+    a pd.DataFrame, or if the Arrow types of the batches cannot be 
+    unified.
+
+    Parameters
+    ----------
+    result_batches : list
+        The paths to the Arrow files, pd.DataFrames or None returned by 
+        'run_and_spill_result_batch()', in order.
+
+    Returns
+    -------
+    result : pd.DataFrame
+        The concatenated results, or None if every result was None.
+    """
+
+    import pandas as pd
+
+    result_batches = [result_batch for result_batch in result_batches if result_batch is not None]
+    result_batch_paths = [result_batch for result_batch in result_batches if isinstance(result_batch, str)]
+
+    if not result_batches:
+        return None
+
+    if not result_batch_paths:
+        return pd.concat(result_batches)
+
+    import pyarrow as pa
+
+    tables = {}
+    for result_batch_path in result_batch_paths:
+        with pa.memory_map(result_batch_path, 'r') as source:
+            tables[result_batch_path] = pa.ipc.open_file(source).read_all()
+
+    result = None
+    if len(result_batch_paths) == len(result_batches):
+        try:
+            result = pa.concat_tables(list(tables.values()), promote_options='permissive').to_pandas()
+        except pa.ArrowException:
+            pass
+
+    if result is None:
+        result = pd.concat([tables[result_batch].to_pandas() if isinstance(result_batch, str) else result_batch for result_batch in result_batches])
+
+    del tables
+
+    for result_batch_path in result_batch_paths:
+        try:
+            os.remove(result_batch_path)
+        except OSError:
+            pass
+
+    return result
+
+def wait_for_rate_limit() -> None:
+    """
+    Sleeps until the next request is allowed by the rate limit.
+
+    The rate limit, in requests per second across all workers, is read 
+    from the environment variable 'UK_SCHOOL_RATE_LIMIT'. Each worker 
+    process is given an equal share of the rate limit, which the threads 
+    within a process share. If the variable is not set, requests are not
+    rate limited.
+    """
+
+    global _last_request_time
+
+    rate_limit = float(os.environ.get(RATE_LIMIT_ENVIRONMENT_VARIABLE, 0))
+
+    if rate_limit <= 0:
+        return
+
+    minimum_interval = get_number_of_processes() / rate_limit
+
+    with _rate_limit_lock:
+        request_time = max(time.monotonic(), _last_request_time + minimum_interval)
+        _last_request_time = request_time
+
+    waiting_time = request_time - time.monotonic()
+
+    if waiting_time > 0:
+        time.sleep(waiting_time)
+
+class ConcurrencyController:
+    """
+    Adjusts the number of requests in flight using AIMD.
+
+    The window, the number of requests allowed in flight, is increased 
+    additively while the 95th percentile of the recent latencies and the 
+    recent error rate are healthy, by roughly 1 for every window's worth 
+    of successful requests. It is cut multiplicatively when a request 
+    times out or the server responds with 429 or a 5xx status. Only one 
+    cut is made for the requests that were in flight at the time of a 
+    cut, so that a burst of failures does not collapse the window.
+
+    Attributes
+    ----------
+    window : float
+        The number of requests allowed in flight.
+    in_flight : int
+        The number of requests currently in flight.
+
+    Methods
+    -------
+    acquire(timeout=None)
+        Waits until a request may be made and returns its start time. 
+    release(start_time, overloaded, end_time=None)
+        Records the outcome of a request and adjusts the window.
+    get_metrics()
+        Returns the current window, in flight count, p95 latency and 
+        error rate.
+    """
+
+    def __init__(self, initial_window: float = 4, minimum_window: float = 1, maximum_window: float = 64, latency_target: float = 2.0, error_rate_target: float = 0.05, decrease_factor: float = 0.5, sample_size: int = 50):
+        """
+        Parameters
+        ----------
+        initial_window : float, optional
+            The window at the start of the crawl.
+        minimum_window : float, optional
+            The smallest window allowed.
+        maximum_window : float, optional
+            The largest window allowed.
+        latency_target : float, optional
+            The largest healthy 95th percentile latency in seconds.
+        error_rate_target : float, optional
+            The largest healthy proportion of overloaded responses.
+        decrease_factor : float, optional
+            The factor the window is multiplied by when it is cut.
+        sample_size : int, optional
+            The number of recent requests used for the latency percentile 
+            and the error rate.
+        """
+
+        from collections import deque
+
+        self.window = float(initial_window)
+        self.in_flight = 0
+
+        self._minimum_window = minimum_window
+        self._maximum_window = maximum_window
+        self._latency_target = latency_target
+        self._error_rate_target = error_rate_target
+        self._decrease_factor = decrease_factor
+
+        self._latencies = deque(maxlen=sample_size)
+        self._outcomes = deque(maxlen=sample_size)
+        self._last_decrease_time = float('-inf')
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float = None) -> float:
+        """
+        Waits until fewer requests than the window are in flight.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The longest time to wait in seconds. If not given, waits 
+            until a request may be made.
+
+        Returns
+        -------
+        start_time : float or None
+            The time.monotonic() time the request may start at, which is 
+            to be passed to 'release()', or None if the timeout expired.
+        """
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < int(self.window), timeout):
+                return None
+
+            self.in_flight += 1
+
+            return time.monotonic()
+
+    def release(self, start_time: float, overloaded: bool, end_time: float = None) -> None:
+        """
+        Records the outcome of a request and adjusts the window.
+
+        Parameters
+        ----------
+        start_time : float
+            The time returned by 'acquire()' for the request.
+        overloaded : bool
+            True if the request timed out or the server responded with 
+            429 or a 5xx status.
+        end_time : float, optional
+            The time.monotonic() time the request finished. Defaults to 
+            now.
+        """
+
+        if end_time is None:
+            end_time = time.monotonic()
+
+        with self._condition:
+            self.in_flight -= 1
+            self._latencies.append(end_time - start_time)
+            self._outcomes.append(overloaded)
+
+            if overloaded:
+                if start_time >= self._last_decrease_time:
+                    self.window = max(self._minimum_window, self.window * self._decrease_factor)
+                    self._last_decrease_time = end_time
+            elif self._is_healthy():
+                self.window = min(self._maximum_window, self.window + 1 / self.window)
+
+            self._condition.notify_all()
+
+    def _get_p95_latency(self) -> float:
+        """
+        Returns the 95th percentile of the recent latencies in seconds.
+        """
+
+        if not self._latencies:
+            return 0.0
+
+        latencies = sorted(self._latencies)
+
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def _get_error_rate(self) -> float:
+        """
+        Returns the proportion of recent requests that were overloaded.
+        """
+
+        if not self._outcomes:
+            return 0.0
+
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _is_healthy(self) -> bool:
+        """
+        Returns True if the recent latency and error rate are healthy.
+        """
+
+        return self._get_p95_latency() <= self._latency_target and self._get_error_rate() <= self._error_rate_target
+
+    def get_metrics(self) -> dict:
+        """
+        Returns the current state of the controller.
+
+        Returns
+        -------
+        metrics : dict
+            A dict containing the 'window', the number of requests 
+            'in_flight', the 'p95_latency' in seconds and the 
+            'error_rate'.
+        """
+
+        with self._condition:
+            return {'window': self.window, 'in_flight': self.in_flight, 'p95_latency': self._get_p95_latency(), 'error_rate': self._get_error_rate()}
+
+def get_concurrency_controller() -> ConcurrencyController:
+    """
+    Returns the concurrency controller shared by every thread of this 
+    process, or None if adaptive concurrency is disabled.
+
+    Returns
+    -------
+    concurrency_controller : ConcurrencyController or None
+        The process-wide concurrency controller.
+    """
+
+    global _concurrency_controller
+
+    maximum_concurrency = get_maximum_concurrency()
+
+    if maximum_concurrency <= 0:
+        return None
+
+    with _rate_limit_lock:
+        if _concurrency_controller is None:
+            _concurrency_controller = ConcurrencyController(initial_window=min(4, maximum_concurrency), maximum_window=maximum_concurrency)
+
+    return _concurrency_controller
+
+class HedgingPolicy:
+    """
+    Decides when a slow request is hedged with a duplicate request.
+
+    A request is hedged once it has run for longer than the given 
+    percentile of the recent request latencies. The number of hedges is 
+    bounded by the budget, a proportion of all requests, so that hedging 
+    never adds more than that proportion to the load on the server.
+
+    Attributes
+    ----------
+    number_of_requests : int
+        The number of requests made.
+    number_of_hedges : int
+        The number of duplicate requests sent.
+    number_of_hedge_wins : int
+        The number of requests whose duplicate responded first.
+
+    Methods
+    -------
+    get_hedge_delay()
+        Returns the time after which a request is hedged.
+    record_request()
+        Counts a request towards the hedge budget.
+    record_latency(latency)
+        Records the latency of a completed request.
+    try_hedge()
+        Returns True, and counts the hedge, if the budget allows a hedge.
+    record_hedge_win()
+        Counts a request whose duplicate responded first.
+    get_metrics()
+        Returns the number of requests and hedges and the hedge delay.
+    """
+
+    def __init__(self, percentile: float = 95, budget: float = DEFAULT_HEDGE_BUDGET, minimum_samples: int = 20, sample_size: int = 200):
+        """
+        Parameters
+        ----------
+        percentile : float, optional
+            The percentile of the recent latencies after which a request 
+            is hedged.
+        budget : float, optional
+            The largest proportion of requests that may be hedged.
+        minimum_samples : int, optional
+            The number of latencies recorded before any request is 
+            hedged.
+        sample_size : int, optional
+            The number of recent latencies used for the percentile.
+        """
+
+        from collections import deque
+
+        self.number_of_requests = 0
+        self.number_of_hedges = 0
+        self.number_of_hedge_wins = 0
+
+        self._percentile = percentile
+        self._budget = budget
+        self._minimum_samples = minimum_samples
+
+        self._latencies = deque(maxlen=sample_size)
+        self._lock = threading.Lock()
+
+    def get_hedge_delay(self) -> float:
+        """
+        Returns the time after which a request is hedged.
+
+        Returns
+        -------
+        hedge_delay : float or None
+            The percentile of the recent latencies in seconds, or None if
+            too few latencies have been recorded.
+        """
+
+        with self._lock:
+            if len(self._latencies) < self._minimum_samples:
+                return None
+
+            latencies = sorted(self._latencies)
+
+        return latencies[min(len(latencies) - 1, int(self._percentile / 100 * len(latencies)))]
+
+    def record_request(self) -> None:
+        """
+        Counts a request towards the hedge budget.
+        """
+
+        with self._lock:
+            self.number_of_requests += 1
+
+    def record_latency(self, latency: float) -> None:
+        """
+        Records the latency of a completed request.
+
+        Parameters
+        ----------
+        latency : float
+            The latency of the request in seconds.
+        """
+
+        with self._lock:
+            self._latencies.append(latency)
+
+    def try_hedge(self) -> bool:
+        """
+        Counts a hedge if it is within the budget.
+
+        Returns
+        -------
+        hedged : bool
+            True if the request may be hedged.
+        """
+
+        with self._lock:
+            if self.number_of_hedges + 1 > self._budget * self.number_of_requests:
+                return False
+
+            self.number_of_hedges += 1
+
+            return True
+
+    def record_hedge_win(self) -> None:
+        """
+        Counts a request whose duplicate responded first.
+        """
+
+        with self._lock:
+            self.number_of_hedge_wins += 1
+
+    def get_metrics(self) -> dict:
+        """
+        Returns the current state of the policy.
+
+        Returns
+        -------
+        metrics : dict
+            A dict containing the 'number_of_requests', the 
+            'number_of_hedges', the 'number_of_hedge_wins' and the 
+            'hedge_delay' in seconds.
+        """
+
+        hedge_delay = self.get_hedge_delay()
+
+        with self._lock:
+            return {'number_of_requests': self.number_of_requests, 'number_of_hedges': self.number_of_hedges, 'number_of_hedge_wins': self.number_of_hedge_wins, 'hedge_delay': hedge_delay}
+
+def get_hedging_policy() -> HedgingPolicy:
+    """
+    Returns the hedging policy shared by every thread of this process, or
+    None if hedging is disabled.
+
+    Hedging is enabled by setting the environment variable 
+    'UK_SCHOOL_HEDGE_PERCENTILE', and its budget is read from 
+    'UK_SCHOOL_HEDGE_BUDGET'.
+
+    Returns
+    -------
+    hedging_policy : HedgingPolicy or None
+        The process-wide hedging policy.
+    """
+
+    global _hedging_policy
+
+    percentile = os.environ.get(HEDGE_PERCENTILE_ENVIRONMENT_VARIABLE)
+
+    if not percentile:
+        return None
+
+    with _rate_limit_lock:
+        if _hedging_policy is None:
+            budget = float(os.environ.get(HEDGE_BUDGET_ENVIRONMENT_VARIABLE, DEFAULT_HEDGE_BUDGET))
+            _hedging_policy = HedgingPolicy(percentile=float(percentile), budget=budget)
+
+    return _hedging_policy
+
+def get_hedge_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Returns the thread pool the duplicate requests of hedged fetches are
+    made from.
+
+    Returns
+    -------
+    hedge_executor : concurrent.futures.ThreadPoolExecutor
+        The process-wide thread pool.
+    """
+
+    global _hedge_executor
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with _rate_limit_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=MAXIMUM_HEDGE_THREADS, thread_name_prefix='hedge')
+
+    return _hedge_executor
+
+def get_user_agent() -> str:
+    """
+    Returns the user agent to be used when making html requests. 
+
+    If a user agent was given on the command line it is stored in the 
+    environment variable 'UK_SCHOOL_USER_AGENT' and is returned. 
+    Otherwise, reads the user agent from the file 'user_agent.txt' in the
+    cache directory and returns it. If the file 'user_agent.txt' does not
+    exist, then a FileNotFoundError is raised.
+
+    Returns
+    -------
+    user_agent : str
+        The user agent to be used when making html requests.
+    """
+
+    if os.environ.get(USER_AGENT_ENVIRONMENT_VARIABLE):
+        return os.environ[USER_AGENT_ENVIRONMENT_VARIABLE]
+
+    try:
+        with open(get_cache_path('user_agent.txt'), 'r') as file:
+            user_agent = file.read()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"The file 'user_agent.txt' does not exist. Please create a file 'user_agent.txt' in the '{get_cache_directory()}' directory and enter your user agent.")
+
+    return user_agent
+
+def read_parliamentary_constituencies() -> List[str]:
+    """
+    Returns a list of all the parliamentary constituencies in the UK. 
+
+    This function is only called if the file 
+    'uk_parliamentary_constituencies.txt' exists. It reads the file 
+    'uk_parliamentary_constituencies.txt' with 'read_cache_file()' and 
+    returns a list of all the parliamentary constituencies contained 
+    within the file. 
+
+    Returns
+    -------
+    uk_parliamentary_constituencies() : List[str]
+        A list of all the parliamentary constituencies in the UK.
+
+    Raises
+    ------
+    ValueError
+        If the file is empty or does not match its checksum.
+    """
+
+    uk_parliamentary_constituencies = read_cache_file(get_cache_path('uk_parliamentary_constituencies.txt')).splitlines()
+
+    return uk_parliamentary_constituencies
+
+def scrape_parliamentary_constituencies() -> List[str]:
+    """
+    Returns a list of all the parliamentary constituencies in the UK. 
+
+    This function is only called if the file 
+    'uk_parliamentary_constituencies.txt' does not exists. It scrapes 
+    wikipedia to obtain and return a list of all the parliamentary 
+    constituencies in the UK and creates the file 
+    'uk_parliamentary_constituencies.txt'. 
+
+    Only the section of the article containing the table is requested, 
+    as described in 'get_parliamentary_constituencies_section_soup()'. 
+    If it cannot be obtained, the whole article is requested instead.
+
+    Returns
+    -------
+    uk_parliamentary_constituencies : List[str]
+        A list of all the parliamentary constituencies in the UK.
+    """
+
+    soup = get_parliamentary_constituencies_section_soup()
+
+    if soup is None:
+        soup = get_soup(PARLIAMENTARY_DATA_URL, target_element=('table', 'England'))
+
+    rows = soup.select("table#England tr")
+
+    uk_parliamentary_constituencies = []
+
+    for row in rows[1:]:
+        cells = row.select("td")
+        constituency = cells[0].text.strip()
+        uk_parliamentary_constituencies.append(constituency)
+
+    write_cache_file(get_cache_path('uk_parliamentary_constituencies.txt'), ''.join(constituency + '\n' for constituency in uk_parliamentary_constituencies))
+
+    if is_database_enabled():
+        write_constituencies_to_database(uk_parliamentary_constituencies)
+
+    return uk_parliamentary_constituencies
+
+def get_parliamentary_constituencies_section_soup() -> BeautifulSoup:
+    """
+    Returns a BeautifulSoup object representing the section of the 
+    constituency article containing the table 'table#England'.
+
+    The section is rendered by the MediaWiki parse endpoint for the same
+    revision as the whole article, which is around a hundredth of its 
+    size and takes a similar fraction of the time to parse.
+
+    Returns
+    -------
+    soup : BeautifulSoup or None
+        The section, or None if the request failed, the response could not
+        be decoded or the section does not contain the table.
+    """
+
+    import json
+    import requests
+    from bs4 import BeautifulSoup
+
+    try:
+        content = read_archive_record(PARLIAMENTARY_DATA_SECTION_URL) if is_offline() else fetch_page(PARLIAMENTARY_DATA_SECTION_URL)
+        section = json.loads(content)['parse']['text']
+    except (requests.RequestException, LookupError, TypeError, ValueError):
+        return None
+
+    soup = BeautifulSoup(section, 'html.parser')
+
+    if not soup.select("table#England tr"):
+        return None
+
+    return soup
+
+def get_parliamentary_constituencies() -> List[str]:
+    """
+    Returns a list of all the parliamentary constituencies in the UK. 
+
+    First checks if there exists a valid file called 
+    'uk_parliamentary_constituencies.txt' If such a file exists, it is 
+    calls the function 'read_parliamentary_constituencies(). If such a 
+    file does not exist, or is empty or corrupt, it calls the function
+    'scrape_parliamentary_constituencies()'. The file is locked while 
+    this is done, so it is only created by one process at a time.
+
+    Returns
+    -------
+    uk_parliamentary_constituencies() : List[str]
+        A list of all the parliamentary constituencies in the UK.
+    """
+
+    with lock_cache_file(get_cache_path('uk_parliamentary_constituencies.txt')):
+        try:
+            uk_parliamentary_constituencies = read_parliamentary_constituencies()
+        except (FileNotFoundError, ValueError):
+            uk_parliamentary_constituencies = scrape_parliamentary_constituencies()
+
+    return uk_parliamentary_constituencies
+
+def read_school_identification_information() -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the name and URN of all UK schools. 
+
+    This function is only called if the file 
+    'uk_school_identification_information.csv' exists. 
+    It returns the pd.DataFrame stored within the
+    'uk_school_identification_information.csv' file.
+    This pd.DataFrame contains the name and Unique Identification Number
+    (URN) for every school in the UK.
+
+    Returns
+    -------
+    uk_school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name and URN of every UK school.
+    """
+
+    import pandas as pd
+    from io import StringIO
+
+    uk_school_identification_information = pd.read_csv(StringIO(read_cache_file(get_cache_path('uk_school_identification_information.csv'))), index_col=0)
+
+    return uk_school_identification_information
+
+def scrape_school_identification_information() -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the name and URN of all UK schools. 
+
+    This function is only called if the file
+    'uk_school_identification_information.csv' does not exist. 
+    It scrapes the gov.uk website to obtain and return a pd.DataFrame 
+    containing the name and Unique Identification Number (URN) for every
+    school in the UK. It then saves this pd.DataFrame in the file 
+    'uk_school_identification_information.csv'.S
+
+    Returns
+    -------
+    uk_school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name and URN of every UK school.
+    """
+
+    from joblib import Parallel, delayed
+
+    parliamentary_constituencies = get_parliamentary_constituencies()
+
+    # The constituencies left unfinished by a previous scrape are scraped 
+    # again
+    remove_unfinished_work('identification', time.time())
+
+    parliamentary_constituency_subsets = [parliamentary_constituencies[i:i+10] for i in range(0, len(parliamentary_constituencies), 10)]
+
+    school_identification_batches = Parallel(**get_parallel_arguments())(delayed(run_and_spill_result_batch)(scrape_school_identification_information_subset_of_constituencies, parliamentary_constituency_subset) for parliamentary_constituency_subset in parliamentary_constituency_subsets)
+
+    uk_school_identification_information = collect_result_batches(school_identification_batches)
+
+    if uk_school_identification_information is None or uk_school_identification_information.empty:
+        raise ValueError("No schools were found in any parliamentary constituency.")
+
+    write_cache_file(get_cache_path('uk_school_identification_information.csv'), uk_school_identification_information.to_csv())
+
+    uk_school_identification_information['school_urn'] = uk_school_identification_information['school_urn'].astype('int64')
+
+    return uk_school_identification_information
+
+def scrape_school_identification_information_subset_of_constituencies(parliamentary_constituencies: list[str]) -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the name and URN of all primary schools in the given parliamentary constituencies.
+
+    Calls the scrape_single_parliamentary_constituency_school_identification_information() function for each parliamentary constituency
+    in the given list of parliamentary constituencies and concatenates the resulting pd.DataFrames to obtain a single pd.DataFrame 
+    containing the name and URN of every primary school in the given parliamentary constituencies. Constituencies whose requests 
+    time out, which are reached after the deadline of the task or of the run, or which are not in the raw HTML archive in offline
+    mode, are recorded with 'record_unfinished_work()'.
+
+    Parameters
+    ----------
+    parliamentary_constituencies : list[str]
+        A list of the parliamentary constituencies whose data is to be obtained.
+
+    Returns
+    -------
+    parliamentary_constituency_school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name and URN of every primary school in the given parliamentary constituencies.
+    """
+
+    import pandas as pd
+    import requests
+
+    parliamentary_constituency_school_identification_information = pd.DataFrame()
+    unfinished_parliamentary_constituencies = []
+
+    with task_deadline():
+        for parliamentary_constituency in parliamentary_constituencies:
+            try:
+                single_parliamentary_constituency_school_identification_information = scrape_single_parliamentary_constituency_school_identification_information(parliamentary_constituency)
+            except (requests.Timeout, TimeoutError, ArchiveMissError) as error:
+                unfinished_parliamentary_constituencies.append((parliamentary_constituency, [parliamentary_constituency], get_unfinished_reason(error)))
+                continue
+
+            parliamentary_constituency_school_identification_information = pd.concat([parliamentary_constituency_school_identification_information, single_parliamentary_constituency_school_identification_information])
+
+    record_unfinished_work('identification', unfinished_parliamentary_constituencies)
+
+    return parliamentary_constituency_school_identification_information
+
+def get_single_parliamentary_constituency_url(parliamentary_constituency: str) -> str:
+    """
+    Returns the URL to the .gov Web page containing the list of primary schools in the specified parliamentary constituency.
+
+    Parameters
+    ----------
+    parliamentary_constituency : str
+        The name of the parliamentary constituency whose data is to be obtained. 
+
+    Returns
+    -------
+    parliamentary_constituency_url : str
+        The url to the Web page containing the list of primary schools in the specified parliamentary constituency.
+
+    """
+    parliamentary_constituency_words = parliamentary_constituency.split()
+    formatted_parliamentary_constituency = '+'.join(parliamentary_constituency_words)
+
+    parliamentary_constituency_url = f'https://www.compare-school-performance.service.gov.uk/schools-by-type?step=default&table=schools&parliamentary={formatted_parliamentary_constituency}&geographic=parliamentary&for=primary'
+
+    return parliamentary_constituency_url
+
+def extract_school_identification_rows(soup: BeautifulSoup) -> List[List[str]]:
+    """
+    Returns the name, URN and type of every school listed on a 
+    parliamentary constituency's page.
+
+    Parameters
+    ----------
+    soup : BeautifulSoup
+        The BeautifulSoup object representing the page.
+
+    Returns
+    -------
+    school_rows : List[List[str]]
+        The name, URN and type of each school.
+    """
+
+    rows = soup.select("table#establishment-list-view tbody tr")
+
+    school_rows = []
+
+    for row in rows:
+        if len(row['class']) > 0:
+            continue
+
+        school_urn = row['data-urn']
+        school_name = row.select('th a')[0].text.strip()
+        school_type = row.select('td[data-title="Type of school"] span.value')[0].text.strip()
+
+        school_rows.append([school_name, school_urn, school_type])
+
+    return school_rows
+
+def scrape_single_parliamentary_constituency_school_identification_information(parliamentary_constituency: str) -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the name and URN of all primary schools in the specified parliamentary constituency. 
+
+    Scrapes the gov.uk website to obtain and return a pd.DataFrame containing the name and Unique Identification Number (URN) for every primary school in the specified parliamentary constituency.
+
+    Parameters
+    ----------
+    parliamentary_constituency : str
+        The name of the parliamentary constituency whose data is to be obtained. 
+
+    Returns
+    -------
+    parliamentary_constituency_school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name, URN and type of every primary school in the specified parliamentary constituency,
+        and the name of the constituency.
+    """
+
+    import pandas as pd
+
+    parliamentary_constituency_url = get_single_parliamentary_constituency_url(parliamentary_constituency)
+
+    school_rows = extract_page(parliamentary_constituency_url, 'school_identification', target_element=('table', 'establishment-list-view'))
+
+    parliamentary_constituency_school_identification_information = pd.DataFrame(school_rows, columns=['school_name', 'school_urn', 'type_of_school'])
+    parliamentary_constituency_school_identification_information['parliamentary_constituency'] = parliamentary_constituency
+
+    parliamentary_constituency_school_identification_information, invalid_school_identification_information = validate_school_data(parliamentary_constituency_school_identification_information)
+    quarantine_school_data(invalid_school_identification_information, 'identification')
+
+    if is_database_enabled():
+        write_schools_to_database(parliamentary_constituency, parliamentary_constituency_school_identification_information)
+
+    return parliamentary_constituency_school_identification_information
+
+def get_school_identification_information() -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the name and URN of all UK schools. 
+
+    First checks if there exists a valid file called
+    'uk_school_identification_information.csv'. 
+    If such a file exists, it calls the function 
+    'read_school_identification_information()'.
+    If such a file does not exist, or is empty or corrupt, it calls the 
+    function 'scrape_school_identification_information()'. The file is 
+    locked while this is done, so it is only created by one process at a
+    time.
+
+    Returns
+    -------
+    uk_school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name and URN of every UK school.
+    """
+
+    with lock_cache_file(get_cache_path('uk_school_identification_information.csv')):
+        try:
+            uk_school_identification_information = read_school_identification_information()
+        except (FileNotFoundError, ValueError):
+            uk_school_identification_information = scrape_school_identification_information()
+
+    return uk_school_identification_information
+
+def get_archive_directory() -> str:
+    """
+    Returns the directory containing the raw HTML archive.
+
+    Returns
+    -------
+    archive_directory : str
+        The directory 'html_archive' in the cache directory.
+    """
+
+    return get_cache_path(ARCHIVE_DIRECTORY_NAME)
+
+def is_archive_enabled() -> bool:
+    """
+    Returns whether fetched pages are written to the raw HTML archive.
+
+    Archiving is enabled unless the environment variable 
+    'UK_SCHOOL_ARCHIVE' is set to '0'.
+
+    Returns
+    -------
+    archive_enabled : bool
+        True if fetched pages are to be archived. 
+    """
+
+    return os.environ.get(ARCHIVE_ENVIRONMENT_VARIABLE, '1') != '0'
+
+def is_offline() -> bool:
+    """
+    Returns whether pages are to be read from the raw HTML archive.
+
+    Offline mode is enabled by the 're-extract' command, which sets the
+    environment variable 'UK_SCHOOL_OFFLINE' to '1'. In offline mode no
+    requests are made.
+
+    Returns
+    -------
+    offline : bool
+        True if pages are to be read from the raw HTML archive.
+    """
+
+    return os.environ.get(OFFLINE_ENVIRONMENT_VARIABLE, '0') == '1'
+
+def write_archive_record(url: str, content: bytes, target_element: Tuple[str, str] = None) -> None:
+    """
+    Appends a fetched page to the raw HTML archive. 
+
+    Each worker process appends to its own segment 'segment-<pid>.warc.gz'
+    so that no locking is needed between processes. The threads of a 
+    process share its segment, so they hold '_archive_lock' while 
+    appending, so that the offset in the index is that of the record 
+    written. Every record is a WARC-style response 
+    record compressed as a separate gzip member, so that it can be 
+    decompressed on its own. The URL, offset and length of the record 
+    are appended to the segment's index 'segment-<pid>.cdx'.
+
+    A body whose download was stopped after a target element may not be
+    the whole page, so its record is marked with a 'WARC-Truncated' 
+    header and the index records the target, so that it is only read for
+    the same target by 'read_archive_record()'.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page that was fetched.
+    content : bytes
+        The body of the response. 
+    target_element : Tuple[str, str], optional
+        The tag name and id of the element after which the download was
+        stopped, if it was given to 'fetch_page()'.
+    """
+
+    import gzip
+    from datetime import datetime, timezone
+
+    global _archive_index
+
+    archive_directory = get_archive_directory()
+    os.makedirs(archive_directory, exist_ok=True)
+
+    segment_name = f'segment-{os.getpid()}'
+    archive_date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    target = '#'.join(target_element) if target_element is not None else ''
+    truncated_header = f'WARC-Truncated: target-element {target}\r\n' if target else ''
+
+    header = (
+        'WARC/1.1\r\n'
+        'WARC-Type: response\r\n'
+        f'WARC-Target-URI: {url}\r\n'
+        f'WARC-Date: {archive_date}\r\n'
+        f'{truncated_header}'
+        f'Content-Length: {len(content)}\r\n'
+        '\r\n'
+    )
+    record = gzip.compress(header.encode('utf-8') + content + b'\r\n\r\n')
+
+    with _archive_lock:
+        with open(os.path.join(archive_directory, segment_name + '.warc.gz'), 'ab') as file:
+            offset = file.tell()
+            file.write(record)
+
+        with open(os.path.join(archive_directory, segment_name + '.cdx'), 'a', encoding='utf-8') as file:
+            file.write(f'{url}\t{segment_name}.warc.gz\t{offset}\t{len(record)}\t{archive_date}\t{target}\n')
+
+        _archive_index = None
+
+def read_archive_index() -> dict:
+    """
+    Returns the index of the raw HTML archive.
+
+    Reads the index of every segment in the archive. If a url was fetched
+    more than once, the most recent record is used. The index is kept in 
+    memory until one of the index files changes.
+
+    Returns
+    -------
+    archive_index : dict
+        A dict mapping each archived url to a tuple containing the path of
+        its segment, the offset of its record, the length of its record 
+        and the target element it was truncated after, as 'tag#id', or 
+        None if it is the whole page.
+    """
+
+    global _archive_index, _archive_index_key
+
+    archive_directory = get_archive_directory()
+
+    if os.path.isdir(archive_directory):
+        index_paths = sorted(os.path.join(archive_directory, file_name) for file_name in os.listdir(archive_directory) if file_name.endswith('.cdx'))
+    else:
+        index_paths = []
+
+    archive_index_key = tuple((index_path, os.stat(index_path).st_mtime_ns, os.stat(index_path).st_size) for index_path in index_paths)
+
+    if _archive_index is not None and archive_index_key == _archive_index_key:
+        return _archive_index
+
+    archive_dates = {}
+    archive_index = {}
+
+    for index_path in index_paths:
+        with open(index_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                # Indexes written before truncated records were marked 
+                # have no target column
+                url, segment_file_name, offset, length, archive_date, *target = line.rstrip('\n').split('\t')
+
+                if url in archive_dates and archive_dates[url] > archive_date:
+                    continue
+
+                archive_dates[url] = archive_date
+                archive_index[url] = (os.path.join(archive_directory, segment_file_name), int(offset), int(length), target[0] if target and target[0] else None)
+
+    _archive_index = archive_index
+    _archive_index_key = archive_index_key
+
+    return archive_index
+
+class ArchiveMissError(LookupError):
+    """
+    Raised in offline mode when a page is not in the raw HTML archive, 
+    e.g. because it was skipped by a deadline or the negative cache when 
+    the archive was written.
+    """
+
+def read_archive_record(url: str, target_element: Tuple[str, str] = None) -> bytes:
+    """
+    Returns the body of an archived page.
+
+    Seeks directly to the page's record using the archive index, so only 
+    the one record is read and decompressed. A record truncated after a
+    target element is only returned for the same target, so that parsers
+    needing the rest of the page never get part of it.
+
+    Parameters
+    ----------
+    url : str
+        The url of the archived page. 
+    target_element : Tuple[str, str], optional
+        The tag name and id of the only element of the page that is 
+        needed, as described in 'fetch_page()'. If not given, the whole 
+        page is needed.
+
+    Returns
+    -------
+    content : bytes
+        The body of the archived response.
+
+    Raises
+    ------
+    ArchiveMissError
+        If the page is not in the archive, or only part of it is and a 
+        different part is needed.
+    """
+
+    import gzip
+
+    archive_index = read_archive_index()
+
+    if url not in archive_index:
+        raise ArchiveMissError(f"The page '{url}' is not in the HTML archive.")
+
+    segment_path, offset, length, target = archive_index[url]
+
+    if target is not None and (target_element is None or '#'.join(target_element) != target):
+        raise ArchiveMissError(f"The page '{url}' is only archived up to the element '{target}'.")
+
+    with open(segment_path, 'rb') as file:
+        file.seek(offset)
+        record = gzip.decompress(file.read(length))
+
+    header, body = record.split(b'\r\n\r\n', 1)
+    content_length = int(header.split(b'Content-Length: ', 1)[1].split(b'\r\n', 1)[0])
+
+    return body[:content_length]
+
+def get_soup(url: str, target_element: Tuple[str, str] = None) -> BeautifulSoup:
+    """
+    Returns a BeautifulSoup object representing 
+    the parsed webpage that was specified. 
+
+    Every fetched page is appended to the raw HTML archive unless 
+    archiving has been disabled. In offline mode, the page is read from
+    the archive instead of being requested.
+
+    Parameters
+    ----------
+    url : str
+        The url of the website which is to be parsed. 
+    target_element : Tuple[str, str], optional
+        The tag name and id of the only element of the page that is 
+        needed. If given, the download is stopped as soon as the closing
+        tag of the element has been received, and the soup only contains
+        the page up to that point.
+
+    Returns
+    ------
+    soup : BeautifulSoup
+        The BeautifulSoup object representing the webpage to be parsed.
+    """
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(get_page_content(url, target_element), 'html.parser')
+
+    return soup
+
+def get_page_content(url: str, target_element: Tuple[str, str] = None) -> bytes:
+    """
+    Returns the body of the page at the given url.
+
+    In offline mode, the page is read from the raw HTML archive instead 
+    of being requested.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page.
+    target_element : Tuple[str, str], optional
+        The tag name and id of the only element of the page that is 
+        needed, as described in 'fetch_page()'.
+
+    Returns
+    -------
+    content : bytes
+        The body of the page.
+    """
+
+    if is_offline():
+        return read_archive_record(url, target_element)
+
+    return fetch_page(url, target_element)
+
+def is_parse_memo_enabled() -> bool:
+    """
+    Returns whether the records extracted from pages are memoised.
+
+    The parse memo is enabled unless the environment variable 
+    'UK_SCHOOL_PARSE_MEMO' is set to '0'.
+
+    Returns
+    -------
+    parse_memo_enabled : bool
+        True if extracted records are to be memoised.
+    """
+
+    return os.environ.get(PARSE_MEMO_ENVIRONMENT_VARIABLE, '1') != '0'
+
+def get_parse_memo_size() -> int:
+    """
+    Returns the largest size of the parse memo in bytes.
+
+    The size is read from the environment variable 
+    'UK_SCHOOL_PARSE_MEMO_SIZE', in megabytes, and defaults to 
+    'DEFAULT_PARSE_MEMO_SIZE'.
+
+    Returns
+    -------
+    parse_memo_size : int
+        The largest total size of the memoised records in bytes.
+    """
+
+    return int(float(os.environ.get(PARSE_MEMO_SIZE_ENVIRONMENT_VARIABLE, DEFAULT_PARSE_MEMO_SIZE)) * 2**20)
+
+PARSE_MEMO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_memo (
+    content_hash BLOB NOT NULL,
+    extractor TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    record BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (content_hash, extractor, extractor_version)
+);
+CREATE INDEX IF NOT EXISTS parse_memo_last_used ON parse_memo (last_used);
+CREATE TABLE IF NOT EXISTS parse_memo_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO parse_memo_counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0), ('size', 0);
+"""
+
+def get_parse_memo_connection() -> sqlite3.Connection:
+    """
+    Returns this process's connection to the parse memo 
+    'parse_memo.sqlite'.
+
+    The connection is opened once per process and memo file, and is 
+    shared by its threads, which must hold '_parse_memo_lock' while 
+    using it. It is opened again if the memo file has been deleted or 
+    replaced, and the hits not yet written to the old file are dropped. The memo uses write-ahead logging, so the joblib workers 
+    can use it at the same time.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        A connection to the parse memo.
+    """
+
+    import sqlite3
+
+    global _parse_memo_connection, _parse_memo_connection_key, _parse_memo_number_of_pending_hits
+
+    parse_memo_path = get_cache_path(PARSE_MEMO_FILE_NAME)
+
+    try:
+        parse_memo_stat = os.stat(parse_memo_path)
+        parse_memo_key = (parse_memo_path, parse_memo_stat.st_dev, parse_memo_stat.st_ino)
+    except FileNotFoundError:
+        parse_memo_key = None
+
+    if _parse_memo_connection is not None and parse_memo_key is not None and _parse_memo_connection_key == parse_memo_key:
+        return _parse_memo_connection
+
+    if _parse_memo_connection is not None:
+        _parse_memo_connection.close()
+
+    # The hits of a memo that has been deleted or replaced are dropped
+    _parse_memo_pending_hits.clear()
+    _parse_memo_number_of_pending_hits = 0
+
+    os.makedirs(get_cache_directory(), exist_ok=True)
+
+    connection = sqlite3.connect(parse_memo_path, timeout=60, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(PARSE_MEMO_SCHEMA)
+
+    parse_memo_stat = os.stat(parse_memo_path)
+
+    _parse_memo_connection = connection
+    _parse_memo_connection_key = (parse_memo_path, parse_memo_stat.st_dev, parse_memo_stat.st_ino)
+
+    return connection
+
+def get_extractor_version(extractor_name: str) -> str:
+    """
+    Returns the version of an extractor in 'PAGE_EXTRACTORS'.
+
+    The version combines 'EXTRACTOR_VERSION' with a hash of the field spec
+    of the extractor, so records memoised before the spec was changed are
+    not used.
+
+    Parameters
+    ----------
+    extractor_name : str
+        The name of the extractor.
+
+    Returns
+    -------
+    extractor_version : str
+        The version of the extractor.
+    """
+
+    extractor, field_spec = PAGE_EXTRACTORS[extractor_name]
+
+    return f"{EXTRACTOR_VERSION}-{get_stable_hash(repr(field_spec)):016x}"
+
+def extract_page(url: str, extractor_name: str, target_element: Tuple[str, str] = None):
+    """
+    Returns the record extracted from a page by an extractor in 
+    'PAGE_EXTRACTORS'.
+
+    Records are memoised by the SHA-256 hash of the body of the page and 
+    the name and version of the extractor, so a page whose body and 
+    extractor have not changed since it was last extracted, e.g. when it 
+    is re-extracted from the raw HTML archive, is not parsed again. The 
+    records are stored as compressed JSON, and the least recently used 
+    records are evicted once their total size is more than 
+    'get_parse_memo_size()'. A hit only reads the memo; its last use and
+    count are kept in memory and written by 'flush_parse_memo_hits()' 
+    with the next miss, once 'PARSE_MEMO_HIT_BATCH_SIZE' hits are 
+    pending, or by 'write_parse_memo_hits()' at the end of the batch of 
+    work.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page.
+    extractor_name : str
+        The name of the extractor in 'PAGE_EXTRACTORS'.
+    target_element : Tuple[str, str], optional
+        The tag name and id of the only element of the page that is 
+        needed, as described in 'fetch_page()'.
+
+    Returns
+    -------
+    record : 
+        The record returned by the extractor, which must be JSON 
+        serialisable.
+    """
+
+    import hashlib
+    import json
+    import zlib
+    from bs4 import BeautifulSoup
+
+    global _parse_memo_number_of_pending_hits
+
+    content = get_page_content(url, target_element)
+    extractor = PAGE_EXTRACTORS[extractor_name][0]
+
+    if not is_parse_memo_enabled():
+        return extractor(BeautifulSoup(content, 'html.parser'))
+
+    key = (hashlib.sha256(content).digest(), extractor_name, get_extractor_version(extractor_name))
+
+    with _parse_memo_lock:
+        connection = get_parse_memo_connection()
+        row = connection.execute('SELECT record FROM parse_memo WHERE content_hash = ? AND extractor = ? AND extractor_version = ?', key).fetchone()
+
+        if row is not None:
+            _parse_memo_pending_hits[key] = time.time()
+            _parse_memo_number_of_pending_hits += 1
+
+            if _parse_memo_number_of_pending_hits >= PARSE_MEMO_HIT_BATCH_SIZE:
+                with connection:
+                    flush_parse_memo_hits(connection)
+
+            return json.loads(zlib.decompress(row[0]))
+
+    record = extractor(BeautifulSoup(content, 'html.parser'))
+    compressed_record = zlib.compress(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+
+    with _parse_memo_lock:
+        connection = get_parse_memo_connection()
+
+        with connection:
+            flush_parse_memo_hits(connection)
+            connection.execute("UPDATE parse_memo_counters SET value = value + 1 WHERE name = 'misses'")
+
+            if connection.execute('INSERT OR IGNORE INTO parse_memo VALUES (?, ?, ?, ?, ?, ?)', key + (compressed_record, len(compressed_record), time.time())).rowcount:
+                connection.execute("UPDATE parse_memo_counters SET value = value + ? WHERE name = 'size'", (len(compressed_record),))
+                evict_parse_memo_records(connection)
+
+    return record
+
+def flush_parse_memo_hits(connection: sqlite3.Connection) -> None:
+    """
+    Writes the last use of the records hit since the last flush, and the
+    number of hits, to the parse memo.
+
+    Must be called within a transaction, while holding 
+    '_parse_memo_lock'.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        The connection returned by 'get_parse_memo_connection()'.
+    """
+
+    global _parse_memo_number_of_pending_hits
+
+    if not _parse_memo_number_of_pending_hits:
+        return
+
+    connection.executemany('UPDATE parse_memo SET last_used = ? WHERE content_hash = ? AND extractor = ? AND extractor_version = ?', [(last_used,) + key for key, last_used in _parse_memo_pending_hits.items()])
+    connection.execute("UPDATE parse_memo_counters SET value = value + ? WHERE name = 'hits'", (_parse_memo_number_of_pending_hits,))
+
+    _parse_memo_pending_hits.clear()
+    _parse_memo_number_of_pending_hits = 0
+
+def write_parse_memo_hits() -> None:
+    """
+    Writes the hits of this process that are not yet in the parse memo.
+
+    Called at the end of every batch of work by 
+    'run_and_spill_result_batch()' and after every crawl shard, so that 
+    the hits of a worker process are counted, and the records it used are
+    not evicted as unused, even if it makes no more misses.
+    """
+
+    with _parse_memo_lock:
+        if not _parse_memo_number_of_pending_hits:
+            return
+
+        connection = get_parse_memo_connection()
+
+        with connection:
+            flush_parse_memo_hits(connection)
+
+def evict_parse_memo_records(connection: sqlite3.Connection) -> None:
+    """
+    Evicts the least recently used records from the parse memo if their
+    total size is more than 'get_parse_memo_size()'.
+
+    Records are evicted until the total size is at most 90% of the 
+    largest size, so that eviction is not needed again after every 
+    insertion. Must be called within a transaction.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        The connection returned by 'get_parse_memo_connection()'.
+    """
+
+    parse_memo_size = get_parse_memo_size()
+    size = connection.execute("SELECT value FROM parse_memo_counters WHERE name = 'size'").fetchone()[0]
+
+    if size <= parse_memo_size:
+        return
+
+    evicted_rows = []
+
+    for row in connection.execute('SELECT rowid, size FROM parse_memo ORDER BY last_used'):
+        if size <= 0.9 * parse_memo_size:
+            break
+
+        evicted_rows.append((row[0],))
+        size -= row[1]
+
+    connection.executemany('DELETE FROM parse_memo WHERE rowid = ?', evicted_rows)
+    connection.execute("UPDATE parse_memo_counters SET value = ? WHERE name = 'size'", (size,))
+    connection.execute("UPDATE parse_memo_counters SET value = value + ? WHERE name = 'evictions'", (len(evicted_rows),))
+
+def get_parse_memo_metrics() -> dict:
+    """
+    Returns the counters of the parse memo.
+
+    The counters are kept in the memo, so they include the lookups made
+    by every process since the memo was created. The pending hits of 
+    this process are written first, but those of other processes are 
+    only counted once they are flushed.
+
+    Returns
+    -------
+    metrics : dict
+        A dict containing the 'number_of_hits', 'number_of_misses' and 
+        'number_of_evictions' of the memo and its 'size' in bytes.
+    """
+
+    with _parse_memo_lock:
+        connection = get_parse_memo_connection()
+
+        with connection:
+            flush_parse_memo_hits(connection)
+
+        counters = dict(connection.execute('SELECT name, value FROM parse_memo_counters').fetchall())
+
+    return {'number_of_hits': counters['hits'], 'number_of_misses': counters['misses'], 'number_of_evictions': counters['evictions'], 'size': counters['size']}
+
+def is_negative_cache_enabled() -> bool:
+    """
+    Returns whether school pages known to have no data are skipped.
+
+    The negative cache is enabled unless the environment variable 
+    'UK_SCHOOL_NEGATIVE_CACHE' is set to '0'.
+
+    Returns
+    -------
+    negative_cache_enabled : bool
+        True if school pages known to have no data are not requested.
+    """
+
+    return os.environ.get(NEGATIVE_CACHE_ENVIRONMENT_VARIABLE, '1') != '0'
+
+def get_negative_cache_recheck_interval() -> float:
+    """
+    Returns the time after which a school page known to have no data is
+    requested again.
+
+    The interval is read from the environment variable 
+    'UK_SCHOOL_NEGATIVE_CACHE_RECHECK', in days, and defaults to 
+    'DEFAULT_NEGATIVE_CACHE_RECHECK'.
+
+    Returns
+    -------
+    recheck_interval : float
+        The recheck interval in seconds.
+    """
+
+    return float(os.environ.get(NEGATIVE_CACHE_RECHECK_ENVIRONMENT_VARIABLE, DEFAULT_NEGATIVE_CACHE_RECHECK)) * 86400
+
+class BloomFilter:
+    """
+    A set of str keys which may give false positives but never false 
+    negatives.
+
+    The bits of each key are chosen by double hashing its BLAKE2b hash, 
+    and the number of bits and of hash functions are chosen for the 
+    capacity and the false positive rate.
+
+    Attributes
+    ----------
+    capacity : int
+        The number of keys the filter was sized for.
+    number_of_keys : int
+        The number of keys added to the filter.
+
+    Methods
+    -------
+    add(key)
+        Adds a key to the filter.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = NEGATIVE_CACHE_FALSE_POSITIVE_RATE):
+        """
+        Parameters
+        ----------
+        capacity : int
+            The number of keys the filter is sized for. Once more keys 
+            are added, the false positive rate is higher than given.
+        false_positive_rate : float, optional
+            The proportion of keys not in the filter which are reported 
+            to be in it.
+        """
+
+        import math
+
+        self.capacity = capacity
+        self.number_of_keys = 0
+
+        self._number_of_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self._number_of_hashes = max(1, round(self._number_of_bits / capacity * math.log(2)))
+        self._bits = bytearray((self._number_of_bits + 7) // 8)
+
+    def _get_bit_indices(self, key: str) -> Iterator[int]:
+        import hashlib
+
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+
+        for i in range(self._number_of_hashes):
+            yield (first_hash + i * second_hash) % self._number_of_bits
+
+    def add(self, key: str) -> None:
+        """
+        Adds a key to the filter.
+
+        Parameters
+        ----------
+        key : str
+            The key to be added.
+        """
+
+        for bit_index in self._get_bit_indices(key):
+            self._bits[bit_index >> 3] |= 1 << (bit_index & 7)
+
+        self.number_of_keys += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[bit_index >> 3] & (1 << (bit_index & 7)) for bit_index in self._get_bit_indices(key))
+
+NEGATIVE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS negative_results (
+    school_urn TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    academic_year TEXT NOT NULL,
+    checked_time REAL NOT NULL,
+    PRIMARY KEY (school_urn, dataset, extractor_version, academic_year)
+);
+CREATE TABLE IF NOT EXISTS negative_cache_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO negative_cache_counters VALUES ('skips', 0);
+"""
+
+def connect_to_negative_cache(read_only: bool = False) -> sqlite3.Connection:
+    """
+    Returns a connection to the negative cache 'negative_cache.sqlite'.
+
+    The negative cache is created in the cache directory if it does not 
+    exist. It uses write-ahead logging, so the joblib workers can use it
+    at the same time. Pages recorded before the extractor version was 
+    part of their key are dropped, since the extractor that found them 
+    empty is not known.
+
+    Parameters
+    ----------
+    read_only : bool, optional
+        If True, the negative cache is opened read-only and is neither 
+        created nor changed, as needed by the dry run.
+
+    Returns
+    -------
+    connection : sqlite3.Connection or None
+        A connection to the negative cache, or None if it is to be opened
+        read-only and does not exist.
+    """
+
+    import sqlite3
+    from pathlib import Path
+
+    negative_cache_path = get_cache_path(NEGATIVE_CACHE_FILE_NAME)
+
+    if read_only:
+        if not os.path.exists(negative_cache_path):
+            return None
+
+        return sqlite3.connect(f"{Path(negative_cache_path).resolve().as_uri()}?mode=ro", uri=True, timeout=60)
+
+    os.makedirs(get_cache_directory(), exist_ok=True)
+
+    connection = sqlite3.connect(negative_cache_path, timeout=60)
+    connection.execute('PRAGMA journal_mode=WAL')
+
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(negative_results)')]
+    if columns and 'extractor_version' not in columns:
+        connection.execute('DROP TABLE negative_results')
+
+    connection.executescript(NEGATIVE_CACHE_SCHEMA)
+
+    return connection
+
+def get_negative_cache_key(school_urn: str, dataset: str, extractor_version: str, academic_year: str) -> str:
+    """
+    Returns the key of a school page in the Bloom filter of the negative 
+    cache.
+
+    Parameters
+    ----------
+    school_urn : str
+        The URN of the school.
+    dataset : str
+        The name of the extractor of the page in 'PAGE_EXTRACTORS'.
+    extractor_version : str
+        The version of the extractor that found the page to have no data,
+        as returned by 'get_extractor_version()'.
+    academic_year : str
+        The academic year of the data on the page.
+
+    Returns
+    -------
+    key : str
+        The key of the page.
+    """
+
+    return f"{school_urn}|{dataset}|{extractor_version}|{academic_year}"
+
+def get_negative_cache_filter() -> BloomFilter:
+    """
+    Returns this process's Bloom filter of the school pages in the 
+    negative cache.
+
+    The filter is built from the negative cache once per process and 
+    cache file, and is built again once more keys have been added to it
+    than it was sized for. Must be called while holding 
+    '_negative_cache_lock'. Pages recorded by other processes after the
+    filter was built are not in it, so they are requested again until 
+    the next run, as if they were not in the negative cache.
+
+    Returns
+    -------
+    negative_cache_filter : BloomFilter
+        The Bloom filter of the negative cache.
+    """
+
+    global _negative_cache_filter, _negative_cache_filter_key
+
+    negative_cache_path = get_cache_path(NEGATIVE_CACHE_FILE_NAME)
+
+    try:
+        negative_cache_stat = os.stat(negative_cache_path)
+        negative_cache_key = (negative_cache_path, negative_cache_stat.st_dev, negative_cache_stat.st_ino)
+    except FileNotFoundError:
+        negative_cache_key = None
+
+    if _negative_cache_filter is not None and negative_cache_key is not None and _negative_cache_filter_key == negative_cache_key and _negative_cache_filter.number_of_keys <= _negative_cache_filter.capacity:
+        return _negative_cache_filter
+
+    with closing(connect_to_negative_cache()) as connection:
+        keys = [get_negative_cache_key(*row) for row in connection.execute('SELECT school_urn, dataset, extractor_version, academic_year FROM negative_results')]
+
+    negative_cache_filter = BloomFilter(max(NEGATIVE_CACHE_MINIMUM_CAPACITY, 2 * len(keys)))
+    for key in keys:
+        negative_cache_filter.add(key)
+
+    negative_cache_stat = os.stat(negative_cache_path)
+
+    _negative_cache_filter = negative_cache_filter
+    _negative_cache_filter_key = (negative_cache_path, negative_cache_stat.st_dev, negative_cache_stat.st_ino)
+
+    return negative_cache_filter
+
+def is_known_empty(school_urn: str, dataset: str, academic_year: str) -> bool:
+    """
+    Returns whether a school page was found to have no data within the 
+    recheck interval.
+
+    The Bloom filter is checked first, so the negative cache file is only
+    read for the pages in the filter. Only pages found to have no data by
+    the current version of the extractor are known to be empty, so the 
+    pages are requested again once the extractor is changed. Every page 
+    reported as known to be empty is counted as a skip.
+
+    Parameters
+    ----------
+    school_urn : str
+        The URN of the school.
+    dataset : str
+        The name of the extractor of the page in 'PAGE_EXTRACTORS'.
+    academic_year : str
+        The academic year of the data on the page.
+
+    Returns
+    -------
+    known_empty : bool
+        True if the page need not be requested.
+    """
+
+    extractor_version = get_extractor_version(dataset)
+
+    with _negative_cache_lock:
+        if get_negative_cache_key(school_urn, dataset, extractor_version, academic_year) not in get_negative_cache_filter():
+            return False
+
+    with closing(connect_to_negative_cache()) as connection:
+        with connection:
+            row = connection.execute('SELECT checked_time FROM negative_results WHERE school_urn = ? AND dataset = ? AND extractor_version = ? AND academic_year = ?', (school_urn, dataset, extractor_version, academic_year)).fetchone()
+
+            if row is None or time.time() - row[0] >= get_negative_cache_recheck_interval():
+                return False
+
+            connection.execute("UPDATE negative_cache_counters SET value = value + 1 WHERE name = 'skips'")
+
+    return True
+
+def has_published_data(record: dict, field_names: Tuple[str, ...]) -> bool:
+    """
+    Returns whether a record extracted from a school page has any data.
+
+    A page is only known to have no data if the website says so, by 
+    showing the values in 'NO_DATA_VALUES' in place of its fields. A page
+    on which none of the fields were found, e.g. because its layout has 
+    changed or it is an error page, is not known either way.
+
+    Parameters
+    ----------
+    record : dict
+        The record returned by 'extract_page()'.
+    field_names : Tuple[str, ...]
+        The names of the per-school fields of the page. The England 
+        averages are on every page, so they are not counted, and the 
+        local authority averages and code are shown even when the 
+        school's own data is not, so they are left out.
+
+    Returns
+    -------
+    published_data : bool or None
+        True if any of the fields has a value other than those in 
+        'NO_DATA_VALUES', False if the fields that were found all have 
+        one of those values, and None if none of the fields were found.
+    """
+
+    values = [record.get(field_name) for field_name in field_names if field_name not in LOCAL_AUTHORITY_FIELDS and field_name != LOCAL_AUTHORITY_CODE_FIELD and record.get(field_name) is not None]
+
+    if not values:
+        return None
+
+    return any(value not in NO_DATA_VALUES for value in values)
+
+def record_negative_result(school_urn: str, dataset: str, academic_year: str, published_data: bool) -> None:
+    """
+    Records whether a school page had any data.
+
+    A page without data is added to the negative cache with the current
+    version of its extractor, or has its check time updated if it is 
+    already in it. A page with data is removed from the negative cache if
+    it was in it, so it is requested by every later run.
+
+    Parameters
+    ----------
+    school_urn : str
+        The URN of the school.
+    dataset : str
+        The name of the extractor of the page in 'PAGE_EXTRACTORS'.
+    academic_year : str
+        The academic year of the data on the page.
+    published_data : bool
+        Whether the page had any data, as returned by 
+        'has_published_data()', or False if the page does not exist.
+    """
+
+    extractor_version = get_extractor_version(dataset)
+    key = get_negative_cache_key(school_urn, dataset, extractor_version, academic_year)
+
+    with _negative_cache_lock:
+        negative_cache_filter = get_negative_cache_filter()
+
+        if published_data and key not in negative_cache_filter:
+            return
+
+        with closing(connect_to_negative_cache()) as connection:
+            with connection:
+                if published_data:
+                    connection.execute('DELETE FROM negative_results WHERE school_urn = ? AND dataset = ? AND extractor_version = ? AND academic_year = ?', (school_urn, dataset, extractor_version, academic_year))
+                else:
+                    connection.execute('INSERT OR REPLACE INTO negative_results VALUES (?, ?, ?, ?, ?)', (school_urn, dataset, extractor_version, academic_year, time.time()))
+
+        if not published_data:
+            negative_cache_filter.add(key)
+
+def get_negative_cache_metrics(read_only: bool = False) -> dict:
+    """
+    Returns the counters of the negative cache.
+
+    The counters are kept in the negative cache, so they include the 
+    lookups made by every process since it was created. Only the pages 
+    found to have no data by the current version of their extractor are
+    counted as known to be empty.
+
+    Parameters
+    ----------
+    read_only : bool, optional
+        If True, the negative cache is opened read-only, and both counters
+        are 0 if it does not exist.
+
+    Returns
+    -------
+    metrics : dict
+        A dict containing the 'number_of_skips' and the 
+        'number_of_known_empty_pages', which are the pages checked within
+        the recheck interval.
+    """
+
+    connection = connect_to_negative_cache(read_only)
+
+    if connection is None:
+        return {'number_of_skips': 0, 'number_of_known_empty_pages': 0}
+
+    import sqlite3
+
+    with closing(connection):
+        number_of_skips = connection.execute("SELECT value FROM negative_cache_counters WHERE name = 'skips'").fetchone()[0]
+
+        # A negative cache opened read-only may not have been given the 
+        # extractor version yet, in which case none of its pages are known
+        try:
+            known_empty_page_counts = connection.execute('SELECT dataset, extractor_version, COUNT(*) FROM negative_results WHERE checked_time > ? GROUP BY dataset, extractor_version', (time.time() - get_negative_cache_recheck_interval(),)).fetchall()
+        except sqlite3.OperationalError:
+            known_empty_page_counts = []
+
+        number_of_known_empty_pages = sum(count for dataset, extractor_version, count in known_empty_page_counts if dataset in PAGE_EXTRACTORS and extractor_version == get_extractor_version(dataset))
+
+    return {'number_of_skips': number_of_skips, 'number_of_known_empty_pages': number_of_known_empty_pages}
+
+def get_run_deadline() -> float:
+    """
+    Returns the time by which the run must finish.
+
+    The deadline is read from the environment variable 
+    'UK_SCHOOL_RUN_DEADLINE' as a time.time() time, so that the worker 
+    processes of every host share the deadline of the run.
+
+    Returns
+    -------
+    run_deadline : float or None
+        The time.time() time of the deadline, or None if the run has no 
+        deadline.
+    """
+
+    run_deadline = os.environ.get(RUN_DEADLINE_ENVIRONMENT_VARIABLE)
+
+    return float(run_deadline) if run_deadline else None
+
+def get_task_deadline() -> float:
+    """
+    Returns the longest time each task may take.
+
+    The time is read from the environment variable 
+    'UK_SCHOOL_TASK_DEADLINE'.
+
+    Returns
+    -------
+    task_deadline : float or None
+        The number of seconds, or None if tasks have no deadline.
+    """
+
+    task_deadline = os.environ.get(TASK_DEADLINE_ENVIRONMENT_VARIABLE)
+
+    return float(task_deadline) if task_deadline else None
+
+@contextmanager
+def task_deadline():
+    """
+    A context manager giving the task run by this thread in its body the 
+    deadline returned by 'get_task_deadline()'.
+
+    The deadline is kept per thread, since with adaptive concurrency the 
+    tasks run in the threads of a single process. A task run within 
+    another task keeps the deadline of the outer task if it is earlier.
+    """
+
+    task_deadline = get_task_deadline()
+    previous_deadline = getattr(_task_deadline, 'deadline', None)
+
+    if task_deadline is not None:
+        _task_deadline.deadline = min(deadline for deadline in (previous_deadline, time.time() + task_deadline) if deadline is not None)
+
+    try:
+        yield
+    finally:
+        _task_deadline.deadline = previous_deadline
+
+def get_deadline() -> float:
+    """
+    Returns the earlier of the deadline of the run and the deadline of 
+    the task run by this thread.
+
+    Returns
+    -------
+    deadline : float or None
+        The time.time() time of the deadline, or None if there is no 
+        deadline.
+    """
+
+    deadlines = [deadline for deadline in (get_run_deadline(), getattr(_task_deadline, 'deadline', None)) if deadline is not None]
+
+    return min(deadlines) if deadlines else None
+
+def get_request_timeouts() -> Tuple[float, float]:
+    """
+    Returns the connect and read timeouts of a request.
+
+    The timeouts are read from the environment variables 
+    'UK_SCHOOL_CONNECT_TIMEOUT' and 'UK_SCHOOL_READ_TIMEOUT', and are 
+    shortened so that the request does not run past the deadline 
+    returned by 'get_deadline()'.
+
+    Returns
+    -------
+    connect_timeout : float
+        The longest time in seconds to wait for the connection.
+    read_timeout : float
+        The longest time in seconds to wait for each read of the response.
+
+    Raises
+    ------
+    TimeoutError
+        If the deadline has passed.
+    """
+
+    connect_timeout = float(os.environ.get(CONNECT_TIMEOUT_ENVIRONMENT_VARIABLE, DEFAULT_CONNECT_TIMEOUT))
+    read_timeout = float(os.environ.get(READ_TIMEOUT_ENVIRONMENT_VARIABLE, DEFAULT_READ_TIMEOUT))
+
+    deadline = get_deadline()
+
+    if deadline is not None:
+        remaining_time = deadline - time.time()
+
+        if remaining_time <= 0:
+            raise TimeoutError("The deadline of the task or of the run has passed.")
+
+        connect_timeout = min(connect_timeout, remaining_time)
+        read_timeout = min(read_timeout, remaining_time)
+
+    return connect_timeout, read_timeout
+
+def get_endpoint(url: str) -> str:
+    """
+    Returns the endpoint of a url, which is its host and the last 
+    segment of its path, such as 
+    'www.compare-school-performance.service.gov.uk/primary'.
+
+    Parameters
+    ----------
+    url : str
+        The url.
+
+    Returns
+    -------
+    endpoint : str
+        The endpoint of the url.
+    """
+
+    from urllib.parse import urlsplit
+
+    split_url = urlsplit(url)
+
+    return f"{split_url.netloc}/{split_url.path.rstrip('/').rsplit('/', 1)[-1]}"
+
+def record_timeout(url: str, error: Exception) -> None:
+    """
+    Appends a request that timed out to the file 'fetch_timeouts.jsonl' 
+    in the cache directory.
+
+    Each timeout is written as a single line, so the timeouts of 
+    different worker processes are not interleaved.
+
+    Parameters
+    ----------
+    url : str
+        The url of the request.
+    error : requests.Timeout
+        The timeout raised by the request.
+    """
+
+    import json
+    import requests
+
+    timeout = {'endpoint': get_endpoint(url), 'url': url, 'kind': 'connect' if isinstance(error, requests.ConnectTimeout) else 'read', 'time': time.time()}
+
+    with open(get_cache_path(TIMEOUTS_FILE_NAME), 'a', encoding='utf-8') as file:
+        file.write(json.dumps(timeout) + '\n')
+
+def get_timeout_counts(since: float = None) -> dict:
+    """
+    Returns the number of requests that timed out for each endpoint.
+
+    Parameters
+    ----------
+    since : float, optional
+        If given, only the timeouts after this time.time() time are 
+        counted.
+
+    Returns
+    -------
+    timeout_counts : dict
+        A dict mapping each endpoint returned by 'get_endpoint()' to its 
+        number of timeouts, from the most to the fewest.
+    """
+
+    import json
+    from collections import Counter
+
+    timeout_counts = Counter()
+
+    try:
+        with open(get_cache_path(TIMEOUTS_FILE_NAME), 'r', encoding='utf-8') as file:
+            for line in file:
+                timeout = json.loads(line)
+
+                if since is None or timeout['time'] >= since:
+                    timeout_counts[timeout['endpoint']] += 1
+    except FileNotFoundError:
+        pass
+
+    return dict(timeout_counts.most_common())
+
+def fetch_page(url: str, target_element: Tuple[str, str] = None) -> bytes:
+    """
+    Requests the page at the given url and returns its body.
+
+    Waits for the rate limit and, if adaptive concurrency is enabled, for
+    the concurrency controller before making the request. The request is
+    released from the controller whatever the outcome, and timeouts, 429
+    responses and 5xx responses are reported to it as overloaded 
+    requests. If hedging is enabled, a slow request is hedged
+    with a duplicate request as described in 'request_page_hedged()'.
+
+    The request is given the timeouts returned by 
+    'get_request_timeouts()', and every timeout is recorded with 
+    'record_timeout()'. No request is made once the deadline of the task
+    or of the run has passed.
+
+    The body is compressed with brotli or gzip in transit, and is 
+    decompressed as it is streamed.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page.
+    target_element : Tuple[str, str], optional
+        The tag name and id of the only element of the page that is 
+        needed. If given, the download is stopped once the closing tag of
+        the element has been received.
+
+    Returns
+    -------
+    content : bytes
+        The body of the response.
+
+    Raises
+    ------
+    TimeoutError
+        If the deadline passed before the request could be made.
+    """
+
+    import requests
+
+    user_agent = get_user_agent()
+    headers = {'User-Agent': user_agent, 'Accept-Encoding': get_accept_encoding()}
+
+    # Raises TimeoutError if the deadline has already passed
+    get_request_timeouts()
+
+    concurrency_controller = get_concurrency_controller()
+
+    if concurrency_controller is not None:
+        deadline = get_deadline()
+        start_time = concurrency_controller.acquire(timeout=None if deadline is None else max(deadline - time.time(), 0.0))
+
+        if start_time is None:
+            raise TimeoutError("The deadline of the task or of the run passed while waiting for the concurrency controller.")
+
+    overloaded = False
+
+    try:
+        wait_for_rate_limit()
+
+        timeouts = get_request_timeouts()
+        hedging_policy = get_hedging_policy()
+
+        if hedging_policy is None:
+            status_code, content = download_page(url, headers, target_element=target_element, timeouts=timeouts)
+        else:
+            status_code, content = request_page_hedged(url, headers, hedging_policy, target_element, timeouts)
+
+        overloaded = status_code == 429 or status_code >= 500
+    except requests.Timeout as error:
+        overloaded = True
+        record_timeout(url, error)
+        raise
+    finally:
+        # The request is released whatever it raised, so that no error 
+        # can leave it in flight
+        if concurrency_controller is not None:
+            concurrency_controller.release(start_time, overloaded=overloaded)
+
+    _last_status_code.value = status_code
+
+    if is_archive_enabled():
+        write_archive_record(url, content, target_element)
+
+    return content
+
+def get_accept_encoding() -> str:
+    """
+    Returns the content codings that the responses may be compressed 
+    with, which include brotli if a brotli decoder is installed.
+
+    Returns
+    -------
+    accept_encoding : str
+        The value of the 'Accept-Encoding' header.
+    """
+
+    from importlib.util import find_spec
+
+    if find_spec('brotli') is not None or find_spec('brotlicffi') is not None:
+        return 'br, gzip, deflate'
+
+    return 'gzip, deflate'
+
+class TargetElementDetector:
+    """
+    Detects the closing tag of an element in a page that is being 
+    streamed.
+
+    The decoded text is scanned for the start tag of the element, and 
+    only the text from the start tag onwards is given to an incremental 
+    HTML parser, which tracks the nesting of tags with the same name to 
+    find the matching closing tag.
+
+    Attributes
+    ----------
+    is_complete : bool
+        True once the closing tag of the element has been seen.
+
+    Methods
+    -------
+    feed(chunk)
+        Reads the next chunk of the page and returns 'is_complete'.
+    """
+
+    def __init__(self, tag: str, element_id: str):
+        """
+        Parameters
+        ----------
+        tag : str
+            The tag name of the element, e.g. 'table'.
+        element_id : str
+            The id of the element, e.g. 'England'.
+        """
+
+        import codecs
+        import re
+        from html.parser import HTMLParser
+
+        self.is_complete = False
+
+        self._tag = tag.lower()
+        self._depth = 0
+        self._is_start_tag_found = False
+        self._pending_text = ''
+        self._start_tag_pattern = re.compile(rf"""<{re.escape(self._tag)}\b[^>]*\bid\s*=\s*["']?{re.escape(element_id)}(?=["'\s/>])""", re.IGNORECASE)
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        self._parser = HTMLParser(convert_charrefs=False)
+        self._parser.handle_starttag = self._handle_starttag
+        self._parser.handle_endtag = self._handle_endtag
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Reads the next chunk of the page.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The next chunk of the decompressed body.
+
+        Returns
+        -------
+        is_complete : bool
+            True once the closing tag of the element has been seen.
+        """
+
+        if self.is_complete:
+            return True
+
+        text = self._decoder.decode(chunk)
+
+        if not self._is_start_tag_found:
+            self._pending_text += text
+            match = self._start_tag_pattern.search(self._pending_text)
+
+            if match is None:
+                # Keeps a start tag that may be cut off at the end of the
+                # chunk
+                tag_start = self._pending_text.rfind('<')
+                self._pending_text = self._pending_text[tag_start:] if tag_start != -1 else ''
+                return False
+
+            text = self._pending_text[match.start():]
+            self._pending_text = ''
+            self._is_start_tag_found = True
+
+        self._parser.feed(text)
+
+        return self.is_complete
+
+    def _handle_starttag(self, tag: str, attributes: list) -> None:
+        if tag == self._tag:
+            self._depth += 1
+
+    def _handle_endtag(self, tag: str) -> None:
+        if tag == self._tag and self._depth > 0:
+            self._depth -= 1
+
+            if self._depth == 0:
+                self.is_complete = True
+
+def get_http_backend() -> str:
+    """
+    Returns the HTTP client used to make requests.
+
+    The backend is read from the environment variable 
+    'UK_SCHOOL_HTTP_BACKEND'. If the variable is not set, 'requests' is 
+    used.
+
+    Returns
+    -------
+    http_backend : str
+        One of 'requests' or 'http2'.
+    """
+
+    http_backend = os.environ.get(HTTP_BACKEND_ENVIRONMENT_VARIABLE, 'requests')
+
+    if http_backend not in HTTP_BACKENDS:
+        raise ValueError(f"Unknown HTTP backend '{http_backend}'. Expected one of {HTTP_BACKENDS}.")
+
+    return http_backend
+
+def get_http2_client() -> httpx.Client:
+    """
+    Returns the HTTP/2 client shared by every thread of this process.
+
+    The client only speaks HTTP/2, negotiated with ALPN for https urls 
+    and with prior knowledge for http urls, so that the concurrent 
+    requests of every thread are multiplexed over at most 
+    'HTTP2_MAXIMUM_CONNECTIONS' connections to each host.
+
+    Returns
+    -------
+    http2_client : httpx.Client
+        The process-wide HTTP/2 client.
+    """
+
+    global _http2_client
+
+    try:
+        import httpx
+        import h2
+    except ImportError:
+        raise ImportError("The packages 'httpx' and 'h2' are required by the HTTP/2 backend. Please install them with 'conda install httpx h2'.")
+
+    with _rate_limit_lock:
+        if _http2_client is None:
+            limits = httpx.Limits(max_connections=HTTP2_MAXIMUM_CONNECTIONS)
+            _http2_client = httpx.Client(http1=False, http2=True, limits=limits, timeout=None, follow_redirects=True)
+
+    return _http2_client
+
+class CancelEvent(threading.Event):
+    """
+    An event which, when it is set, also calls the functions registered 
+    with 'add_callback()', e.g. to close the connection of a request that
+    is still waiting for its response headers.
+
+    Methods
+    -------
+    add_callback(callback)
+        Registers a function to be called when the event is set.
+    set()
+        Sets the event and calls the registered functions.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Registers a function to be called when the event is set. The 
+        function is called at once if the event is already set.
+
+        Parameters
+        ----------
+        callback : Callable[[], None]
+            The function to be called.
+        """
+
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback()
+
+    def set(self) -> None:
+        """
+        Sets the event and calls the registered functions.
+        """
+
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            callback()
+
+def open_cancellable_session(cancel_event: CancelEvent) -> requests.Session:
+    """
+    Returns a new session whose connections are shut down when the given
+    event is set.
+
+    Shutting down the socket of a connection makes a request that is 
+    still waiting for its response headers fail at once, rather than 
+    holding its thread until the read timeout.
+
+    Parameters
+    ----------
+    cancel_event : CancelEvent
+        The event cancelling the requests of the session.
+
+    Returns
+    -------
+    session : requests.Session
+        The session.
+    """
+
+    import socket
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    connections = []
+    connections_lock = threading.Lock()
+
+    def shut_down_connections():
+        with connections_lock:
+            for connection in connections:
+                if connection.sock is not None:
+                    try:
+                        connection.sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+    def get_tracked_pool_class(pool_class):
+        class TrackedConnectionPool(pool_class):
+            def _new_conn(self):
+                connection = super()._new_conn()
+
+                with connections_lock:
+                    connections.append(connection)
+
+                return connection
+
+        return TrackedConnectionPool
+
+    adapter = HTTPAdapter()
+    adapter.poolmanager.pool_classes_by_scheme = {'http': get_tracked_pool_class(HTTPConnectionPool), 'https': get_tracked_pool_class(HTTPSConnectionPool)}
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    cancel_event.add_callback(shut_down_connections)
+
+    return session
+
+def download_page(url: str, headers: dict, cancel_event: threading.Event = None, target_element: Tuple[str, str] = None, timeouts: Tuple[float, float] = None) -> Tuple[int, bytes]:
+    """
+    Makes a single request for the page at the given url, using the HTTP
+    backend returned by 'get_http_backend()'.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page.
+    headers : dict
+        The headers of the request.
+    cancel_event : threading.Event, optional
+        If given, the body is streamed and the download is abandoned as
+        soon as the event is set. If it is a CancelEvent, a request still
+        waiting for its response headers is also abandoned, except with 
+        the HTTP/2 backend, whose connections are shared by other 
+        requests.
+    target_element : Tuple[str, str], optional
+        If given, the body is streamed and the connection is closed as 
+        soon as the closing tag of the element with this tag name and id
+        has been received.
+    timeouts : Tuple[float, float], optional
+        The connect and read timeouts of the request. Defaults to those 
+        returned by 'get_request_timeouts()'.
+
+    Returns
+    -------
+    status_code : int or None
+        The status code of the response, or None if the download was 
+        cancelled.
+    content : bytes or None
+        The body of the response, or None if the download was cancelled.
+    """
+
+    import requests
+    from urllib3.exceptions import ReadTimeoutError
+
+    if timeouts is None:
+        timeouts = get_request_timeouts()
+
+    if get_http_backend() == 'http2':
+        return download_page_http2(url, headers, cancel_event, target_element, timeouts)
+
+    if cancel_event is None and target_element is None:
+        page = requests.get(url, headers=headers, timeout=timeouts)
+
+        return page.status_code, page.content
+
+    session = open_cancellable_session(cancel_event) if isinstance(cancel_event, CancelEvent) else requests.Session()
+
+    # Closing a streamed response before its body has been read closes 
+    # the connection, which stops the rest of the body being sent
+    with session:
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeouts) as page:
+                try:
+                    return read_page_stream(page.status_code, page.iter_content(chunk_size=STREAM_CHUNK_SIZE), cancel_event, target_element)
+                except requests.ConnectionError as error:
+                    # requests raises a read timeout of a streamed body as
+                    # a connection error
+                    if error.args and isinstance(error.args[0], ReadTimeoutError):
+                        raise requests.ReadTimeout(str(error)) from error
+                    raise
+        except requests.RequestException:
+            # A request whose connection was shut down by the cancel event
+            # fails with a connection error
+            if cancel_event is not None and cancel_event.is_set():
+                return None, None
+            raise
+
+def read_page_stream(status_code: int, chunks: Iterator[bytes], cancel_event: threading.Event = None, target_element: Tuple[str, str] = None) -> Tuple[int, bytes]:
+    """
+    Reads the decompressed chunks of a streamed response until the body 
+    ends, the download is cancelled or the target element is complete.
+
+    Parameters
+    ----------
+    status_code : int
+        The status code of the response.
+    chunks : Iterator[bytes]
+        The decompressed chunks of the body.
+    cancel_event : threading.Event, optional
+        If given, the download is abandoned as soon as the event is set.
+    target_element : Tuple[str, str], optional
+        If given, the tag name and id of the element after whose closing
+        tag the rest of the body is not read.
+
+    Returns
+    -------
+    status_code : int or None
+        The status code of the response, or None if the download was 
+        cancelled.
+    content : bytes or None
+        The body read, or None if the download was cancelled.
+    """
+
+    target_element_detector = TargetElementDetector(*target_element) if target_element is not None else None
+    content = []
+
+    for chunk in chunks:
+        if cancel_event is not None and cancel_event.is_set():
+            return None, None
+
+        content.append(chunk)
+
+        if target_element_detector is not None and target_element_detector.feed(chunk):
+            break
+
+    return status_code, b''.join(content)
+
+def download_page_http2(url: str, headers: dict, cancel_event: threading.Event = None, target_element: Tuple[str, str] = None, timeouts: Tuple[float, float] = None) -> Tuple[int, bytes]:
+    """
+    Makes a single request for the page at the given url over HTTP/2.
+
+    Timeouts and connection errors are raised as their 'requests' 
+    equivalents, so that the callers of 'download_page()' handle both 
+    backends in the same way.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page.
+    headers : dict
+        The headers of the request.
+    cancel_event : threading.Event, optional
+        If given, the download is abandoned as soon as the event is set.
+    target_element : Tuple[str, str], optional
+        If given, the stream is closed as soon as the closing tag of the 
+        element with this tag name and id has been received.
+    timeouts : Tuple[float, float], optional
+        The connect and read timeouts of the request. Defaults to those 
+        returned by 'get_request_timeouts()'.
+
+    Returns
+    -------
+    status_code : int or None
+        The status code of the response, or None if the download was 
+        cancelled.
+    content : bytes or None
+        The body of the response, or None if the download was cancelled.
+    """
+
+    import httpx
+    import requests
+
+    if timeouts is None:
+        timeouts = get_request_timeouts()
+
+    http2_client = get_http2_client()
+    connect_timeout, read_timeout = timeouts
+
+    try:
+        with http2_client.stream('GET', url, headers=headers, timeout=httpx.Timeout(read_timeout, connect=connect_timeout)) as page:
+            return read_page_stream(page.status_code, page.iter_bytes(chunk_size=STREAM_CHUNK_SIZE), cancel_event, target_element)
+    except httpx.ConnectTimeout as error:
+        raise requests.ConnectTimeout(str(error)) from error
+    except httpx.TimeoutException as error:
+        raise requests.Timeout(str(error)) from error
+    except httpx.TransportError as error:
+        raise requests.ConnectionError(str(error)) from error
+
+def request_page_hedged(url: str, headers: dict, hedging_policy: HedgingPolicy, target_element: Tuple[str, str] = None, timeouts: Tuple[float, float] = None) -> Tuple[int, bytes]:
+    """
+    Requests the page at the given url, hedging the request if it is slow.
+
+    The request is made from the calling thread. If it has not responded
+    after the hedge delay of the policy, and the hedge budget allows it, 
+    a duplicate request is sent from the thread pool returned by 
+    'get_hedge_executor()', so the pool only holds hedges. The first 
+    successful response is returned and the other request is cancelled,
+    even if it is still waiting for its response headers, as described in
+    'download_page()'.
+
+    Parameters
+    ----------
+    url : str
+        The url of the page.
+    headers : dict
+        The headers of the request.
+    hedging_policy : HedgingPolicy
+        The policy deciding when the request is hedged.
+    target_element : Tuple[str, str], optional
+        The tag name and id of the only element of the page that is 
+        needed.
+    timeouts : Tuple[float, float], optional
+        The connect and read timeouts of each request.
+
+    Returns
+    -------
+    status_code : int
+        The status code of the first successful response.
+    content : bytes
+        The body of the first successful response.
+    """
+
+    start_time = time.monotonic()
+    hedge_delay = hedging_policy.get_hedge_delay()
+
+    primary_cancel_event = CancelEvent()
+    hedge_cancel_event = CancelEvent()
+    primary_finished = threading.Event()
+    winners = []
+    winners_lock = threading.Lock()
+
+    def timed_download_page(cancel_event):
+        request_start_time = time.monotonic()
+        response = download_page(url, headers, cancel_event, target_element, timeouts)
+
+        if response[0] is not None:
+            hedging_policy.record_latency(time.monotonic() - request_start_time)
+
+        return response
+
+    def claim_response(request, response):
+        with winners_lock:
+            if winners or response[0] is None:
+                return False
+
+            winners.append(request)
+
+        return True
+
+    def hedge():
+        # The hedge may have waited in the pool, so the delay is measured
+        # from the start of the original request
+        if primary_finished.wait(max(0.0, start_time + hedge_delay - time.monotonic())) or not hedging_policy.try_hedge():
+            return None
+
+        wait_for_rate_limit()
+        response = timed_download_page(hedge_cancel_event)
+
+        if claim_response('hedge', response):
+            hedging_policy.record_hedge_win()
+            primary_cancel_event.set()
+
+        return response
+
+    hedging_policy.record_request()
+
+    hedge_future = None if hedge_delay is None else get_hedge_executor().submit(hedge)
+
+    primary_error = None
+
+    try:
+        response = timed_download_page(primary_cancel_event)
+    except Exception as error:
+        primary_error = error
+        response = (None, None)
+    finally:
+        primary_finished.set()
+
+    if claim_response('primary', response):
+        hedge_cancel_event.set()
+        return response
+
+    if hedge_future is not None:
+        try:
+            hedge_response = hedge_future.result()
+        except Exception:
+            hedge_response = None
+
+        if winners == ['hedge']:
+            return hedge_response
+
+    if primary_error is not None:
+        # Every request failed, so the error of the original request is
+        # raised
+        raise primary_error
+
+    return response
+
+# The fields scraped from each school page, given as a mapping from the 
+# label of a table row to a mapping from the 'headers' attribute of a cell
+# in that row to the name of the field. The order of the fields is the 
+# order of the columns returned. To scrape a new field, or to follow a 
+# change to the layout of the gov.uk website, only these mappings need 
+# to change.
+SCHOOL_PRIMARY_FIELD_SPEC = {
+    'Reading progress score': {'band': 'reading_band', 'score': 'reading_progress_score', 'confidence-interval': 'reading_progress_score_confidence_interval'},
+    'Writing progress score': {'band': 'writing_band', 'score': 'writing_progress_score', 'confidence-interval': 'writing_progress_score_confidence_interval'},
+    'Maths progress score': {'band': 'maths_band', 'score': 'maths_progress_score', 'confidence-interval': 'maths_progress_score_confidence_interval'},
+    'Pupils meeting the expected standard in reading, writing and maths': {'school': '%students_meeting_expected_standard_school', 'la': '%students_meeting_expected_standard_local_authority', 'england': '%students_meeting_expected_standard_england'},
+    'Pupils achieving at a higher standard in reading, writing and maths': {'school': '%students_achieving_higher_standard_school', 'la': '%students_achieving_higher_standard_local_authority', 'england': '%students_achieving_higher_standard_england'},
+    'Average score in reading': {'school': 'average_score_reading_school', 'la': 'average_score_reading_local_authority', 'england': 'average_score_reading_england'},
+    'Average score in maths': {'school': 'average_score_maths_school', 'la': 'average_score_maths_local_authority', 'england': 'average_score_maths_england'},
+}
+
+SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC = {
+    'Overall absence': {'school': 'school_overall_absence'},
+    'Persistent absence': {'school': 'school_persistent_absence'},
+    'Total number of pupils on roll (all ages)': {'school': 'school_total_pupils_on_roll', 'england': 'england_total_pupils_on_role'},
+    'Girls on roll': {'school': '%girls_school', 'england': '%girls_england'},
+    'Boys on roll': {'school': '%boys_school', 'england': '%boys_england'},
+    'Pupils with an Education, Health and Care (EHC) plan': {'school': '%students_sen_school', 'england': '%students_sen_england'},
+    'Pupils with special educational needs (SEN) support': {'school': '%students_sen_support_school', 'england': '%students_sen_support_england'},
+    'Pupils whose first language is not English': {'school': '%eal_students_school', 'england': '%eal_students_england'},
+    'Pupils eligible for free school meals at any time during the past 6 years': {'school': '%pupils_eligible_free_school_meals_school', 'england': '%pupils_eligible_free_school_meals_england'},
+}
+
+def normalise_label(label: str) -> str:
+    """
+    Returns the label with its whitespace collapsed and in lower case.
+
+    Parameters
+    ----------
+    label : str
+        The label of a table row. 
+
+    Returns
+    -------
+    normalised_label : str
+        The normalised label.
+    """
+
+    return ' '.join(label.split()).lower()
+
+def compile_field_spec(field_spec: dict) -> Tuple[dict, Tuple[str, ...]]:
+    """
+    Compiles a field spec into the lookup used by 'extract_fields()'.
+
+    Parameters
+    ----------
+    field_spec : dict
+        A mapping from the label of a table row to a mapping from the 
+        'headers' attribute of a cell to the name of a field, such as 
+        'SCHOOL_PRIMARY_FIELD_SPEC'.
+
+    Returns
+    -------
+    row_lookup : dict
+        A mapping from each normalised row label to a mapping from the 
+        'headers' attribute of a cell to the name of a field.
+    field_names : Tuple[str, ...]
+        The names of every field in the spec, in order.
+    """
+
+    row_lookup = {}
+    field_names = []
+
+    for label, cell_fields in field_spec.items():
+        row_lookup[normalise_label(label)] = dict(cell_fields)
+        field_names.extend(cell_fields.values())
+
+    if len(set(field_names)) != len(field_names):
+        raise ValueError("A field spec cannot contain the same field more than once.")
+
+    return row_lookup, tuple(field_names)
+
+def parse_field_value(text: str):
+    """
+    Converts the text of a table cell into the value of a field.
+
+    Percentages and numbers such as '44.3%' or '4,647,851' are converted 
+    to a float or an int. Empty cells are converted to None. Any other 
+    text, such as a band or a confidence interval, is returned unchanged.
+
+    Parameters
+    ----------
+    text : str
+        The stripped text of the table cell.
+
+    Returns
+    -------
+    value : int, float, str or None
+        The value of the field.
+    """
+
+    if not text:
+        return None
+
+    number = text.rstrip('%').replace(',', '')
+
+    try:
+        if '.' in number:
+            return float(number)
+        return int(number)
+    except ValueError:
+        return text
+
+def extract_fields(soup: BeautifulSoup, compiled_field_spec: Tuple[dict, Tuple[str, ...]]) -> dict:
+    """
+    Returns the value of every field in a compiled field spec.
+
+    Makes a single pass over the rows of every table on the page. The 
+    label of each row is looked up in the compiled spec, and if it is 
+    found, the row's cells are matched to fields by their 'headers' 
+    attribute. Rows that are not in the spec are skipped without looking
+    at their cells. Fields that are not found are given the value None.
+
+    Parameters
+    ----------
+    soup : BeautifulSoup
+        The BeautifulSoup object representing the page.
+    compiled_field_spec : Tuple[dict, Tuple[str, ...]]
+        The field spec returned by 'compile_field_spec()'.
+
+    Returns
+    -------
+    fields : dict
+        A dict mapping the name of every field to its value.
+    """
+
+    row_lookup, field_names = compiled_field_spec
+
+    fields = dict.fromkeys(field_names)
+
+    for row in soup.select('table tr'):
+        label_element = row.find(class_='label') or row.find('th')
+        if label_element is None:
+            continue
+
+        cell_fields = row_lookup.get(normalise_label(label_element.get_text()))
+        if cell_fields is None:
+            continue
+
+        for cell in row.find_all('td'):
+            cell_headers = cell.get('headers') or []
+            if isinstance(cell_headers, str):
+                cell_headers = cell_headers.split()
+
+            for cell_header in cell_headers:
+                if cell_header in cell_fields:
+                    value_element = cell.find(class_='value') or cell
+                    fields[cell_fields[cell_header]] = parse_field_value(value_element.get_text(' ', strip=True))
+
+    return fields
+
+def split_field_spec(field_spec: dict, cell_header: str) -> Tuple[dict, dict]:
+    """
+    Splits a field spec into the fields of the cells with the given 
+    'headers' attribute and every other field.
+
+    Parameters
+    ----------
+    field_spec : dict
+        A field spec such as 'SCHOOL_PRIMARY_FIELD_SPEC'.
+    cell_header : str
+        The 'headers' attribute of the cells to be split off, e.g. 
+        'england'.
+
+    Returns
+    -------
+    other_field_spec : dict
+        The field spec without the cells with the given header.
+    cell_header_field_spec : dict
+        The field spec containing only the cells with the given header.
+    """
+
+    other_field_spec = {}
+    cell_header_field_spec = {}
+
+    for label, cell_fields in field_spec.items():
+        other_cell_fields = {header: field_name for header, field_name in cell_fields.items() if header != cell_header}
+
+        if other_cell_fields:
+            other_field_spec[label] = other_cell_fields
+        if cell_header in cell_fields:
+            cell_header_field_spec[label] = {cell_header: cell_fields[cell_header]}
+
+    return other_field_spec, cell_header_field_spec
+
+COMPILED_SCHOOL_PRIMARY_FIELD_SPEC = compile_field_spec(SCHOOL_PRIMARY_FIELD_SPEC)
+COMPILED_SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC = compile_field_spec(SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC)
+
+# The England averages are the same on every school's pages, so they are
+# only taken once, by 'scrape_england_averages()', from the record 
+# extracted from the pages of the first school, and are left out of the 
+# data of each school
+COMPILED_SCHOOL_PRIMARY_PER_SCHOOL_FIELD_SPEC, COMPILED_SCHOOL_PRIMARY_ENGLAND_FIELD_SPEC = (compile_field_spec(field_spec) for field_spec in split_field_spec(SCHOOL_PRIMARY_FIELD_SPEC, 'england'))
+COMPILED_SCHOOL_ABSENCE_AND_PUPIL_PER_SCHOOL_FIELD_SPEC, COMPILED_SCHOOL_ABSENCE_AND_PUPIL_ENGLAND_FIELD_SPEC = (compile_field_spec(field_spec) for field_spec in split_field_spec(SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC, 'england'))
+
+ENGLAND_FIELDS = COMPILED_SCHOOL_ABSENCE_AND_PUPIL_ENGLAND_FIELD_SPEC[1] + COMPILED_SCHOOL_PRIMARY_ENGLAND_FIELD_SPEC[1]
+LOCAL_AUTHORITY_FIELDS = compile_field_spec(split_field_spec(SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC, 'la')[1])[1] + compile_field_spec(split_field_spec(SCHOOL_PRIMARY_FIELD_SPEC, 'la')[1])[1]
+
+# The column holding the DfE code of the local authority of each school,
+# which is used as the id of its local authority averages
+LOCAL_AUTHORITY_CODE_FIELD = 'local_authority_code'
+
+# The measures summarised while the schools are scraped, which are every 
+# numeric school-specific field
+STREAMING_AGGREGATE_MEASURES = tuple(field_name for field_name in COMPILED_SCHOOL_ABSENCE_AND_PUPIL_PER_SCHOOL_FIELD_SPEC[1] + COMPILED_SCHOOL_PRIMARY_PER_SCHOOL_FIELD_SPEC[1] if field_name not in LOCAL_AUTHORITY_FIELDS and not field_name.endswith(('_band', '_confidence_interval')))
+STREAMING_AGGREGATE_COVARIANCE_MEASURE = '%eal_students_school'
+STREAMING_AGGREGATE_COVARIANCE_MEASURES = tuple(field_name for field_name in STREAMING_AGGREGATE_MEASURES if field_name.endswith('_progress_score'))
+STREAMING_AGGREGATE_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def extract_school_primary_fields(soup: BeautifulSoup) -> dict:
+    """
+    Returns every field of 'SCHOOL_PRIMARY_FIELD_SPEC' on a school's 
+    primary results page.
+
+    Parameters
+    ----------
+    soup : BeautifulSoup
+        The BeautifulSoup object representing the page.
+
+    Returns
+    -------
+    fields : dict
+        A dict mapping the name of every field to its value.
+    """
+
+    return extract_fields(soup, COMPILED_SCHOOL_PRIMARY_FIELD_SPEC)
+
+def extract_school_absence_and_pupil_fields(soup: BeautifulSoup) -> dict:
+    """
+    Returns every field of 'SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC' on a 
+    school's absence and pupil population page.
+
+    Parameters
+    ----------
+    soup : BeautifulSoup
+        The BeautifulSoup object representing the page.
+
+    Returns
+    -------
+    fields : dict
+        A dict mapping the name of every field to its value.
+    """
+
+    fields = extract_fields(soup, COMPILED_SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC)
+    fields[LOCAL_AUTHORITY_CODE_FIELD] = extract_local_authority_code(soup)
+
+    return fields
+
+def extract_local_authority_code(soup: BeautifulSoup) -> int:
+    """
+    Returns the DfE code of the local authority of a school.
+
+    The code is the first three digits of the school's DfE number, which 
+    is shown on its pages in the form 'LLL/EEEE' next to the label 
+    'DfE number'.
+
+    Parameters
+    ----------
+    soup : BeautifulSoup
+        The BeautifulSoup object representing the page.
+
+    Returns
+    -------
+    local_authority_code : int
+        The DfE code of the local authority, or None if the page does not
+        show the school's DfE number.
+    """
+
+    import re
+
+    for label in soup.find_all(string=re.compile(r'DfE number', re.IGNORECASE)):
+        dfe_number = re.search(r'\b(\d{3})\s*/\s*\d{4}\b', label.parent.parent.get_text(' ', strip=True))
+        if dfe_number is not None:
+            return int(dfe_number.group(1))
+
+    return None
+
+# The extractors used by 'extract_page()', with the field spec each of 
+# them depends on
+PAGE_EXTRACTORS = {
+    'school_identification': (extract_school_identification_rows, None),
+    'school_primary': (extract_school_primary_fields, SCHOOL_PRIMARY_FIELD_SPEC),
+    'school_absence_and_pupil': (extract_school_absence_and_pupil_fields, SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC),
+}
+
+PROGRESS_BANDS = ('WELL ABOVE AVERAGE', 'ABOVE AVERAGE', 'AVERAGE', 'BELOW AVERAGE', 'WELL BELOW AVERAGE')
+
+QUARANTINE_FILE_NAME = 'uk_school_data_quarantine.jsonl'
+
+ENGLAND_AVERAGES_FILE_NAME = 'uk_england_averages.csv'
+LOCAL_AUTHORITY_AVERAGES_FILE_NAME = 'uk_local_authority_averages.csv'
+ENGLAND_AVERAGES_MAXIMUM_SCHOOLS = 5
+STREAMING_AGGREGATES_DIRECTORY_NAME = 'streaming_aggregates'
+SAMPLE_DATA_FILE_NAME = 'uk_school_sample_data.csv'
+SAMPLE_OUTPUT_FILE_NAME = 'uk_primary_school_sample.csv'
+SAMPLE_STRATUM_COLUMNS = ['parliamentary_constituency', 'type_of_school']
+DEFAULT_SAMPLE_SEED = 0
+
+def validate_school_data(school_data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Splits a batch of scraped data into valid and invalid rows.
+
+    Every check is applied to a whole column at once. Missing values are
+    allowed, since the gov.uk website does not publish every measure for
+    every school. The values in 'NO_DATA_VALUES', which the website shows
+    in place of a suppressed or unpublished measure, are replaced by 
+    missing values first. The checks applied to each column depend on 
+    its name:
+        - 'school_urn' must be a positive whole number.
+        - 'school_name' and 'type_of_school' must not be empty.
+        - bands must be one of 'PROGRESS_BANDS'.
+        - confidence intervals must have the form '(lower, upper)' with 
+          lower <= progress score <= upper.
+        - every other field in a field spec must be numeric.
+        - percentages must be between 0 and 100.
+        - England and local authority averages must be greater than 0.
+
+    Parameters
+    ----------
+    school_data : pd.DataFrame
+        A batch of school identification information or school data.
+
+    Returns
+    -------
+    valid_school_data : pd.DataFrame
+        The rows that passed every check, with the values in 
+        'NO_DATA_VALUES' replaced by missing values.
+    invalid_school_data : pd.DataFrame
+        The rows that failed at least one check, with an additional 
+        column 'validation_errors' describing the checks that failed.
+    """
+
+    import pandas as pd
+
+    spec_fields = set(COMPILED_SCHOOL_PRIMARY_FIELD_SPEC[1]) | set(COMPILED_SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC[1])
+
+    spec_columns = [column for column in school_data.columns if column in spec_fields]
+    no_data = school_data[spec_columns].isin(NO_DATA_VALUES)
+
+    if no_data.any(axis=None):
+        school_data = school_data.copy()
+        school_data[spec_columns] = school_data[spec_columns].mask(no_data)
+
+    failed_checks = {}
+
+    for column in school_data.columns:
+        values = school_data[column]
+        present = values.notna()
+
+        if column == 'school_urn':
+            school_urns = pd.to_numeric(values, errors='coerce')
+            failed_checks[f'{column} is not a positive whole number'] = ~((school_urns > 0) & (school_urns % 1 == 0))
+        elif column in ('school_name', 'type_of_school'):
+            failed_checks[f'{column} is empty'] = ~present | (values.astype(str).str.strip() == '')
+        elif column.endswith('_band'):
+            failed_checks[f'{column} is not a known band'] = present & ~values.isin(PROGRESS_BANDS)
+        elif column.endswith('_confidence_interval'):
+            bounds = values.astype('string').str.extract(r'^\(\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\)$').astype(float)
+            failed_checks[f'{column} is not of the form (lower, upper)'] = present & bounds[0].isna()
+
+            score_column = column[:-len('_confidence_interval')]
+            if score_column in school_data.columns:
+                scores = pd.to_numeric(school_data[score_column], errors='coerce')
+                failed_checks[f'{score_column} is outside {column}'] = (scores < bounds[0]) | (scores > bounds[1])
+        elif column in spec_fields:
+            numbers = pd.to_numeric(values, errors='coerce')
+            failed_checks[f'{column} is not numeric'] = present & numbers.isna()
+
+            if column.startswith('%'):
+                failed_checks[f'{column} is not between 0 and 100'] = (numbers < 0) | (numbers > 100)
+            if column.endswith('_england') or column.endswith('_local_authority'):
+                failed_checks[f'{column} is not greater than 0'] = numbers <= 0
+
+    failed_checks = pd.DataFrame({description: failed.fillna(False).astype(bool) for description, failed in failed_checks.items()}, index=school_data.index)
+    invalid = failed_checks.any(axis=1)
+
+    valid_school_data = school_data[~invalid]
+    invalid_school_data = school_data[invalid].copy()
+
+    validation_errors = pd.Series('', index=invalid_school_data.index, dtype=object)
+    for description, failed in failed_checks[invalid].items():
+        validation_errors[failed] += description + '; '
+
+    invalid_school_data['validation_errors'] = validation_errors.str[:-2]
+
+    return valid_school_data, invalid_school_data
+
+def quarantine_school_data(invalid_school_data: pd.DataFrame, stage: str) -> None:
+    """
+    Appends the rows that failed validation to the quarantine file.
+
+    The quarantine file 'uk_school_data_quarantine.jsonl' in the cache 
+    directory contains one JSON object per row. Every row of the batch is 
+    appended with a single write, so that the batches written by 
+    different worker processes are not interleaved.
+
+    Parameters
+    ----------
+    invalid_school_data : pd.DataFrame
+        The rows returned by 'validate_school_data()' that failed 
+        validation.
+    stage : str
+        The stage that scraped the rows.
+    """
+
+    if invalid_school_data.empty:
+        return
+
+    quarantined_rows = invalid_school_data.assign(stage=stage).to_json(orient='records', lines=True)
+
+    if not quarantined_rows.endswith('\n'):
+        quarantined_rows += '\n'
+
+    with open(get_cache_path(QUARANTINE_FILE_NAME), 'a', encoding='utf-8') as file:
+        file.write(quarantined_rows)
+
+def get_unfinished_reason(error: Exception) -> str:
+    """
+    Returns the reason a work item was not finished.
+
+    Parameters
+    ----------
+    error : Exception
+        The requests.Timeout, TimeoutError or ArchiveMissError raised 
+        while obtaining the work item.
+
+    Returns
+    -------
+    reason : str
+        'timeout' if a request timed out, 'not_archived' if a page was not
+        in the raw HTML archive in offline mode, or 'deadline' if the 
+        deadline of the task or of the run passed.
+    """
+
+    import requests
+
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+
+    if isinstance(error, ArchiveMissError):
+        return 'not_archived'
+
+    return 'deadline'
+
+def record_unfinished_work(stage: str, unfinished_items: List[Tuple[str, list, str]]) -> None:
+    """
+    Appends the work items that were not finished to the file 
+    'unfinished_work.jsonl' in the cache directory, so that they can be
+    obtained by a later pass with 'retry_unfinished_work()'.
+
+    The items are appended with a single write while holding the lock 
+    taken by 'remove_unfinished_work()', so that items appended while the
+    file is rewritten are not lost.
+
+    Parameters
+    ----------
+    stage : str
+        The stage of the work items. Either 'identification' or 'schools'.
+    unfinished_items : List[Tuple[str, list, str]]
+        The key and item of each work item, in the format returned by 
+        'get_crawl_items()', and the reason it was not finished, as 
+        returned by 'get_unfinished_reason()'.
+    """
+
+    import json
+
+    if not unfinished_items:
+        return
+
+    recorded_time = time.time()
+    unfinished_work = ''.join(json.dumps({'stage': stage, 'key': item_key, 'item': item, 'reason': reason, 'time': recorded_time}) + '\n' for item_key, item, reason in unfinished_items)
+
+    unfinished_work_path = get_cache_path(UNFINISHED_WORK_FILE_NAME)
+
+    with lock_cache_file(unfinished_work_path):
+        with open(unfinished_work_path, 'a', encoding='utf-8') as file:
+            file.write(unfinished_work)
+
+def read_unfinished_work(stage: str) -> List[Tuple[str, list]]:
+    """
+    Returns the work items of the given stage recorded by 
+    'record_unfinished_work()'.
+
+    Parameters
+    ----------
+    stage : str
+        The stage of the work items. Either 'identification' or 'schools'.
+
+    Returns
+    -------
+    unfinished_items : List[Tuple[str, list]]
+        The key and item of each unfinished work item, once each.
+    """
+
+    import json
+
+    unfinished_items = {}
+
+    try:
+        with open(get_cache_path(UNFINISHED_WORK_FILE_NAME), 'r', encoding='utf-8') as file:
+            for line in file:
+                unfinished_work = json.loads(line)
+
+                if unfinished_work['stage'] == stage:
+                    unfinished_items[unfinished_work['key']] = unfinished_work['item']
+    except FileNotFoundError:
+        pass
+
+    return list(unfinished_items.items())
+
+def remove_unfinished_work(stage: str, recorded_before: float) -> None:
+    """
+    Removes the work items of the given stage that were recorded before 
+    the given time.
+
+    Parameters
+    ----------
+    stage : str
+        The stage of the work items. Either 'identification' or 'schools'.
+    recorded_before : float
+        The time.time() time before which the work items were recorded.
+    """
+
+    import json
+
+    unfinished_work_path = get_cache_path(UNFINISHED_WORK_FILE_NAME)
+
+    if not os.path.isfile(unfinished_work_path):
+        return
+
+    with lock_cache_file(unfinished_work_path):
+        lines = []
+
+        with open(unfinished_work_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                unfinished_work = json.loads(line)
+
+                if unfinished_work['stage'] != stage or unfinished_work['time'] >= recorded_before:
+                    lines.append(line)
+
+        temporary_unfinished_work_path = f'{unfinished_work_path}.{os.getpid()}.tmp'
+
+        with open(temporary_unfinished_work_path, 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+
+        os.replace(temporary_unfinished_work_path, unfinished_work_path)
+
+def get_single_school_primary_url(school_name: str, school_urn: str) -> str:
+    """
+    Returns the URL to the school's primary page
+
+    Returns the URL to the Web page containing the school's primary 
+    results data. At the time of writing, this data is for pupils who
+    completed key stage 2 in the summer of 2023.
+
+    Parameters
+    ----------
+    school_name : str
+        The name of the school whose data is to be obtained. 
+    school_urn : str
+        The Unique Identification Number (URN) of the school whose data
+        is to be obtained.
+
+    Returns
+    -------
+    school_primary_url : str
+        The url to the Web page containing the school's primary results 
+        data. 
+    """
+
+    formatted_school_name = school_name.replace(' ', '-').replace(',', '%2c').lower()
+
+    school_primary_url = f"https://www.compare-school-performance.service.gov.uk/school/{school_urn}/{formatted_school_name}/primary"
+
+    return school_primary_url
+
+def get_school_page_fields(school_urn: str, url: str, extractor_name: str, field_names: Tuple[str, ...]) -> dict:
+    """
+    Returns the fields extracted from a school page, unless the page is
+    known to have no data.
+
+    If the negative cache is enabled, a page found to have no data within
+    the recheck interval is not requested, and every page that is 
+    requested is recorded with 'record_negative_result()'. Only pages of 
+    the responses in 'NEGATIVE_CACHE_STATUS_CODES' are recorded. A page 
+    of a response in 'MISSING_PAGE_STATUS_CODES' has no data, while any 
+    other page only has no data if 'has_published_data()' says so, and 
+    is not recorded if none of its fields were found. The negative cache
+    is not used in offline mode.
+
+    Parameters
+    ----------
+    school_urn : str
+        The URN of the school.
+    url : str
+        The url of the page.
+    extractor_name : str
+        The name of the extractor of the page in 'PAGE_EXTRACTORS'.
+    field_names : Tuple[str, ...]
+        The names of the per-school fields of the page.
+
+    Returns
+    -------
+    school_page_fields : dict
+        The record returned by 'extract_page()', or an empty dict if the
+        page is known to have no data.
+    """
+
+    academic_year = SCHOOL_DATASET_ACADEMIC_YEARS[extractor_name]
+    use_negative_cache = is_negative_cache_enabled() and not is_offline()
+
+    if use_negative_cache and is_known_empty(school_urn, extractor_name, academic_year):
+        return {}
+
+    _last_status_code.value = None
+    school_page_fields = extract_page(url, extractor_name)
+
+    if use_negative_cache and _last_status_code.value in NEGATIVE_CACHE_STATUS_CODES:
+        published_data = False if _last_status_code.value in MISSING_PAGE_STATUS_CODES else has_published_data(school_page_fields, field_names)
+
+        if published_data is not None:
+            record_negative_result(school_urn, extractor_name, academic_year, published_data)
+
+    return school_page_fields
+
+def get_single_school_primary_data(school_name: str, school_urn: str) -> pd.DataFrame:
+    """
+    Returns the results data for a given school
+
+    Scrapes the gov.uk website to obtain the required primary results data
+    for the specified school. Returns a pd.DataFrame containing the 
+    primary results data for the school.  At the time of writing, this 
+    data is for pupils who completed key stage 2 in the summer of 2023.
+    The England averages are not included, since they are the same for 
+    every school and are returned by 'get_england_averages()'.
+
+    Parameters
+    ----------
+    school_name : str
+        The name of the school whose data is to be obtained. 
+    school_urn : str
+        The Unique Identification Number (URN) of the school whose data
+        is to be obtained.
+
+    Returns
+    -------
+    school_primary_data : pd.DataFrame
+        A pd.DataFrame containing the primary results data for the given 
+        school. 
+    """
+
+    import pandas as pd
+
+    school_primary_fields = get_school_page_fields(school_urn, get_single_school_primary_url(school_name, school_urn), 'school_primary', COMPILED_SCHOOL_PRIMARY_PER_SCHOOL_FIELD_SPEC[1])
+
+    school_primary_data = pd.DataFrame([school_primary_fields], columns=COMPILED_SCHOOL_PRIMARY_PER_SCHOOL_FIELD_SPEC[1])
+
+    return school_primary_data
+
+def get_single_school_absence_and_pupil_url(school_name: str, school_urn: str) -> str:
+    """
+    Returns the URL to the school's absence page
+
+    Returns the URL to the Web page containing the school's absence and 
+    pupil population information. At the time of writing, this data is 
+    for the 2021/2022 school year.
+
+    Parameters
+    ----------
+    school_name : str
+        The name of the school whose data is to be obtained. 
+    school_urn : str
+        The Unique Identification Number (URN) of the school whose data
+        is to be obtained.
+
+    Returns
+    -------
+    school_primary_absence_and_pupil_url : str
+        The url to the Web page containing the school's absence and 
+        pupil population information.
+    """
+
+    formatted_school_name = school_name.replace(' ', '-').replace(',', '%2c').lower()
+
+    school_absence_and_pupil_url = f"https://www.compare-school-performance.service.gov.uk/school/{school_urn}/{formatted_school_name}/absence-and-pupil-population"
+
+    return school_absence_and_pupil_url
+
+
+def get_single_school_absence_and_pupil_data(school_name: str, school_urn: str) -> pd.DataFrame: 
+    """
+    Returns the population data for the school
+
+    Scrapes the gov.uk website to obtain the required absence and pupil
+    population information for the specified school. Returns a 
+    pd.DataFrame containing the school's absence and pupil population 
+    information. At the time of writing, this data is for the 
+    2021/2022 school year. The England averages are not included, since
+    they are the same for every school and are returned by 
+    'get_england_averages()'.
+
+    Parameters
+    ----------
+    school_name : str
+        The name of the school whose data is to be obtained. 
+    school_urn : str
+        The Unique Identification Number (URN) of the school whose data
+        is to be obtained.
+
+    Returns
+    -------
+    school_absence_and_pupil_data : pd.DataFrame
         A pd.DataFrame containing the school's absence and pupil 
         population information.
     """
 
-    return None
+    import pandas as pd
+
+    school_absence_and_pupil_fields = get_school_page_fields(school_urn, get_single_school_absence_and_pupil_url(school_name, school_urn), 'school_absence_and_pupil', COMPILED_SCHOOL_ABSENCE_AND_PUPIL_PER_SCHOOL_FIELD_SPEC[1])
+
+    school_absence_and_pupil_data = pd.DataFrame([school_absence_and_pupil_fields], columns=COMPILED_SCHOOL_ABSENCE_AND_PUPIL_PER_SCHOOL_FIELD_SPEC[1] + (LOCAL_AUTHORITY_CODE_FIELD,))
+
+    return school_absence_and_pupil_data
+
+def get_single_school_data(school_name: str, school_urn: str) -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the data required for the school.
+
+    Scrapes the gov.uk website to obtain the required information for the
+    school specified. Returns this information as a pd.DataFrame with 
+    columns for all the data specified in the documentation for this
+    class.
+
+    Parameters
+    ----------
+    school_name : str
+        The name of the school whose data is to be obtained. 
+    school_urn : str
+        The Unique Identification Number (URN) of the school whose data
+        is to be obtained.
+
+    Returns
+    -------
+    single_school_data : pd.DataFrame
+        A pd.DataFrame containing the required data for the school specified. 
+    """
+
+    import pandas as pd
+
+    school_absence_and_pupil_data = get_single_school_absence_and_pupil_data(school_name, school_urn)
+    school_primary_data = get_single_school_primary_data(school_name, school_urn)
+
+    single_school_data = pd.concat([school_absence_and_pupil_data, school_primary_data], axis=1)
+
+    return single_school_data
+
+def get_school_sampling_frame() -> pd.DataFrame:
+    """
+    Returns the schools a sample is drawn from, with their strata.
+
+    The schools are those returned by 
+    'get_school_identification_information()'. Files created before the
+    parliamentary constituency of each school was recorded are completed 
+    from the database.
+
+    Returns
+    -------
+    sampling_frame : pd.DataFrame
+        A pd.DataFrame containing the name, URN, type and parliamentary 
+        constituency of every school.
+    """
+
+    uk_school_identification_information = get_school_identification_information()
+
+    if 'parliamentary_constituency' in uk_school_identification_information.columns:
+        return uk_school_identification_information
+
+    school_constituencies = {}
+
+    if os.path.isfile(get_cache_path(DATABASE_FILE_NAME)):
+        with closing(connect_to_database()) as connection:
+            school_constituencies = dict(connection.execute('SELECT s.school_urn, c.name FROM schools s JOIN constituencies c ON c.constituency_id = s.constituency_id').fetchall())
+
+    sampling_frame = uk_school_identification_information.assign(parliamentary_constituency=[school_constituencies.get(int(school_urn)) for school_urn in uk_school_identification_information['school_urn']])
+
+    if sampling_frame['parliamentary_constituency'].isna().any():
+        raise ValueError("The parliamentary constituency of some schools is not known. Please rerun the 'identification' stage to record the constituency of every school.")
+
+    return sampling_frame
+
+def select_stratified_sample(sampling_frame: pd.DataFrame, sample_fraction: float, sample_seed: int = DEFAULT_SAMPLE_SEED) -> pd.DataFrame:
+    """
+    Returns a stratified sample of the schools in the sampling frame.
+
+    The schools are stratified by 'SAMPLE_STRATUM_COLUMNS', and the given
+    fraction of each stratum, rounded up, is sampled. Each school is 
+    given a permanent random number, the stable hash of the seed and its
+    URN, and the schools with the smallest numbers in each stratum are 
+    sampled. The sample is therefore the same every time for the same 
+    seed, and the sample for a larger fraction contains the sample for 
+    any smaller fraction, so a sample can be topped up.
+
+    Parameters
+    ----------
+    sampling_frame : pd.DataFrame
+        The pd.DataFrame returned by 'get_school_sampling_frame()'.
+    sample_fraction : float
+        The fraction of each stratum to be sampled, greater than 0 and at
+        most 1.
+    sample_seed : int, optional
+        The seed of the permanent random numbers.
+
+    Returns
+    -------
+    sample : pd.DataFrame
+        The sampled rows of the sampling frame, with an additional column
+        'stratum_size' containing the number of schools in each school's
+        stratum.
+    """
+
+    import numpy as np
+
+    if not 0 < sample_fraction <= 1:
+        raise ValueError(f"The sample fraction must be greater than 0 and at most 1, not {sample_fraction}.")
+
+    permanent_random_numbers = np.array([get_stable_hash(f'{sample_seed}:{school_urn}') for school_urn in sampling_frame['school_urn']], dtype=np.uint64)
+    ordered_sampling_frame = sampling_frame.iloc[np.argsort(permanent_random_numbers, kind='stable')]
+
+    strata = ordered_sampling_frame.groupby(SAMPLE_STRATUM_COLUMNS, sort=False)
+    stratum_sizes = strata['school_urn'].transform('size')
+    stratum_sample_sizes = np.ceil(sample_fraction * stratum_sizes)
+
+    sample = ordered_sampling_frame[strata.cumcount() < stratum_sample_sizes].assign(stratum_size=stratum_sizes)
+
+    return sample.sort_index()
+
+def get_school_sample_data(sample_fraction: float, sample_seed: int = DEFAULT_SAMPLE_SEED) -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the required data for a stratified 
+    sample of schools, with their sampling weights.
+
+    The sample is selected by 'select_stratified_sample()'. The data of 
+    every school fetched in sampling mode is kept in the file 
+    'uk_school_sample_data.csv', so only the schools that have not been 
+    fetched before are fetched when a sample is topped up to a larger 
+    fraction. The file is locked while the sample is fetched, so that 
+    two runs do not top it up at the same time. The streaming aggregates
+    are started from the schools of the sample fetched before, so they 
+    describe the whole sample rather than the schools added to it.
+
+    The sampling weight of each school is the size of its stratum divided
+    by the number of schools in its stratum whose data was obtained, so 
+    weighted estimates are unbiased even when some schools fail 
+    validation. Strata in which no school's data was obtained are not 
+    represented.
+
+    Parameters
+    ----------
+    sample_fraction : float
+        The fraction of each stratum to be sampled.
+    sample_seed : int, optional
+        The seed of the permanent random numbers.
+
+    Returns
+    -------
+    school_sample_data : pd.DataFrame
+        A pd.DataFrame containing the required data for the sampled 
+        schools, their parliamentary constituency and the columns 
+        'stratum_size' and 'sampling_weight'.
+    """
+
+    import pandas as pd
+    from io import StringIO
+    from joblib import Parallel, delayed
+
+    sample = select_stratified_sample(get_school_sampling_frame(), sample_fraction, sample_seed)
+
+    sample_data_path = get_cache_path(SAMPLE_DATA_FILE_NAME)
+
+    with lock_cache_file(sample_data_path):
+        try:
+            collected_school_data = pd.read_csv(StringIO(read_cache_file(sample_data_path)))
+            unfetched_sample = sample[~sample['school_urn'].astype(str).isin(collected_school_data['school_urn'].astype(str))]
+        except (FileNotFoundError, ValueError):
+            collected_school_data = None
+            unfetched_sample = sample
+
+        # The streaming aggregates start from the schools of the sample 
+        # fetched before, so that they describe the whole sample once it
+        # has been topped up
+        clear_streaming_aggregates()
+
+        if collected_school_data is not None:
+            update_streaming_aggregates(collected_school_data[collected_school_data['school_urn'].astype(str).isin(sample['school_urn'].astype(str))])
+
+        school_identification_subsets = [unfetched_sample.iloc[i:i+10] for i in range(0, len(unfetched_sample), 10)]
+
+        school_data_batches = Parallel(**get_parallel_arguments())(delayed(run_and_spill_result_batch)(get_school_data_subset_of_schools, school_identification_subset) for school_identification_subset in school_identification_subsets)
+        fetched_school_data = collect_result_batches(school_data_batches)
+
+        if fetched_school_data is not None:
+            collected_school_data = pd.concat([collected_school_data, fetched_school_data], ignore_index=True)
+            write_cache_file(sample_data_path, collected_school_data.to_csv(index=False))
+
+    if collected_school_data is None:
+        return None
+
+    sample_strata = sample.assign(school_urn=sample['school_urn'].astype(str)).set_index('school_urn')[['parliamentary_constituency', 'stratum_size']]
+
+    school_sample_data = collected_school_data.assign(school_urn_key=collected_school_data['school_urn'].astype(str))
+    school_sample_data = school_sample_data[school_sample_data['school_urn_key'].isin(sample_strata.index)].join(sample_strata, on='school_urn_key').drop(columns='school_urn_key')
+
+    number_of_sampled_schools = school_sample_data.groupby(SAMPLE_STRATUM_COLUMNS)['school_urn'].transform('size')
+    school_sample_data['sampling_weight'] = school_sample_data['stratum_size'] / number_of_sampled_schools
+
+    return school_sample_data.reset_index(drop=True)
+
+def write_school_sample_data(school_sample_data: pd.DataFrame) -> str:
+    """
+    Writes the data for a sample of schools to 
+    'uk_primary_school_sample.csv' in the output directory.
+
+    Unlike 'write_all_school_data()', the local authority and England 
+    averages are kept in the file, so that it does not replace the 
+    averages of the full data set.
+
+    Parameters
+    ----------
+    school_sample_data : pd.DataFrame
+        The pd.DataFrame returned by 'get_school_sample_data()'.
+
+    Returns
+    -------
+    output_path : str
+        The path to the file that was written.
+    """
+
+    output_path = os.path.join(get_output_directory(), SAMPLE_OUTPUT_FILE_NAME)
+
+    school_sample_data.to_csv(output_path, index=False)
+
+    return output_path
+
+def get_all_school_data(sample_fraction: float = None, sample_seed: int = DEFAULT_SAMPLE_SEED) -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the required data for all UK schools
+
+    Calls the function 'get_single_school_data()' for each school returned
+    by 'get_school_identification_information()' concatenating the 
+    pd.DataFrame returned to obtain a single pd.DataFrame containing the
+    information required for all schools in the UK. This DataFrame
+    contains the information described in the documentation for this 
+    class.
+
+    Parameters
+    ----------
+    sample_fraction : float, optional
+        If given, only the data for a stratified sample of this fraction 
+        of the schools is obtained, as described in 
+        'get_school_sample_data()'.
+    sample_seed : int, optional
+        The seed of the sample.
+
+    Returns
+    -------
+    all_school_data : pd.DataFrame
+        A pd.DataFRame containing the required data for all UK schools.  
+    
+    """
+
+    from joblib import Parallel, delayed
+
+    if sample_fraction is not None:
+        return get_school_sample_data(sample_fraction, sample_seed)
+
+    uk_school_identification_information = get_school_identification_information()
+
+    clear_streaming_aggregates()
+    remove_unfinished_work('schools', time.time())
+
+    school_identification_subsets = [uk_school_identification_information.iloc[i:i+10] for i in range(0, len(uk_school_identification_information), 10)]
+
+    school_data_batches = Parallel(**get_parallel_arguments())(delayed(run_and_spill_result_batch)(get_school_data_subset_of_schools, school_identification_subset) for school_identification_subset in school_identification_subsets)
+
+    all_school_data = collect_result_batches(school_data_batches)
+
+    if all_school_data is None:
+        return None
+
+    return all_school_data.reset_index(drop=True)
+
+def get_school_data_subset_of_schools(school_identification_information: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the required data for the given schools.
+
+    Calls the get_single_school_data() function for each school in the 
+    given pd.DataFrame and concatenates the results, after the school's
+    name, URN and type. The schools are obtained within the deadline 
+    returned by 'get_task_deadline()'. Schools whose requests time out, 
+    which are reached after the deadline of the task or of the run, or 
+    whose pages are not in the raw HTML archive in offline mode, are 
+    recorded with 'record_unfinished_work()' rather than obtained.
+
+    Parameters
+    ----------
+    school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name, URN and type of the schools
+        whose data is to be obtained. 
+
+    Returns
+    -------
+    school_data : pd.DataFrame
+        A pd.DataFrame containing the required data for the given schools
+        that were obtained.
+    """
+
+    import pandas as pd
+    import requests
+
+    single_school_dataframes = []
+    unfinished_schools = []
+
+    with task_deadline():
+        for school_name, school_urn, type_of_school in school_identification_information[['school_name', 'school_urn', 'type_of_school']].itertuples(index=False):
+            try:
+                single_school_data = get_single_school_data(school_name, str(school_urn))
+            except (requests.Timeout, TimeoutError, ArchiveMissError) as error:
+                unfinished_schools.append((str(school_urn), [school_name, str(school_urn), type_of_school], get_unfinished_reason(error)))
+                continue
+
+            single_school_data.insert(0, 'school_name', school_name)
+            single_school_data.insert(1, 'school_urn', school_urn)
+            single_school_data.insert(2, 'type_of_school', type_of_school)
+            single_school_dataframes.append(single_school_data)
+
+    record_unfinished_work('schools', unfinished_schools)
+
+    if not single_school_dataframes:
+        return school_identification_information[['school_name', 'school_urn', 'type_of_school']].iloc[:0].reset_index(drop=True)
+
+    school_data = pd.concat(single_school_dataframes, ignore_index=True)
+
+    school_data, invalid_school_data = validate_school_data(school_data)
+    quarantine_school_data(invalid_school_data, 'schools')
+
+    if is_database_enabled():
+        write_school_measures_to_database(school_data)
+
+    update_streaming_aggregates(school_data)
+
+    return school_data
+
+class QuantileSketch:
+    """
+    Estimates the quantiles of a stream of values in a fixed amount of 
+    memory.
+
+    Values are counted in buckets whose bounds grow geometrically, as in
+    DDSketch, so every quantile is estimated to within the relative 
+    accuracy of its true value. Sketches with the same relative accuracy
+    are merged by adding the counts of their buckets, so the sketches of 
+    several worker processes can be combined.
+
+    Attributes
+    ----------
+    relative_accuracy : float
+        The largest relative error of an estimated quantile.
+    count : int
+        The number of values added.
+
+    Methods
+    -------
+    add(values)
+        Adds the values to the sketch.
+    merge(other)
+        Adds the counts of another sketch to the sketch.
+    get_quantile(quantile)
+        Returns the estimated quantile.
+    to_dict()
+        Returns the sketch as a dict that can be stored as JSON.
+    from_dict(sketch)
+        Returns the sketch stored in a dict returned by 'to_dict()'.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Parameters
+        ----------
+        relative_accuracy : float, optional
+            The largest relative error of an estimated quantile.
+        """
+
+        import math
+
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._zero_count = 0
+        self._positive_counts = {}
+        self._negative_counts = {}
+
+    def add(self, values) -> None:
+        """
+        Adds the values to the sketch.
+
+        Parameters
+        ----------
+        values : array_like
+            The values to be added. Missing values are ignored.
+        """
+
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+
+        for bucket_counts, magnitudes in ((self._positive_counts, values[values > 0]), (self._negative_counts, -values[values < 0])):
+            keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(int), return_counts=True)
+
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                bucket_counts[key] = bucket_counts.get(key, 0) + count
+
+        self._zero_count += int((values == 0).sum())
+        self.count += len(values)
+
+    def merge(self, other: QuantileSketch) -> None:
+        """
+        Adds the counts of another sketch to the sketch.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            A sketch with the same relative accuracy.
+        """
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged.")
+
+        for bucket_counts, other_bucket_counts in ((self._positive_counts, other._positive_counts), (self._negative_counts, other._negative_counts)):
+            for key, count in other_bucket_counts.items():
+                bucket_counts[key] = bucket_counts.get(key, 0) + count
+
+        self._zero_count += other._zero_count
+        self.count += other.count
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        Returns the estimated quantile.
+
+        Parameters
+        ----------
+        quantile : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        value : float or None
+            The estimated quantile, or None if no values have been added.
+        """
+
+        if self.count == 0:
+            return None
+
+        rank = quantile * (self.count - 1)
+        number_of_values = 0
+
+        for key in sorted(self._negative_counts, reverse=True):
+            number_of_values += self._negative_counts[key]
+            if number_of_values > rank:
+                return -self._get_bucket_value(key)
+
+        number_of_values += self._zero_count
+        if number_of_values > rank:
+            return 0.0
+
+        for key in sorted(self._positive_counts):
+            number_of_values += self._positive_counts[key]
+            if number_of_values > rank:
+                return self._get_bucket_value(key)
+
+        return self._get_bucket_value(max(self._positive_counts))
+
+    def _get_bucket_value(self, key: int) -> float:
+        """
+        Returns the value within the relative accuracy of every value in 
+        the bucket.
+        """
+
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the sketch as a dict that can be stored as JSON.
+
+        Returns
+        -------
+        sketch : dict
+            The relative accuracy and the counts of the sketch.
+        """
+
+        return {'relative_accuracy': self.relative_accuracy, 'zero_count': self._zero_count, 'positive_counts': {str(key): count for key, count in self._positive_counts.items()}, 'negative_counts': {str(key): count for key, count in self._negative_counts.items()}}
+
+    @classmethod
+    def from_dict(cls, sketch: dict) -> QuantileSketch:
+        """
+        Returns the sketch stored in a dict returned by 'to_dict()'.
+
+        Parameters
+        ----------
+        sketch : dict
+            The dict returned by 'to_dict()'.
+
+        Returns
+        -------
+        quantile_sketch : QuantileSketch
+            The sketch.
+        """
+
+        quantile_sketch = cls(sketch['relative_accuracy'])
+        quantile_sketch._zero_count = sketch['zero_count']
+        quantile_sketch._positive_counts = {int(key): count for key, count in sketch['positive_counts'].items()}
+        quantile_sketch._negative_counts = {int(key): count for key, count in sketch['negative_counts'].items()}
+        quantile_sketch.count = quantile_sketch._zero_count + sum(quantile_sketch._positive_counts.values()) + sum(quantile_sketch._negative_counts.values())
+
+        return quantile_sketch
+
+def merge_moments(moments: dict, other_moments: dict) -> dict:
+    """
+    Returns the moments of two sets of values combined.
+
+    Uses the pairwise form of Welford's algorithm, so the mean, the sums 
+    of squared deviations and the co-moment are updated without a second
+    pass over the values and without the loss of precision of summing 
+    squares.
+
+    Parameters
+    ----------
+    moments : dict
+        The 'count' of a set of values and, for each of its variables 
+        'x' and optionally 'y', the 'mean_x' and the sum of squared 
+        deviations 'm2_x', and the co-moment 'comoment' if there are two.
+    other_moments : dict
+        The moments of the other set of values, with the same keys.
+
+    Returns
+    -------
+    merged_moments : dict
+        The moments of the combined values.
+    """
+
+    count = moments['count'] + other_moments['count']
+
+    if other_moments['count'] == 0:
+        return dict(moments)
+    if moments['count'] == 0:
+        return dict(other_moments)
+
+    weight = moments['count'] * other_moments['count'] / count
+    variables = [key[len('mean_'):] for key in moments if key.startswith('mean_')]
+    deltas = {variable: other_moments[f'mean_{variable}'] - moments[f'mean_{variable}'] for variable in variables}
+
+    merged_moments = {'count': count}
+
+    for variable in variables:
+        merged_moments[f'mean_{variable}'] = moments[f'mean_{variable}'] + deltas[variable] * other_moments['count'] / count
+        merged_moments[f'm2_{variable}'] = moments[f'm2_{variable}'] + other_moments[f'm2_{variable}'] + deltas[variable] ** 2 * weight
+
+    if 'comoment' in moments:
+        merged_moments['comoment'] = moments['comoment'] + other_moments['comoment'] + deltas['x'] * deltas['y'] * weight
+
+    return merged_moments
+
+class StreamingAggregates:
+    """
+    Summarises the school data as it is scraped, without keeping it.
+
+    For every numeric school-specific measure, the count, mean and 
+    variance are updated with Welford's algorithm and the quantiles are 
+    estimated with a 'QuantileSketch'. The covariance and correlation of
+    the percentage of EAL students with each progress score are updated 
+    in the same way. Every accumulator can be merged, so the aggregates 
+    of each worker process are checkpointed separately and combined when
+    they are read.
+
+    Methods
+    -------
+    update(school_data)
+        Adds a batch of school data to the aggregates.
+    merge(other)
+        Adds the aggregates of another process to the aggregates.
+    get_summary()
+        Returns the count, mean, standard deviation and quantiles of 
+        every measure.
+    get_covariances()
+        Returns the covariance and correlation of the percentage of EAL 
+        students with each progress score.
+    to_dict()
+        Returns the aggregates as a dict that can be stored as JSON.
+    from_dict(aggregates)
+        Returns the aggregates stored in a dict returned by 'to_dict()'.
+    """
+
+    def __init__(self):
+        self._moments = {}
+        self._sketches = {}
+        self._comoments = {}
+
+    def update(self, school_data: pd.DataFrame) -> None:
+        """
+        Adds a batch of school data to the aggregates.
+
+        Parameters
+        ----------
+        school_data : pd.DataFrame
+            A batch of school data as returned by 
+            'get_school_data_subset_of_schools()'.
+        """
+
+        import pandas as pd
+
+        for measure in STREAMING_AGGREGATE_MEASURES:
+            if measure not in school_data.columns:
+                continue
+
+            values = pd.to_numeric(school_data[measure], errors='coerce').dropna().to_numpy(dtype=float)
+
+            if len(values) == 0:
+                continue
+
+            batch_moments = {'count': len(values), 'mean_x': values.mean(), 'm2_x': ((values - values.mean()) ** 2).sum()}
+            self._moments[measure] = merge_moments(self._moments.get(measure, {'count': 0, 'mean_x': 0.0, 'm2_x': 0.0}), batch_moments)
+            self._sketches.setdefault(measure, QuantileSketch()).add(values)
+
+        if STREAMING_AGGREGATE_COVARIANCE_MEASURE not in school_data.columns:
+            return
+
+        for measure in STREAMING_AGGREGATE_COVARIANCE_MEASURES:
+            if measure not in school_data.columns:
+                continue
+
+            pairs = school_data[[STREAMING_AGGREGATE_COVARIANCE_MEASURE, measure]].apply(pd.to_numeric, errors='coerce').dropna().to_numpy(dtype=float)
+
+            if len(pairs) == 0:
+                continue
+
+            x = pairs[:, 0]
+            y = pairs[:, 1]
+            batch_comoments = {'count': len(pairs), 'mean_x': x.mean(), 'mean_y': y.mean(), 'm2_x': ((x - x.mean()) ** 2).sum(), 'm2_y': ((y - y.mean()) ** 2).sum(), 'comoment': ((x - x.mean()) * (y - y.mean())).sum()}
+            self._comoments[measure] = merge_moments(self._comoments.get(measure, {'count': 0, 'mean_x': 0.0, 'mean_y': 0.0, 'm2_x': 0.0, 'm2_y': 0.0, 'comoment': 0.0}), batch_comoments)
+
+    def merge(self, other: StreamingAggregates) -> None:
+        """
+        Adds the aggregates of another process to the aggregates.
+
+        Parameters
+        ----------
+        other : StreamingAggregates
+            The aggregates to be added.
+        """
+
+        for measure, moments in other._moments.items():
+            self._moments[measure] = merge_moments(self._moments[measure], moments) if measure in self._moments else dict(moments)
+
+        for measure, sketch in other._sketches.items():
+            self._sketches.setdefault(measure, QuantileSketch(sketch.relative_accuracy)).merge(sketch)
+
+        for measure, comoments in other._comoments.items():
+            self._comoments[measure] = merge_moments(self._comoments[measure], comoments) if measure in self._comoments else dict(comoments)
+
+    def get_summary(self) -> pd.DataFrame:
+        """
+        Returns the count, mean, standard deviation and quantiles of every
+        measure.
+
+        Returns
+        -------
+        summary : pd.DataFrame
+            A pd.DataFrame indexed by measure, with the columns 'count', 
+            'mean', 'std' and one column for each of 
+            'STREAMING_AGGREGATE_QUANTILES'.
+        """
+
+        import pandas as pd
+
+        rows = {}
+
+        for measure, moments in self._moments.items():
+            row = {'count': moments['count'], 'mean': moments['mean_x'], 'std': (moments['m2_x'] / (moments['count'] - 1)) ** 0.5 if moments['count'] > 1 else None}
+            row.update({f'{quantile:.0%}': self._sketches[measure].get_quantile(quantile) for quantile in STREAMING_AGGREGATE_QUANTILES})
+            rows[measure] = row
+
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def get_covariances(self) -> pd.DataFrame:
+        """
+        Returns the covariance and correlation of the percentage of EAL 
+        students with each progress score.
+
+        Returns
+        -------
+        covariances : pd.DataFrame
+            A pd.DataFrame indexed by progress score, with the columns 
+            'count', 'covariance' and 'correlation'.
+        """
+
+        import pandas as pd
+
+        rows = {}
+
+        for measure, comoments in self._comoments.items():
+            count = comoments['count']
+            covariance = comoments['comoment'] / (count - 1) if count > 1 else None
+            correlation = comoments['comoment'] / (comoments['m2_x'] * comoments['m2_y']) ** 0.5 if comoments['m2_x'] > 0 and comoments['m2_y'] > 0 else None
+            rows[measure] = {'count': count, 'covariance': covariance, 'correlation': correlation}
+
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def to_dict(self) -> dict:
+        """
+        Returns the aggregates as a dict that can be stored as JSON.
+
+        Returns
+        -------
+        aggregates : dict
+            The moments, sketches and co-moments of the aggregates.
+        """
+
+        to_float = lambda accumulator: {key: float(value) for key, value in accumulator.items()}
+
+        return {'moments': {measure: to_float(moments) for measure, moments in self._moments.items()}, 'sketches': {measure: sketch.to_dict() for measure, sketch in self._sketches.items()}, 'comoments': {measure: to_float(comoments) for measure, comoments in self._comoments.items()}}
+
+    @classmethod
+    def from_dict(cls, aggregates: dict) -> StreamingAggregates:
+        """
+        Returns the aggregates stored in a dict returned by 'to_dict()'.
+
+        Parameters
+        ----------
+        aggregates : dict
+            The dict returned by 'to_dict()'.
+
+        Returns
+        -------
+        streaming_aggregates : StreamingAggregates
+            The aggregates.
+        """
+
+        streaming_aggregates = cls()
+        streaming_aggregates._moments = {measure: {**moments, 'count': int(moments['count'])} for measure, moments in aggregates['moments'].items()}
+        streaming_aggregates._sketches = {measure: QuantileSketch.from_dict(sketch) for measure, sketch in aggregates['sketches'].items()}
+        streaming_aggregates._comoments = {measure: {**comoments, 'count': int(comoments['count'])} for measure, comoments in aggregates['comoments'].items()}
+
+        return streaming_aggregates
+
+def get_streaming_aggregates_directory() -> str:
+    """
+    Returns the directory the streaming aggregates are checkpointed to.
+
+    Returns
+    -------
+    streaming_aggregates_directory : str
+        The path to the directory 'streaming_aggregates' in the cache 
+        directory.
+    """
+
+    return get_cache_path(STREAMING_AGGREGATES_DIRECTORY_NAME)
+
+def update_streaming_aggregates(school_data: pd.DataFrame) -> None:
+    """
+    Adds a batch of school data to the checkpoint of this process.
+
+    Each process has its own checkpoint 'aggregates-<pid>.json'. The 
+    aggregates of the process are kept in memory and are updated, and 
+    the checkpoint written, while holding a lock, since the threads of 
+    the process may add batches at the same time. The aggregates in 
+    memory are only used while the checkpoint exists, so a worker process
+    reused after 'clear_streaming_aggregates()' starts from nothing. The checkpoint is 
+    written to a temporary file and renamed, so a process reading it 
+    never sees a partly written file. The schools of a crawl shard leased
+    again after its worker died are counted twice, so the aggregates are
+    estimates until the merged results are written.
+
+    Parameters
+    ----------
+    school_data : pd.DataFrame
+        A batch of school data as returned by 
+        'get_school_data_subset_of_schools()'.
+    """
+
+    import json
+
+    global _streaming_aggregates, _streaming_aggregates_key
+
+    streaming_aggregates_directory = get_streaming_aggregates_directory()
+    checkpoint_path = os.path.join(streaming_aggregates_directory, f'aggregates-{os.getpid()}.json')
+    temporary_checkpoint_path = f'{checkpoint_path}.tmp'
+
+    with _streaming_aggregates_lock:
+        # The aggregates are read from the checkpoint when the process 
+        # first adds a batch, or after it was forked or the cache 
+        # directory was changed. If the checkpoint no longer exists, the
+        # checkpoints were cleared by another process, e.g. the parent of
+        # a worker reused for a new run, so the aggregates start again.
+        if not os.path.isfile(checkpoint_path):
+            _streaming_aggregates = StreamingAggregates()
+        elif _streaming_aggregates is None or _streaming_aggregates_key != checkpoint_path:
+            with open(checkpoint_path, 'r', encoding='utf-8') as file:
+                _streaming_aggregates = StreamingAggregates.from_dict(json.load(file))
+
+        _streaming_aggregates_key = checkpoint_path
+
+        _streaming_aggregates.update(school_data)
+
+        os.makedirs(streaming_aggregates_directory, exist_ok=True)
+
+        with open(temporary_checkpoint_path, 'w', encoding='utf-8') as file:
+            json.dump(_streaming_aggregates.to_dict(), file)
+
+        os.replace(temporary_checkpoint_path, checkpoint_path)
+
+def read_streaming_aggregates() -> StreamingAggregates:
+    """
+    Returns the streaming aggregates of every process, merged.
+
+    Can be called from any process while a run is in progress to obtain
+    estimates from the schools scraped so far.
+
+    Returns
+    -------
+    streaming_aggregates : StreamingAggregates
+        The merged aggregates.
+    """
+
+    import json
+
+    streaming_aggregates = StreamingAggregates()
+    streaming_aggregates_directory = get_streaming_aggregates_directory()
+
+    if not os.path.isdir(streaming_aggregates_directory):
+        return streaming_aggregates
+
+    for file_name in sorted(os.listdir(streaming_aggregates_directory)):
+        if not file_name.endswith('.json'):
+            continue
+
+        with open(os.path.join(streaming_aggregates_directory, file_name), 'r', encoding='utf-8') as file:
+            streaming_aggregates.merge(StreamingAggregates.from_dict(json.load(file)))
+
+    return streaming_aggregates
+
+def clear_streaming_aggregates() -> None:
+    """
+    Removes the checkpoints of a previous run, and the aggregates of 
+    this process.
+    """
+
+    import shutil
+
+    global _streaming_aggregates
+
+    with _streaming_aggregates_lock:
+        _streaming_aggregates = None
+        shutil.rmtree(get_streaming_aggregates_directory(), ignore_errors=True)
+
+def read_england_averages() -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the England averages.
+
+    This function is only called if the file 'uk_england_averages.csv' 
+    exists. It returns the pd.DataFrame stored within the file.
+
+    Returns
+    -------
+    england_averages : pd.DataFrame
+        A pd.DataFrame with a single row containing the England average 
+        of every measure.
+    """
+
+    import pandas as pd
+    from io import StringIO
+
+    england_averages = pd.read_csv(StringIO(read_cache_file(get_cache_path(ENGLAND_AVERAGES_FILE_NAME))))
+
+    return england_averages
+
+def scrape_england_averages() -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the England averages.
+
+    This function is only called if the file 'uk_england_averages.csv' 
+    does not exist. The England averages are the same on the pages of 
+    every school, so they are scraped from the pages of the first school
+    returned by 'get_school_identification_information()'. If the 
+    averages on that school's pages fail validation, they are 
+    quarantined and the next school is tried, up to 
+    'ENGLAND_AVERAGES_MAXIMUM_SCHOOLS' schools. The averages are saved in
+    the file 'uk_england_averages.csv'.
+
+    Returns
+    -------
+    england_averages : pd.DataFrame
+        A pd.DataFrame with a single row containing the England average 
+        of every measure.
+    """
+
+    import pandas as pd
+
+    uk_school_identification_information = get_school_identification_information()
+
+    for school_name, school_urn in uk_school_identification_information[['school_name', 'school_urn']].head(ENGLAND_AVERAGES_MAXIMUM_SCHOOLS).itertuples(index=False):
+        england_fields = extract_page(get_single_school_absence_and_pupil_url(school_name, str(school_urn)), 'school_absence_and_pupil')
+        england_fields.update(extract_page(get_single_school_primary_url(school_name, str(school_urn)), 'school_primary'))
+
+        england_averages = pd.DataFrame([england_fields], columns=ENGLAND_FIELDS)
+
+        england_averages, invalid_england_averages = validate_school_data(england_averages)
+        quarantine_school_data(invalid_england_averages.assign(school_urn=school_urn), 'england')
+
+        if not england_averages.empty:
+            break
+    else:
+        raise ValueError(f"The England averages on the pages of the first {ENGLAND_AVERAGES_MAXIMUM_SCHOOLS} schools failed validation.")
+
+    write_cache_file(get_cache_path(ENGLAND_AVERAGES_FILE_NAME), england_averages.to_csv(index=False))
+
+    if is_database_enabled():
+        write_england_averages_to_database(england_averages)
+
+    return england_averages
+
+def get_england_averages() -> pd.DataFrame:
+    """
+    Returns a pd.DataFrame containing the England averages.
+
+    First checks if there exists a valid file called 
+    'uk_england_averages.csv'. If such a file exists, it calls the 
+    function 'read_england_averages()'. If such a file does not exist, or
+    is empty or corrupt, it calls the function 
+    'scrape_england_averages()'. The file is locked while this is done, 
+    so it is only created by one process at a time.
+
+    Returns
+    -------
+    england_averages : pd.DataFrame
+        A pd.DataFrame with a single row containing the England average 
+        of every measure.
+    """
+
+    with lock_cache_file(get_cache_path(ENGLAND_AVERAGES_FILE_NAME)):
+        try:
+            england_averages = read_england_averages()
+        except (FileNotFoundError, ValueError):
+            england_averages = scrape_england_averages()
+
+    return england_averages
+
+def get_local_authority_ids(school_data: pd.DataFrame) -> pd.Series:
+    """
+    Returns the id of the local authority of every school.
+
+    The id is the DfE code of the local authority in the column 
+    'local_authority_code', so schools in the same local authority have
+    the same id in every worker process and host, and schools in 
+    different local authorities never share one, even if their averages
+    are the same.
+
+    Parameters
+    ----------
+    school_data : pd.DataFrame
+        A pd.DataFrame containing the column 'local_authority_code'.
+
+    Returns
+    -------
+    local_authority_ids : pd.Series
+        The id of every school's local authority, which is missing for 
+        schools whose pages did not show their DfE number.
+    """
+
+    import pandas as pd
+
+    return pd.to_numeric(school_data[LOCAL_AUTHORITY_CODE_FIELD], errors='coerce').round().astype('Int64')
+
+def normalise_school_data(all_school_data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Splits the data for all UK schools into a fact table of the columns
+    that are specific to each school and dimension tables of the averages
+    that are repeated for many schools.
+
+    The local authority averages are replaced in the fact table by the 
+    column 'local_authority_id', the DfE code of the school's local 
+    authority, which refers to a row of the local authority dimension 
+    table. Any England averages are moved to the 
+    England dimension table, which has a single row holding the first 
+    value given for each average.
+
+    Parameters
+    ----------
+    all_school_data : pd.DataFrame
+        The pd.DataFrame returned by 'get_all_school_data()'.
+
+    Returns
+    -------
+    school_facts : pd.DataFrame
+        The columns of the data that are specific to each school.
+    local_authority_averages : pd.DataFrame or None
+        The distinct local authority averages and their 
+        'local_authority_id', or None if the data has none.
+    england_averages : pd.DataFrame or None
+        The England averages, or None if the data has none.
+    """
+
+    # The local authority averages are only normalised if every one of 
+    # them is present, and every school with any of them has the code of
+    # its local authority, so that no averages are lost
+    local_authority_fields = list(LOCAL_AUTHORITY_FIELDS) if set(LOCAL_AUTHORITY_FIELDS) <= set(all_school_data.columns) and LOCAL_AUTHORITY_CODE_FIELD in all_school_data.columns else []
+
+    if local_authority_fields:
+        has_local_authority_averages = all_school_data[local_authority_fields].notna().any(axis=1)
+        local_authority_ids = get_local_authority_ids(all_school_data).where(has_local_authority_averages)
+        if (local_authority_ids.isna() & has_local_authority_averages).any():
+            local_authority_fields = []
+    england_fields = [field_name for field_name in ENGLAND_FIELDS if field_name in all_school_data.columns]
+
+    school_facts = all_school_data.drop(columns=local_authority_fields + england_fields)
+    local_authority_averages = None
+    england_averages = None
+
+    if local_authority_fields:
+        school_facts = school_facts.drop(columns=LOCAL_AUTHORITY_CODE_FIELD)
+        school_facts['local_authority_id'] = local_authority_ids
+
+        local_authority_averages = all_school_data[local_authority_fields].assign(local_authority_id=local_authority_ids)
+        local_authority_averages = local_authority_averages.dropna(subset=['local_authority_id']).groupby('local_authority_id', sort=False)[local_authority_fields].first()
+        local_authority_averages = local_authority_averages.dropna(how='all').reset_index()
+
+    if england_fields:
+        england_averages = all_school_data[england_fields].bfill().iloc[[0]].reset_index(drop=True)
+
+    return school_facts, local_authority_averages, england_averages
+
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS constituencies (
+    constituency_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS schools (
+    school_urn INTEGER PRIMARY KEY,
+    school_name TEXT NOT NULL,
+    type_of_school TEXT,
+    constituency_id INTEGER REFERENCES constituencies (constituency_id)
+);
+CREATE INDEX IF NOT EXISTS schools_constituency_index ON schools (constituency_id);
+CREATE INDEX IF NOT EXISTS schools_type_index ON schools (type_of_school);
+CREATE TABLE IF NOT EXISTS school_measures (
+    school_urn INTEGER NOT NULL REFERENCES schools (school_urn),
+    academic_year TEXT NOT NULL,
+    measure TEXT NOT NULL,
+    value,
+    PRIMARY KEY (school_urn, academic_year, measure)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS school_measures_measure_index ON school_measures (measure, value);
+CREATE TABLE IF NOT EXISTS school_local_authorities (
+    school_urn INTEGER PRIMARY KEY REFERENCES schools (school_urn),
+    local_authority_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS school_local_authorities_local_authority_index ON school_local_authorities (local_authority_id);
+CREATE TABLE IF NOT EXISTS local_authority_averages (
+    local_authority_id INTEGER NOT NULL,
+    academic_year TEXT NOT NULL,
+    measure TEXT NOT NULL,
+    value,
+    PRIMARY KEY (local_authority_id, academic_year, measure)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS england_averages (
+    academic_year TEXT NOT NULL,
+    measure TEXT NOT NULL,
+    value,
+    PRIMARY KEY (academic_year, measure)
+) WITHOUT ROWID;
+"""
+
+def is_database_enabled() -> bool:
+    """
+    Returns whether the scrapers write their results to the database.
+
+    The database is enabled unless the environment variable 
+    'UK_SCHOOL_DATABASE' is set to '0'.
+
+    Returns
+    -------
+    database_enabled : bool
+        True if the scrapers are to write to the database.
+    """
+
+    return os.environ.get(DATABASE_ENVIRONMENT_VARIABLE, '1') != '0'
+
+def connect_to_database() -> sqlite3.Connection:
+    """
+    Returns a connection to the database 'uk_school_data.sqlite'.
+
+    The database is created in the cache directory if it does not exist.
+    It uses write-ahead logging and waits for locks held by other worker
+    processes, so the joblib workers can write to it at the same time.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        A connection to the database.
+    """
+
+    import sqlite3
+
+    os.makedirs(get_cache_directory(), exist_ok=True)
+
+    connection = sqlite3.connect(get_cache_path(DATABASE_FILE_NAME), timeout=60)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA foreign_keys=ON')
+    connection.executescript(DATABASE_SCHEMA)
+
+    return connection
+
+def to_database_value(value):
+    """
+    Converts a value into a type that can be stored in the database.
+
+    numpy scalars are converted to the equivalent Python scalar, and 
+    missing values are converted to None.
+
+    Parameters
+    ----------
+    value : 
+        The value to be converted.
+
+    Returns
+    -------
+    database_value : int, float, str or None
+        The converted value.
+    """
+
+    if hasattr(value, 'item'):
+        value = value.item()
+
+    if isinstance(value, float) and value != value:
+        return None
+
+    return value
+
+def write_constituencies_to_database(parliamentary_constituencies: List[str]) -> None:
+    """
+    Inserts the given parliamentary constituencies into the database.
+
+    Parameters
+    ----------
+    parliamentary_constituencies : List[str]
+        The names of the parliamentary constituencies.
+    """
+
+    with closing(connect_to_database()) as connection, connection:
+        connection.executemany('INSERT OR IGNORE INTO constituencies (name) VALUES (?)', [(constituency,) for constituency in parliamentary_constituencies])
+
+def write_schools_to_database(parliamentary_constituency: str, school_identification_information: pd.DataFrame) -> None:
+    """
+    Inserts the schools in a parliamentary constituency into the database.
+
+    Parameters
+    ----------
+    parliamentary_constituency : str
+        The name of the parliamentary constituency containing the schools.
+    school_identification_information : pd.DataFrame
+        A pd.DataFrame containing the name, URN and type of the schools.
+    """
+
+    with closing(connect_to_database()) as connection, connection:
+        connection.execute('INSERT OR IGNORE INTO constituencies (name) VALUES (?)', (parliamentary_constituency,))
+        constituency_id = connection.execute('SELECT constituency_id FROM constituencies WHERE name = ?', (parliamentary_constituency,)).fetchone()[0]
+
+        rows = [(int(school_urn), school_name, type_of_school, constituency_id) for school_name, school_urn, type_of_school in school_identification_information[['school_name', 'school_urn', 'type_of_school']].itertuples(index=False)]
+
+        connection.executemany('INSERT INTO schools (school_urn, school_name, type_of_school, constituency_id) VALUES (?, ?, ?, ?) ON CONFLICT (school_urn) DO UPDATE SET school_name = excluded.school_name, type_of_school = excluded.type_of_school, constituency_id = excluded.constituency_id', rows)
+
+def get_measure_academic_years() -> dict:
+    """
+    Returns the academic year of every field in a field spec.
+
+    Returns
+    -------
+    measure_academic_years : dict
+        A dict mapping the name of every field to the academic year of 
+        the page it is scraped from.
+    """
+
+    measure_academic_years = {field_name: SCHOOL_PRIMARY_ACADEMIC_YEAR for field_name in COMPILED_SCHOOL_PRIMARY_FIELD_SPEC[1]}
+    measure_academic_years.update({field_name: SCHOOL_ABSENCE_AND_PUPIL_ACADEMIC_YEAR for field_name in COMPILED_SCHOOL_ABSENCE_AND_PUPIL_FIELD_SPEC[1]})
+
+    return measure_academic_years
+
+def write_school_measures_to_database(school_data: pd.DataFrame) -> None:
+    """
+    Inserts the measures of the given schools into the database.
+
+    Each column of the school data that appears in a field spec is stored
+    as one row per school, with the academic year of the page it was 
+    scraped from. The local authority averages are stored once for each
+    local authority in the table 'local_authority_averages' rather than
+    for every school, and each school refers to them through the table 
+    'school_local_authorities'. Schools that are not yet in the database
+    are inserted without a constituency.
+
+    Parameters
+    ----------
+    school_data : pd.DataFrame
+        A pd.DataFrame as returned by 'get_school_data_subset_of_schools()'.
+    """
+
+    import pandas as pd
+
+    measure_academic_years = get_measure_academic_years()
+
+    school_facts, local_authority_averages, england_averages = normalise_school_data(school_data)
+
+    measures = [measure for measure in school_facts.columns if measure in measure_academic_years]
+
+    school_rows = []
+    measure_rows = []
+    school_local_authority_rows = []
+    local_authority_average_rows = []
+
+    for school in school_facts.to_dict('records'):
+        school_urn = int(school['school_urn'])
+        school_rows.append((school_urn, school['school_name'], school.get('type_of_school')))
+
+        for measure in measures:
+            measure_rows.append((school_urn, measure_academic_years[measure], measure, to_database_value(school[measure])))
+
+        local_authority_id = school.get('local_authority_id')
+        if local_authority_id is not None and not pd.isna(local_authority_id):
+            school_local_authority_rows.append((school_urn, int(local_authority_id)))
+
+    if local_authority_averages is not None:
+        for local_authority in local_authority_averages.to_dict('records'):
+            for measure in LOCAL_AUTHORITY_FIELDS:
+                local_authority_average_rows.append((int(local_authority['local_authority_id']), measure_academic_years[measure], measure, to_database_value(local_authority[measure])))
+
+    with closing(connect_to_database()) as connection, connection:
+        connection.executemany('INSERT OR IGNORE INTO schools (school_urn, school_name, type_of_school) VALUES (?, ?, ?)', school_rows)
+        connection.executemany('INSERT OR REPLACE INTO school_measures (school_urn, academic_year, measure, value) VALUES (?, ?, ?, ?)', measure_rows)
+        connection.executemany('INSERT OR REPLACE INTO school_local_authorities (school_urn, local_authority_id) VALUES (?, ?)', school_local_authority_rows)
+        connection.executemany('INSERT OR REPLACE INTO local_authority_averages (local_authority_id, academic_year, measure, value) VALUES (?, ?, ?, ?)', local_authority_average_rows)
+
+    if england_averages is not None:
+        write_england_averages_to_database(england_averages)
+
+def write_england_averages_to_database(england_averages: pd.DataFrame) -> None:
+    """
+    Inserts the England averages into the database.
+
+    Parameters
+    ----------
+    england_averages : pd.DataFrame
+        A pd.DataFrame as returned by 'get_england_averages()'.
+    """
+
+    measure_academic_years = get_measure_academic_years()
+
+    rows = [(measure_academic_years[measure], measure, to_database_value(value)) for measure, value in england_averages.iloc[0].items() if measure in measure_academic_years]
+
+    with closing(connect_to_database()) as connection, connection:
+        connection.executemany('INSERT OR REPLACE INTO england_averages (academic_year, measure, value) VALUES (?, ?, ?)', rows)
+
+def build_school_query(parliamentary_constituency: str = None, type_of_school: str = None, school_urn: int = None, measure_ranges: dict = None, academic_year: str = None) -> Tuple[str, list]:
+    """
+    Returns the SQL query and parameters used by 'query_schools()'.
+
+    Every filter is answered using an index, so a point lookup by URN or
+    a slice by constituency, type or measure does not read the whole 
+    database. 
+
+    Parameters
+    ----------
+    parliamentary_constituency : str, optional
+        Only return schools in this parliamentary constituency.
+    type_of_school : str, optional
+        Only return schools of this type, e.g. 'Academy'.
+    school_urn : int, optional
+        Only return the school with this URN.
+    measure_ranges : dict, optional
+        A dict mapping the name of a measure to a tuple containing the 
+        lowest and highest values allowed. Either value may be None to
+        leave that side unbounded. For example, 
+        {'%eal_students_school': (30, None)}. 
+    academic_year : str, optional
+        Only use measures from this academic year, e.g. '2021/2022'.
+
+    Returns
+    -------
+    query : str
+        The SQL query.
+    parameters : list
+        The parameters of the SQL query.
+    """
+
+    measure_ranges = measure_ranges or {}
+
+    selected_columns = ['s.school_urn', 's.school_name', 's.type_of_school', 'c.name AS parliamentary_constituency']
+    joins = ['LEFT JOIN constituencies c ON c.constituency_id = s.constituency_id']
+    conditions = []
+    parameters = []
+
+    for measure_index, (measure, (lowest_value, highest_value)) in enumerate(measure_ranges.items()):
+        alias = f'm{measure_index}'
+        join = f'JOIN school_measures {alias} ON {alias}.school_urn = s.school_urn AND {alias}.measure = ?'
+        parameters.append(measure)
+
+        if lowest_value is not None:
+            join += f' AND {alias}.value >= ?'
+            parameters.append(lowest_value)
+        if highest_value is not None:
+            join += f' AND {alias}.value <= ?'
+            parameters.append(highest_value)
+        if academic_year is not None:
+            join += f' AND {alias}.academic_year = ?'
+            parameters.append(academic_year)
+
+        joins.append(join)
+        selected_columns.append(f'{alias}.value AS "{measure}"')
+
+    if parliamentary_constituency is not None:
+        conditions.append('s.constituency_id = (SELECT constituency_id FROM constituencies WHERE name = ?)')
+        parameters.append(parliamentary_constituency)
+    if type_of_school is not None:
+        conditions.append('s.type_of_school = ?')
+        parameters.append(type_of_school)
+    if school_urn is not None:
+        conditions.append('s.school_urn = ?')
+        parameters.append(int(school_urn))
+
+    query = f'SELECT {", ".join(selected_columns)} FROM schools s {" ".join(joins)}'
+    if conditions:
+        query += f' WHERE {" AND ".join(conditions)}'
+    query += ' ORDER BY s.school_urn'
+
+    return query, parameters
+
+def query_schools(parliamentary_constituency: str = None, type_of_school: str = None, school_urn: int = None, measure_ranges: dict = None, academic_year: str = None) -> pd.DataFrame:
+    """
+    Returns the schools in the database that match the given filters.
+
+    For example, the schools in Aldridge-Brownhills where at least 30% of
+    pupils have English as an additional language are returned by
+    query_schools('Aldridge-Brownhills', measure_ranges={'%eal_students_school': (30, None)}).
+
+    Parameters
+    ----------
+    parliamentary_constituency : str, optional
+        Only return schools in this parliamentary constituency.
+    type_of_school : str, optional
+        Only return schools of this type, e.g. 'Academy'.
+    school_urn : int, optional
+        Only return the school with this URN.
+    measure_ranges : dict, optional
+        A dict mapping the name of a measure to a tuple containing the 
+        lowest and highest values allowed. Either value may be None to
+        leave that side unbounded.
+    academic_year : str, optional
+        Only use measures from this academic year, e.g. '2021/2022'.
+
+    Returns
+    -------
+    schools : pd.DataFrame
+        A pd.DataFrame containing the name, URN, type and constituency of
+        every matching school and a column for each measure in 
+        'measure_ranges'.
+    """
+
+    import pandas as pd
+
+    query, parameters = build_school_query(parliamentary_constituency, type_of_school, school_urn, measure_ranges, academic_year)
+
+    with closing(connect_to_database()) as connection:
+        schools = pd.read_sql_query(query, connection, params=parameters)
+
+    return schools
+
+CRAWL_QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl (
+    stage TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawl_shards (
+    shard_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS crawl_shards_status_index ON crawl_shards (status, lease_expires);
+CREATE TABLE IF NOT EXISTS crawl_items (
+    shard_id INTEGER NOT NULL REFERENCES crawl_shards (shard_id),
+    item_key TEXT NOT NULL,
+    item TEXT NOT NULL,
+    PRIMARY KEY (shard_id, item_key)
+);
+"""
+
+def get_stable_hash(key: str) -> int:
+    """
+    Returns a hash of the key that is the same in every process and host.
+
+    Python's built-in hash() of a str is randomised per process, so it 
+    cannot be used to assign work to shards.
+
+    Parameters
+    ----------
+    key : str
+        The key to be hashed.
+
+    Returns
+    -------
+    stable_hash : int
+        A 64-bit hash of the key.
+    """
+
+    import hashlib
+
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+def build_hash_ring(number_of_shards: int, virtual_nodes: int = HASH_RING_VIRTUAL_NODES) -> Tuple[List[int], List[int]]:
+    """
+    Returns a consistent hash ring for the given number of shards.
+
+    Each shard is placed on the ring at 'virtual_nodes' points, so that 
+    the keys are spread evenly between shards, and so that changing the 
+    number of shards only moves the keys next to the added or removed 
+    points. 
+
+    Parameters
+    ----------
+    number_of_shards : int
+        The number of shards.
+    virtual_nodes : int, optional
+        The number of points on the ring for each shard.
+
+    Returns
+    -------
+    ring_points : List[int]
+        The sorted positions of the points on the ring.
+    ring_shards : List[int]
+        The shard that each point belongs to.
+    """
+
+    ring = sorted((get_stable_hash(f'shard-{shard_id}-{virtual_node}'), shard_id) for shard_id in range(number_of_shards) for virtual_node in range(virtual_nodes))
+
+    ring_points = [point for point, shard_id in ring]
+    ring_shards = [shard_id for point, shard_id in ring]
+
+    return ring_points, ring_shards
+
+def get_shard(key: str, hash_ring: Tuple[List[int], List[int]]) -> int:
+    """
+    Returns the shard that the key belongs to.
+
+    The key belongs to the shard of the first point on the ring at or 
+    after the key's hash.
+
+    Parameters
+    ----------
+    key : str
+        The key of the work item, such as a URN or a constituency.
+    hash_ring : Tuple[List[int], List[int]]
+        The hash ring returned by 'build_hash_ring()'.
+
+    Returns
+    -------
+    shard_id : int
+        The shard that the key belongs to.
+    """
+
+    import bisect
+
+    ring_points, ring_shards = hash_ring
+
+    point_index = bisect.bisect_left(ring_points, get_stable_hash(key)) % len(ring_points)
+
+    return ring_shards[point_index]
+
+def connect_to_crawl_queue(queue_path: str) -> sqlite3.Connection:
+    """
+    Returns a connection to the crawl queue at the given path.
+
+    The crawl queue is a SQLite database which stands in for a network 
+    coordinator. Workers on other hosts can use it if it is on a shared
+    file system. The connection is in autocommit mode, so transactions 
+    are started explicitly.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+
+    Returns
+    -------
+    connection : sqlite3.Connection
+        A connection to the crawl queue.
+    """
+
+    import sqlite3
+
+    connection = sqlite3.connect(queue_path, timeout=60, isolation_level=None)
+    connection.executescript(CRAWL_QUEUE_SCHEMA)
+
+    return connection
+
+def get_crawl_items(stage: str) -> List[Tuple[str, list]]:
+    """
+    Returns the work items of a stage that is to be crawled.
+
+    The items of the 'identification' stage are the parliamentary 
+    constituencies. The items of the 'schools' stage are the name, URN 
+    and type of each school.
+
+    Parameters
+    ----------
+    stage : str
+        The stage to be crawled. Either 'identification' or 'schools'.
+
+    Returns
+    -------
+    crawl_items : List[Tuple[str, list]]
+        A list of tuples containing the key of each item and the item.
+    """
+
+    if stage == 'identification':
+        return [(constituency, [constituency]) for constituency in get_parliamentary_constituencies()]
+
+    if stage == 'schools':
+        uk_school_identification_information = get_school_identification_information()
+        return [(str(school_urn), [school_name, str(school_urn), type_of_school]) for school_name, school_urn, type_of_school in uk_school_identification_information[['school_name', 'school_urn', 'type_of_school']].itertuples(index=False)]
+
+    raise ValueError(f"The stage '{stage}' cannot be crawled. The stage must be either 'identification' or 'schools'.")
+
+def create_crawl(queue_path: str, stage: str, crawl_items: List[Tuple[str, list]] = None, number_of_shards: int = DEFAULT_NUMBER_OF_SHARDS) -> int:
+    """
+    Creates a crawl of the given stage in the crawl queue.
+
+    Each work item is assigned to a shard by the consistent hash of its 
+    key. Any previous crawl in the queue is removed.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    stage : str
+        The stage to be crawled. Either 'identification' or 'schools'.
+    crawl_items : List[Tuple[str, list]], optional
+        The key and item of every work item. If not given, the items 
+        returned by 'get_crawl_items()' are used.
+    number_of_shards : int, optional
+        The number of shards the work items are split into.
+
+    Returns
+    -------
+    number_of_shards : int
+        The number of shards that contain at least one work item.
+    """
+
+    import json
+
+    if crawl_items is None:
+        crawl_items = get_crawl_items(stage)
+
+    if stage == 'schools':
+        clear_streaming_aggregates()
+
+    hash_ring = build_hash_ring(number_of_shards)
+    shard_rows = [(get_shard(item_key, hash_ring), item_key, json.dumps(item)) for item_key, item in crawl_items]
+    shard_ids = sorted({shard_id for shard_id, item_key, item in shard_rows})
+
+    with closing(connect_to_crawl_queue(queue_path)) as connection:
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('DELETE FROM crawl')
+        connection.execute('DELETE FROM crawl_items')
+        connection.execute('DELETE FROM crawl_shards')
+        connection.execute('INSERT INTO crawl (stage) VALUES (?)', (stage,))
+        connection.executemany('INSERT INTO crawl_shards (shard_id) VALUES (?)', [(shard_id,) for shard_id in shard_ids])
+        connection.executemany('INSERT OR REPLACE INTO crawl_items (shard_id, item_key, item) VALUES (?, ?, ?)', shard_rows)
+        connection.execute('COMMIT')
+
+    return len(shard_ids)
+
+def lease_shard(queue_path: str, worker_id: str, lease_duration: float = DEFAULT_LEASE_DURATION) -> int:
+    """
+    Leases the next shard of the crawl to the given worker.
+
+    A shard can be leased if it is pending, or if the lease of the worker
+    that held it has expired because the worker died or stalled. 
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    worker_id : str
+        The id of the worker leasing the shard.
+    lease_duration : float, optional
+        The number of seconds before the lease expires.
+
+    Returns
+    -------
+    shard_id : int or None
+        The id of the leased shard, or None if no shard can be leased.
+    """
+
+    now = time.time()
+
+    with closing(connect_to_crawl_queue(queue_path)) as connection:
+        connection.execute('BEGIN IMMEDIATE')
+
+        row = connection.execute("SELECT shard_id FROM crawl_shards WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) ORDER BY shard_id LIMIT 1", (now,)).fetchone()
+
+        if row is None:
+            connection.execute('COMMIT')
+            return None
+
+        shard_id = row[0]
+        connection.execute("UPDATE crawl_shards SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1 WHERE shard_id = ?", (worker_id, now + lease_duration, shard_id))
+        connection.execute('COMMIT')
+
+    return shard_id
+
+def renew_lease(queue_path: str, shard_id: int, worker_id: str, lease_duration: float = DEFAULT_LEASE_DURATION) -> bool:
+    """
+    Extends the lease of a shard that is still leased to the given 
+    worker.
+
+    Called after each work item of the shard, so that a shard which takes
+    longer than the lease duration is not leased to another worker while
+    it is still being processed.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    shard_id : int
+        The id of the shard.
+    worker_id : str
+        The id of the worker processing the shard.
+    lease_duration : float, optional
+        The number of seconds from now before the lease expires.
+
+    Returns
+    -------
+    renewed : bool
+        True if the shard was still leased to the worker.
+    """
+
+    with closing(connect_to_crawl_queue(queue_path)) as connection:
+        connection.execute('BEGIN IMMEDIATE')
+        cursor = connection.execute("UPDATE crawl_shards SET lease_expires = ? WHERE shard_id = ? AND status = 'leased' AND worker_id = ?", (time.time() + lease_duration, shard_id, worker_id))
+        connection.execute('COMMIT')
+
+    return cursor.rowcount == 1
+
+def complete_shard(queue_path: str, shard_id: int, worker_id: str, shard_result: pd.DataFrame) -> bool:
+    """
+    Stores the result of a shard and marks the shard as done.
+
+    The result is stored if the shard is not yet done, even if the lease 
+    of the worker expired and the shard was leased to another worker, so
+    that a slow shard is finished by whichever worker finishes it first.
+    The results of the workers that finish it later are discarded, so 
+    each shard is stored exactly once.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    shard_id : int
+        The id of the shard.
+    worker_id : str
+        The id of the worker that processed the shard.
+    shard_result : pd.DataFrame
+        The data obtained for the shard's work items.
+
+    Returns
+    -------
+    stored : bool
+        True if the result was stored.
+    """
+
+    result = shard_result.to_json(orient='split', index=False)
+
+    with closing(connect_to_crawl_queue(queue_path)) as connection:
+        connection.execute('BEGIN IMMEDIATE')
+        cursor = connection.execute("UPDATE crawl_shards SET status = 'done', result = ?, worker_id = ?, lease_expires = NULL WHERE shard_id = ? AND status = 'leased'", (result, worker_id, shard_id))
+        connection.execute('COMMIT')
+
+    return cursor.rowcount == 1
+
+def read_shard(queue_path: str, shard_id: int) -> Tuple[str, List[list]]:
+    """
+    Returns the stage of the crawl and the work items of a shard.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    shard_id : int
+        The id of the shard.
+
+    Returns
+    -------
+    stage : str
+        The stage being crawled.
+    crawl_items : List[list]
+        The work items of the shard, sorted by key.
+    """
+
+    import json
+
+    with closing(connect_to_crawl_queue(queue_path)) as connection:
+        stage = connection.execute('SELECT stage FROM crawl').fetchone()[0]
+        crawl_items = [json.loads(item) for item, in connection.execute('SELECT item FROM crawl_items WHERE shard_id = ? ORDER BY item_key', (shard_id,))]
+
+    return stage, crawl_items
+
+def process_shard(stage: str, crawl_items: List[list], renew: Callable[[], bool] = None) -> pd.DataFrame:
+    """
+    Returns the data obtained for the work items of a shard.
+
+    The work items are obtained one at a time, so that the lease of the 
+    shard can be renewed after each of them, within a single deadline 
+    returned by 'get_task_deadline()'.
+
+    Parameters
+    ----------
+    stage : str
+        The stage being crawled. Either 'identification' or 'schools'.
+    crawl_items : List[list]
+        The work items of the shard.
+    renew : Callable[[], bool], optional
+        Called after each work item to renew the lease of the shard, e.g.
+        with 'renew_lease()'.
+
+    Returns
+    -------
+    shard_result : pd.DataFrame
+        The data obtained for the shard's work items.
+    """
+
+    import pandas as pd
+
+    item_results = []
+
+    with task_deadline():
+        for crawl_item in crawl_items:
+            if stage == 'identification':
+                item_results.append(scrape_school_identification_information_subset_of_constituencies(crawl_item))
+            else:
+                item_results.append(get_school_data_subset_of_schools(pd.DataFrame([crawl_item], columns=['school_name', 'school_urn', 'type_of_school'])))
+
+            if renew is not None:
+                renew()
+
+    return pd.concat(item_results, ignore_index=True)
+
+def run_crawl_worker(queue_path: str, worker_id: str = None, lease_duration: float = DEFAULT_LEASE_DURATION, poll_interval: float = 5.0) -> int:
+    """
+    Processes shards from the crawl queue until the crawl is finished.
+
+    When every remaining shard is leased to another worker, the worker 
+    waits for those shards to be completed or for their leases to 
+    expire. The lease of each shard is renewed after each of its work 
+    items, so only the shards of dead or stalled workers expire.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    worker_id : str, optional
+        The id of the worker. Defaults to the host name and process id.
+    lease_duration : float, optional
+        The number of seconds before a lease expires.
+    poll_interval : float, optional
+        The number of seconds to wait before trying to lease another 
+        shard when none are available.
+
+    Returns
+    -------
+    number_of_shards : int
+        The number of shards completed by this worker.
+    """
+
+    import socket
+
+    if worker_id is None:
+        worker_id = f'{socket.gethostname()}-{os.getpid()}'
+
+    number_of_shards = 0
+
+    while True:
+        shard_id = lease_shard(queue_path, worker_id, lease_duration)
+
+        if shard_id is None:
+            with closing(connect_to_crawl_queue(queue_path)) as connection:
+                remaining_shards = connection.execute("SELECT COUNT(*) FROM crawl_shards WHERE status != 'done'").fetchone()[0]
+
+            if remaining_shards == 0:
+                return number_of_shards
+
+            time.sleep(poll_interval)
+            continue
+
+        stage, crawl_items = read_shard(queue_path, shard_id)
+
+        shard_result = process_shard(stage, crawl_items, lambda: renew_lease(queue_path, shard_id, worker_id, lease_duration))
+        write_parse_memo_hits()
+
+        if complete_shard(queue_path, shard_id, worker_id, shard_result):
+            number_of_shards += 1
+
+def run_local_crawl_workers(queue_path: str, lease_duration: float = DEFAULT_LEASE_DURATION) -> int:
+    """
+    Runs one crawl worker in each joblib worker process on this host.
+
+    Parameters
+    ----------
+    queue_path : str
+        The path to the crawl queue.
+    lease_duration : float, optional
+        The number of seconds before a lease expires.
 
-def get_single_school_data(school_name: str, school_urn: str) -> pd.DataFrame:
+    Returns
+    -------
+    number_of_shards : int
+        The number of shards completed by the workers.
     """
-    Returns a pd.DataFrame containing the data required for the school.
 
-    Scrapes the gov.uk website to obtain the required information for the
-    school specified. Returns this information as a pd.DataFrame with 
-    columns for all the data specified in the documentation for this
-    class.
+    from joblib import Parallel, delayed
+
+    shard_counts = Parallel(n_jobs=get_n_jobs())(delayed(run_crawl_worker)(queue_path, lease_duration=lease_duration) for worker in range(get_number_of_workers()))
+
+    return sum(shard_counts)
+
+def merge_crawl_results(queue_path: str) -> pd.DataFrame:
+    """
+    Returns the merged results of a finished crawl.
+
+    The results are concatenated in shard order and sorted by URN, so the
+    merged data is the same whichever workers processed which shards.
 
     Parameters
     ----------
-    school_name : str
-        The name of the school whose data is to be obtained. 
-    school_urn : str
-        The Unique Identification Number (URN) of the school whose data
-        is to be obtained.
+    queue_path : str
+        The path to the crawl queue.
 
     Returns
     -------
-    single_school_data : pd.DataFrame
-        A pd.DataFrame containing the required data for the school specified. 
+    crawl_result : pd.DataFrame
+        The data obtained for every work item of the crawl.
     """
 
-    return None
+    import pandas as pd
+    from io import StringIO
+
+    with closing(connect_to_crawl_queue(queue_path)) as connection:
+        remaining_shards = connection.execute("SELECT COUNT(*) FROM crawl_shards WHERE status != 'done'").fetchone()[0]
+
+        if remaining_shards:
+            raise RuntimeError(f"The crawl is not finished. {remaining_shards} shards have not been completed.")
+
+        results = [result for result, in connection.execute('SELECT result FROM crawl_shards ORDER BY shard_id')]
 
-def get_all_school_data() -> pd.DataFrame:
+    shard_results = [pd.read_json(StringIO(result), orient='split', dtype=False) for result in results]
+
+    if not shard_results:
+        return pd.DataFrame()
+
+    crawl_result = pd.concat(shard_results, ignore_index=True)
+    crawl_result = crawl_result.sort_values('school_urn', key=lambda school_urns: school_urns.astype('int64'), kind='stable', ignore_index=True)
+
+    return crawl_result
+
+def count_csv_rows(path: str) -> int:
     """
-    Returns a pd.DataFrame containing the required data for all UK schools
+    Returns the number of rows in a .csv file, excluding the header.
 
-    Calls the function 'get_single_school_data()' for each school returned
-    by 'get_school_identification_information()' concatenating the 
-    pd.DataFrame returned to obtain a single pd.DataFrame containing the
-    information required for all schools in the UK. This DataFrame
-    contains the information described in the documentation for this 
-    class.
+    Uses the csv module rather than pandas so that a dry run does not 
+    need to import pandas. The file is read with 'read_cache_file()', 
+    so the header line of a cache file is not counted.
+
+    Parameters
+    ----------
+    path : str
+        The path to the .csv file.
+
+    Returns
+    -------
+    number_of_rows : int
+        The number of rows in the .csv file.
+    """
+
+    import csv
+    from io import StringIO
+
+    number_of_rows = sum(1 for row in csv.reader(StringIO(read_cache_file(path))) if row)
+
+    return max(number_of_rows - 1, 0)
+
+def plan_run(stage: str, sample_fraction: float = None) -> Tuple[int, float]:
+    """
+    Returns the number of requests a run will make and its duration.
+
+    Files that already exist in the cache directory are reused by a run, 
+    so the requests needed to create them are not counted. When the 
+    number of constituencies or schools is not yet known, the estimates 
+    'ESTIMATED_NUMBER_OF_CONSTITUENCIES' and 'ESTIMATED_NUMBER_OF_SCHOOLS'
+    are used instead. The school pages known to have no data, which are
+    skipped by 'get_school_page_fields()', are not counted.
+
+    The duration assumes each request takes 'ESTIMATED_REQUEST_LATENCY'
+    seconds, that the workers make requests at the same time and that 
+    the rate limit is never exceeded.
+
+    Parameters
+    ----------
+    stage : str
+        The stage to be run. One of 'constituencies', 'identification' or
+        'schools'.
+    sample_fraction : float, optional
+        The fraction of the schools sampled by the 'schools' stage. The 
+        schools already fetched for an earlier sample are assumed to be 
+        in the sample, so the number of requests of a top up is 
+        approximate.
+
+    Returns
+    -------
+    number_of_requests : int
+        The number of requests the run will make.
+    estimated_duration : float
+        The estimated duration of the run in seconds.
+    """
+
+    import math
+
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}'. The stage must be one of {', '.join(STAGES)}.")
+
+    constituencies_path = get_cache_path('uk_parliamentary_constituencies.txt')
+    identification_path = get_cache_path('uk_school_identification_information.csv')
+    england_averages_requests = 0 if is_cache_file_valid(get_cache_path(ENGLAND_AVERAGES_FILE_NAME)) else 2
+
+    if is_cache_file_valid(constituencies_path):
+        number_of_constituencies = len(read_parliamentary_constituencies())
+        constituency_requests = 0
+    else:
+        number_of_constituencies = ESTIMATED_NUMBER_OF_CONSTITUENCIES
+        constituency_requests = 1
+
+    if is_cache_file_valid(identification_path):
+        number_of_schools = count_csv_rows(identification_path)
+        identification_requests = 0
+    else:
+        number_of_schools = ESTIMATED_NUMBER_OF_SCHOOLS
+        identification_requests = constituency_requests + number_of_constituencies
+
+    if stage == 'constituencies':
+        number_of_requests = constituency_requests
+    elif stage == 'identification':
+        number_of_requests = identification_requests
+    elif sample_fraction is not None:
+        sample_data_path = get_cache_path(SAMPLE_DATA_FILE_NAME)
+        number_of_fetched_schools = count_csv_rows(sample_data_path) if is_cache_file_valid(sample_data_path) else 0
+        number_of_requests = identification_requests + 2 * max(0, math.ceil(sample_fraction * number_of_schools) - number_of_fetched_schools)
+    else:
+        number_of_known_empty_pages = get_negative_cache_metrics(read_only=True)['number_of_known_empty_pages'] if is_negative_cache_enabled() else 0
+        number_of_requests = identification_requests + england_averages_requests + max(0, 2 * number_of_schools - number_of_known_empty_pages)
+
+    requests_per_second = get_number_of_workers() / ESTIMATED_REQUEST_LATENCY
+
+    rate_limit = float(os.environ.get(RATE_LIMIT_ENVIRONMENT_VARIABLE, 0))
+    if rate_limit > 0:
+        requests_per_second = min(requests_per_second, rate_limit)
+
+    estimated_duration = number_of_requests / requests_per_second
+
+    return number_of_requests, estimated_duration
+
+def write_all_school_data(all_school_data: pd.DataFrame, england_averages: pd.DataFrame = None) -> str:
+    """
+    Writes the data for all UK schools to 'uk_primary_school_data.csv'.
+
+    The data is normalised by 'normalise_school_data()' first, so the 
+    file only contains the columns that are specific to each school. The
+    local authority averages are written to 
+    'uk_local_authority_averages.csv' and the England averages to 
+    'uk_england_averages.csv'. Every file is created in the output 
+    directory. If the file already exists, a message saying so is output
+    before the file is rewritten. The school data is also written to 
+    'uk_primary_school_data.arrow' by 'write_all_school_data_arrow()' so
+    that it can be loaded, and joined to the averages, with 
+    'load_all_school_data()'.
+
+    Parameters
+    ----------
+    all_school_data : pd.DataFrame
+        The pd.DataFrame returned by 'get_all_school_data()'.
+    england_averages : pd.DataFrame, optional
+        The pd.DataFrame returned by 'get_england_averages()'. If not 
+        given, any England averages in the data are written instead.
+
+    Returns
+    -------
+    output_path : str
+        The path to the file that was written.
+    """
+
+    school_facts, local_authority_averages, data_england_averages = normalise_school_data(all_school_data)
+
+    if england_averages is None:
+        england_averages = data_england_averages
+
+    output_path = os.path.join(get_output_directory(), 'uk_primary_school_data.csv')
+
+    if os.path.isfile(output_path):
+        print(f"The file '{output_path}' already exists and will be rewritten.")
+
+    school_facts.to_csv(output_path)
+
+    if local_authority_averages is not None:
+        local_authority_averages.to_csv(os.path.join(get_output_directory(), LOCAL_AUTHORITY_AVERAGES_FILE_NAME), index=False)
+
+    if england_averages is not None:
+        england_averages_path = os.path.join(get_output_directory(), ENGLAND_AVERAGES_FILE_NAME)
+
+        # The cache directory is the output directory by default, in which 
+        # case the cached England averages are replaced
+        if os.path.abspath(england_averages_path) == os.path.abspath(get_cache_path(ENGLAND_AVERAGES_FILE_NAME)):
+            write_cache_file(england_averages_path, england_averages.to_csv(index=False))
+        else:
+            england_averages.to_csv(england_averages_path, index=False)
+
+    try:
+        write_all_school_data_arrow(school_facts)
+    except ImportError as error:
+        print(f"{error} The file 'uk_primary_school_data.arrow' was not written.")
+
+    return output_path
+
+def write_all_school_data_arrow(all_school_data: pd.DataFrame) -> str:
+    """
+    Writes the school data to 'uk_primary_school_data.arrow'.
+
+    The file is an uncompressed Arrow IPC (Feather version 2) file in the
+    output directory. Since it is uncompressed it can be memory-mapped by
+    'load_all_school_data()'. The file is written to a temporary file 
+    first and then renamed, so that processes which have the previous 
+    file memory-mapped are not affected.
+
+    Parameters
+    ----------
+    all_school_data : pd.DataFrame
+        The fact table returned by 'normalise_school_data()'.
+
+    Returns
+    -------
+    output_path : str
+        The path to the file that was written.
+    """
+
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        raise ImportError("The package 'pyarrow' is required to write Arrow files. Please install it with 'conda install pyarrow'.")
+
+    output_path = os.path.join(get_output_directory(), ARROW_DATA_FILE_NAME)
+    temporary_output_path = f'{output_path}.{os.getpid()}.tmp'
+
+    table = pa.Table.from_pandas(all_school_data, preserve_index=False)
+    feather.write_feather(table, temporary_output_path, compression='uncompressed')
+    os.replace(temporary_output_path, output_path)
+
+    return output_path
+
+def load_all_school_data(columns: List[str] = None) -> pd.DataFrame:
+    """
+    Returns the data for all UK schools from 'uk_primary_school_data.arrow'.
+
+    The file is memory-mapped and the columns of the returned 
+    pd.DataFrame use pd.ArrowDtype, so they are views on the mapped file
+    rather than copies. Only the requested columns are read. Several 
+    processes loading the same file share one copy in the page cache.
+
+    The local authority and England averages are only read, and joined 
+    to the schools, if they are requested. They are looked up from the 
+    files written by 'write_all_school_data()' rather than stored for 
+    every school.
+
+    Parameters
+    ----------
+    columns : List[str], optional
+        The columns to be loaded. If not given, every column of the school
+        data is loaded, followed by the averages.
 
     Returns
     -------
     all_school_data : pd.DataFrame
-        A pd.DataFRame containing the required data for all UK schools.  
-    
+        A pd.DataFrame containing the requested columns of the data for 
+        all UK schools.
+    """
+
+    import pandas as pd
+    from io import StringIO
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("The package 'pyarrow' is required to load Arrow files. Please install it with 'conda install pyarrow'.")
+
+    input_path = os.path.join(get_output_directory(), ARROW_DATA_FILE_NAME)
+    local_authority_averages_path = os.path.join(get_output_directory(), LOCAL_AUTHORITY_AVERAGES_FILE_NAME)
+    england_averages_path = os.path.join(get_output_directory(), ENGLAND_AVERAGES_FILE_NAME)
+
+    if not os.path.isfile(input_path):
+        raise FileNotFoundError(f"The file '{input_path}' does not exist. Please run the 'schools' stage first.")
+
+    with pa.memory_map(input_path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    if columns is None:
+        local_authority_columns = list(LOCAL_AUTHORITY_FIELDS) if 'local_authority_id' in table.column_names and os.path.isfile(local_authority_averages_path) else []
+        england_columns = list(ENGLAND_FIELDS) if os.path.isfile(england_averages_path) else []
+    else:
+        local_authority_columns = [column for column in columns if column in LOCAL_AUTHORITY_FIELDS and column not in table.column_names]
+        england_columns = [column for column in columns if column in ENGLAND_FIELDS and column not in table.column_names]
+
+        table_columns = [column for column in columns if column not in local_authority_columns and column not in england_columns]
+        if local_authority_columns and 'local_authority_id' not in table_columns:
+            table_columns.append('local_authority_id')
+
+        table = table.select(table_columns)
+
+    all_school_data = table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    if local_authority_columns:
+        local_authority_averages = pd.read_csv(local_authority_averages_path, index_col='local_authority_id')
+
+        for column in local_authority_columns:
+            all_school_data[column] = all_school_data['local_authority_id'].map(local_authority_averages[column])
+
+    if england_columns:
+        england_averages = pd.read_csv(StringIO(read_cache_file(england_averages_path)))
+
+        for column in england_columns:
+            all_school_data[column] = england_averages.at[0, column]
+
+    if columns is not None:
+        all_school_data = all_school_data[columns]
+
+    return all_school_data
+
+def retry_unfinished_work(stage: str) -> Tuple[int, int]:
+    """
+    Obtains the work items of the given stage recorded by 
+    'record_unfinished_work()' and merges them into the output of the 
+    stage.
+
+    The schools of the 'identification' stage are added to the file 
+    'uk_school_identification_information.csv'. The data of the 'schools'
+    stage is added to the data written by the last run, read with 
+    'load_all_school_data()', and written again with 
+    'write_all_school_data()', and the retried schools are added to the 
+    streaming aggregates of the last run. The items that are still not 
+    finished are recorded again, for another pass.
+
+    Parameters
+    ----------
+    stage : str
+        The stage whose unfinished work is to be obtained. Either 
+        'identification' or 'schools'.
+
+    Returns
+    -------
+    number_of_finished_items : int
+        The number of work items that were finished.
+    number_of_unfinished_items : int
+        The number of work items that are still unfinished.
+    """
+
+    import pandas as pd
+    from joblib import Parallel, delayed
+
+    if stage not in ('identification', 'schools'):
+        raise ValueError(f"The stage '{stage}' has no unfinished work. The stage must be either 'identification' or 'schools'.")
+
+    unfinished_items = read_unfinished_work(stage)
+
+    if not unfinished_items:
+        return 0, 0
+
+    retry_start_time = time.time()
+
+    item_subsets = [[item for item_key, item in unfinished_items[i:i+10]] for i in range(0, len(unfinished_items), 10)]
+
+    result_batches = Parallel(**get_parallel_arguments())(delayed(run_and_spill_result_batch)(process_shard, stage, item_subset) for item_subset in item_subsets)
+    retried_data = collect_result_batches(result_batches)
+
+    # Only the items recorded before this pass are removed, so the items 
+    # that were recorded again by this pass remain
+    remove_unfinished_work(stage, retry_start_time)
+    number_of_unfinished_items = len(read_unfinished_work(stage))
+
+    if retried_data is not None and not retried_data.empty:
+        retried_data['school_urn'] = retried_data['school_urn'].astype('int64')
+
+        if stage == 'identification':
+            identification_path = get_cache_path('uk_school_identification_information.csv')
+
+            with lock_cache_file(identification_path):
+                uk_school_identification_information = pd.concat([read_school_identification_information(), retried_data]).drop_duplicates('school_urn', keep='last')
+                write_cache_file(identification_path, uk_school_identification_information.to_csv())
+        else:
+            try:
+                previous_school_data = load_all_school_data().drop(columns='local_authority_id', errors='ignore')
+                previous_school_data = previous_school_data[~previous_school_data['school_urn'].astype('int64').isin(retried_data['school_urn'])]
+            except FileNotFoundError:
+                previous_school_data = None
+
+            write_all_school_data(pd.concat([previous_school_data, retried_data], ignore_index=True), get_england_averages())
+
+    return len(unfinished_items) - number_of_unfinished_items, number_of_unfinished_items
+
+def run_stage(stage: str, re_extract: bool = False, sample_fraction: float = None, sample_seed: int = DEFAULT_SAMPLE_SEED, unfinished: bool = False) -> int:
+    """
+    Runs the given stage and writes its output.
+
+    Parameters
+    ----------
+    stage : str
+        The stage to be run. One of 'constituencies', 'identification' or
+        'schools'.
+    re_extract : bool, optional
+        If True, the stage's pages are parsed again even if its output 
+        file already exists. Used with offline mode to rerun the parsers
+        on the raw HTML archive. 
+    sample_fraction : float, optional
+        If given, the 'schools' stage only obtains the data for a 
+        stratified sample of this fraction of the schools, and writes it
+        with 'write_school_sample_data()'.
+    sample_seed : int, optional
+        The seed of the sample.
+    unfinished : bool, optional
+        If True, only the work left unfinished by earlier runs of the 
+        stage is done, with 'retry_unfinished_work()'.
+
+    Returns
+    -------
+    exit_code : int
+        The exit code of the script. 
+    """
+
+    os.makedirs(get_cache_directory(), exist_ok=True)
+    os.makedirs(get_output_directory(), exist_ok=True)
+
+    stage_start_time = time.time()
+
+    if is_parse_memo_enabled():
+        initial_parse_memo_metrics = get_parse_memo_metrics()
+
+    if is_negative_cache_enabled():
+        initial_negative_cache_metrics = get_negative_cache_metrics()
+
+    if unfinished:
+        number_of_finished_items, number_of_unfinished_items = retry_unfinished_work(stage)
+        print(f"Finished {number_of_finished_items} of the {number_of_finished_items + number_of_unfinished_items} unfinished work items of the '{stage}' stage.")
+    elif stage == 'constituencies':
+        if re_extract:
+            uk_parliamentary_constituencies = scrape_parliamentary_constituencies()
+        else:
+            uk_parliamentary_constituencies = get_parliamentary_constituencies()
+
+        print(f"Obtained {len(uk_parliamentary_constituencies)} parliamentary constituencies.")
+    elif stage == 'identification':
+        if re_extract:
+            uk_school_identification_information = scrape_school_identification_information()
+        else:
+            uk_school_identification_information = get_school_identification_information()
+
+        print(f"Obtained the identification information for {len(uk_school_identification_information)} schools.")
+    elif sample_fraction is not None:
+        school_sample_data = get_all_school_data(sample_fraction, sample_seed)
+
+        if school_sample_data is None:
+            print("No school data was obtained.")
+            return 1
+
+        output_path = write_school_sample_data(school_sample_data)
+        print(f"Written the data for a sample of {len(school_sample_data)} schools to '{output_path}'.")
+    else:
+        england_averages = get_england_averages()
+        all_school_data = get_all_school_data()
+
+        if all_school_data is None:
+            print("No school data was obtained.")
+            return 1
+
+        output_path = write_all_school_data(all_school_data, england_averages)
+        print(f"Written the data for {len(all_school_data)} schools to '{output_path}'.")
+
+    concurrency_controller = get_concurrency_controller()
+    if concurrency_controller is not None:
+        metrics = concurrency_controller.get_metrics()
+        print(f"Final concurrency window: {metrics['window']:.1f} (p95 latency {metrics['p95_latency']:.2f}s, error rate {metrics['error_rate']:.1%}).")
+
+    hedging_policy = get_hedging_policy()
+    if hedging_policy is not None:
+        metrics = hedging_policy.get_metrics()
+        print(f"Hedged {metrics['number_of_hedges']} of {metrics['number_of_requests']} requests, of which {metrics['number_of_hedge_wins']} responded first.")
+
+    timeout_counts = get_timeout_counts(since=stage_start_time)
+    if timeout_counts:
+        print(f"Timeouts: {', '.join(f'{endpoint} {count}' for endpoint, count in timeout_counts.items())}.")
+
+    if stage in ('identification', 'schools'):
+        number_of_unfinished_items = len(read_unfinished_work(stage))
+        if number_of_unfinished_items:
+            print(f"{number_of_unfinished_items} work items were not finished. Run the '{stage}' stage with --unfinished to obtain them.")
+
+    if is_parse_memo_enabled():
+        metrics = get_parse_memo_metrics()
+        print(f"Parse memo: {metrics['number_of_hits'] - initial_parse_memo_metrics['number_of_hits']} hits, {metrics['number_of_misses'] - initial_parse_memo_metrics['number_of_misses']} misses and {metrics['number_of_evictions'] - initial_parse_memo_metrics['number_of_evictions']} evictions ({metrics['size'] / 2**20:.1f}MB).")
+
+    if is_negative_cache_enabled() and stage == 'schools':
+        metrics = get_negative_cache_metrics()
+        print(f"Negative cache: skipped {metrics['number_of_skips'] - initial_negative_cache_metrics['number_of_skips']} pages known to have no data ({metrics['number_of_known_empty_pages']} known).")
+
+    return 0
+
+def run_crawl_action(action: str, stage: str = None, queue_path: str = None, number_of_shards: int = DEFAULT_NUMBER_OF_SHARDS, lease_duration: float = DEFAULT_LEASE_DURATION) -> int:
+    """
+    Runs one step of a sharded crawl.
+
+    Parameters
+    ----------
+    action : str
+        'init' to create the crawl, 'work' to run crawl workers on this 
+        host or 'merge' to write the results of a finished crawl.
+    stage : str, optional
+        The stage to be crawled. Required by 'init'.
+    queue_path : str, optional
+        The path to the crawl queue. Defaults to 'crawl_queue.sqlite' in
+        the cache directory.
+    number_of_shards : int, optional
+        The number of shards the work is split into.
+    lease_duration : float, optional
+        The number of seconds before a lease expires.
+
+    Returns
+    -------
+    exit_code : int
+        The exit code of the script. 
+    """
+
+    os.makedirs(get_cache_directory(), exist_ok=True)
+    os.makedirs(get_output_directory(), exist_ok=True)
+
+    if queue_path is None:
+        queue_path = get_cache_path(CRAWL_QUEUE_FILE_NAME)
+
+    if action == 'init':
+        if stage is None:
+            print("The stage to be crawled must be given, e.g. 'crawl init schools'.")
+            return 2
+
+        number_of_shards = create_crawl(queue_path, stage, number_of_shards=number_of_shards)
+        print(f"Created a crawl of the '{stage}' stage with {number_of_shards} shards in '{queue_path}'.")
+    elif action == 'work':
+        number_of_shards = run_local_crawl_workers(queue_path, lease_duration)
+        print(f"Completed {number_of_shards} shards.")
+    else:
+        with closing(connect_to_crawl_queue(queue_path)) as connection:
+            stage = connection.execute('SELECT stage FROM crawl').fetchone()[0]
+
+        crawl_result = merge_crawl_results(queue_path)
+
+        if stage == 'identification':
+            output_path = get_cache_path('uk_school_identification_information.csv')
+            with lock_cache_file(output_path):
+                write_cache_file(output_path, crawl_result.to_csv())
+        else:
+            output_path = write_all_school_data(crawl_result, get_england_averages())
+
+        print(f"Written the merged results for {len(crawl_result)} schools to '{output_path}'.")
+
+    return 0
+
+def parse_arguments(arguments: List[str] = None) -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Parameters
+    ----------
+    arguments : List[str], optional
+        The command line arguments. If not given, 'sys.argv[1:]' is used.
+
+    Returns
+    -------
+    parsed_arguments : argparse.Namespace
+        The parsed command line arguments. 
+    """
+
+    import argparse
+
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument('--user-agent', help="The user agent to be used when making html requests. Defaults to the contents of 'user_agent.txt' in the cache directory.")
+    common_parser.add_argument('--workers', type=int, help=f"The number of joblib workers. Negative values are interpreted as by joblib. Defaults to {DEFAULT_N_JOBS}.")
+    common_parser.add_argument('--adaptive-concurrency', type=int, metavar='MAXIMUM', help="Make requests from threads and adjust the number in flight, up to MAXIMUM, from the observed latency and errors.")
+    common_parser.add_argument('--hedge-percentile', type=float, metavar='PERCENTILE', help="Send a duplicate of any request still running after PERCENTILE of the recent latencies, keeping the first response.")
+    common_parser.add_argument('--hedge-budget', type=float, help=f"The largest proportion of requests that may be hedged. Defaults to {DEFAULT_HEDGE_BUDGET}.")
+    common_parser.add_argument('--http-backend', choices=HTTP_BACKENDS, help="The HTTP client used to make requests. 'http2' multiplexes the requests of each worker over a few HTTP/2 connections. Defaults to 'requests'.")
+    common_parser.add_argument('--rate-limit', type=float, help="The maximum number of requests per second across all workers. Defaults to no limit.")
+    common_parser.add_argument('--cache-dir', help=f"The directory used to store intermediate data files. Defaults to '{DEFAULT_CACHE_DIRECTORY}'.")
+    common_parser.add_argument('--output-dir', help="The directory the final data set is written to. Defaults to the cache directory.")
+    common_parser.add_argument('--dry-run', action='store_true', help="Print the number of requests and the estimated duration of the run without making any requests.")
+    common_parser.add_argument('--no-archive', action='store_true', help="Do not write fetched pages to the raw HTML archive.")
+    common_parser.add_argument('--no-database', action='store_true', help="Do not write the scraped data to the database 'uk_school_data.sqlite'.")
+    common_parser.add_argument('--no-parse-memo', action='store_true', help="Parse every page rather than reusing the records extracted from pages whose content has not changed.")
+    common_parser.add_argument('--parse-memo-size', type=float, metavar='MEGABYTES', help=f"The largest size of the parse memo 'parse_memo.sqlite'. Defaults to {DEFAULT_PARSE_MEMO_SIZE}.")
+    common_parser.add_argument('--no-negative-cache', action='store_true', help="Request every school page, including those known to have no data.")
+    common_parser.add_argument('--negative-cache-recheck', type=float, metavar='DAYS', help=f"The number of days after which a school page known to have no data is requested again. Defaults to {DEFAULT_NEGATIVE_CACHE_RECHECK:.0f}.")
+    common_parser.add_argument('--connect-timeout', type=float, metavar='SECONDS', help=f"The longest time to wait for a connection to be made. Defaults to {DEFAULT_CONNECT_TIMEOUT:.0f}.")
+    common_parser.add_argument('--read-timeout', type=float, metavar='SECONDS', help=f"The longest time to wait for each read of a response. Defaults to {DEFAULT_READ_TIMEOUT:.0f}.")
+    common_parser.add_argument('--task-deadline', type=float, metavar='SECONDS', help="The longest time each batch of work may take. The work not finished in time is recorded for a later pass.")
+    common_parser.add_argument('--deadline', type=float, metavar='SECONDS', help="The longest time the run may take. The work not finished in time is recorded for a later pass.")
+    common_parser.add_argument('--result-transfer', choices=RESULT_TRANSFERS, help=f"How the workers pass their results back. 'arrow' writes results of at least {RESULT_BATCH_SPILL_MINIMUM_SIZE} values to memory-mapped Arrow files and 'pickle' returns them through joblib. The batches of 10 constituencies or schools are smaller, so the identification and schools stages are always pickled. Defaults to 'arrow'.")
+
+    parser = argparse.ArgumentParser(description="Scrapes the data required for the Analysis of UK School Performance project.")
+    subparsers = parser.add_subparsers(dest='stage', required=True)
+
+    subparsers.add_parser('constituencies', parents=[common_parser], help="Obtain the list of UK parliamentary constituencies.")
+    identification_parser = subparsers.add_parser('identification', parents=[common_parser], help="Obtain the name, URN and type of every primary school.")
+    identification_parser.add_argument('--unfinished', action='store_true', help="Only obtain the constituencies left unfinished by earlier runs and add them to the output.")
+    schools_parser = subparsers.add_parser('schools', parents=[common_parser], help="Obtain the data for every primary school.")
+    schools_parser.add_argument('--unfinished', action='store_true', help="Only obtain the schools left unfinished by earlier runs and add them to the output.")
+    schools_parser.add_argument('--sample', type=float, metavar='FRACTION', help="Obtain the data for a stratified sample of this fraction of the schools in each constituency and type of school, with sampling weights. Rerunning with a larger fraction tops up the sample.")
+    schools_parser.add_argument('--sample-seed', type=int, default=DEFAULT_SAMPLE_SEED, help=f"The seed of the sample. Defaults to {DEFAULT_SAMPLE_SEED}.")
+
+    crawl_parser = subparsers.add_parser('crawl', parents=[common_parser], help="Run a stage as a sharded crawl shared by workers on any number of hosts.")
+    crawl_parser.add_argument('action', choices=('init', 'work', 'merge'), help="'init' creates the crawl, 'work' runs a worker in each joblib worker process and 'merge' writes the results of a finished crawl.")
+    crawl_parser.add_argument('target_stage', nargs='?', choices=('identification', 'schools'), help="The stage to be crawled. Required by 'init'.")
+    crawl_parser.add_argument('--queue', help=f"The path to the crawl queue, which must be on a file system shared by every host. Defaults to '{CRAWL_QUEUE_FILE_NAME}' in the cache directory.")
+    crawl_parser.add_argument('--shards', type=int, default=DEFAULT_NUMBER_OF_SHARDS, help=f"The number of shards the work is split into. Defaults to {DEFAULT_NUMBER_OF_SHARDS}.")
+    crawl_parser.add_argument('--lease-duration', type=float, default=DEFAULT_LEASE_DURATION, help=f"The number of seconds before the shard of a dead worker is leased again. Defaults to {DEFAULT_LEASE_DURATION:.0f}.")
+
+    re_extract_parser = subparsers.add_parser('re-extract', parents=[common_parser], help="Rerun the parsers of a stage on the raw HTML archive without making any requests.")
+    re_extract_parser.add_argument('target_stage', choices=STAGES, help="The stage whose pages are to be re-extracted.")
+
+    subparsers.add_parser('summary', parents=[common_parser], help="Print summary statistics of the schools scraped so far, which can be done while a run is in progress.")
+
+    return parser.parse_args(arguments)
+
+def main(arguments: List[str] = None) -> int:
+    """
+    Runs the stage given on the command line.
+
+    The command line options are stored in environment variables so that 
+    they are inherited by the joblib worker processes.
+
+    Parameters
+    ----------
+    arguments : List[str], optional
+        The command line arguments. If not given, 'sys.argv[1:]' is used.
+
+    Returns
+    -------
+    exit_code : int
+        The exit code of the script. 
     """
 
-    return None
\ No newline at end of file
+    parsed_arguments = parse_arguments(arguments)
+
+    if parsed_arguments.user_agent is not None:
+        os.environ[USER_AGENT_ENVIRONMENT_VARIABLE] = parsed_arguments.user_agent
+    if parsed_arguments.workers is not None:
+        os.environ[N_JOBS_ENVIRONMENT_VARIABLE] = str(parsed_arguments.workers)
+    if parsed_arguments.adaptive_concurrency is not None:
+        os.environ[ADAPTIVE_CONCURRENCY_ENVIRONMENT_VARIABLE] = str(parsed_arguments.adaptive_concurrency)
+    if parsed_arguments.hedge_percentile is not None:
+        os.environ[HEDGE_PERCENTILE_ENVIRONMENT_VARIABLE] = str(parsed_arguments.hedge_percentile)
+    if parsed_arguments.hedge_budget is not None:
+        os.environ[HEDGE_BUDGET_ENVIRONMENT_VARIABLE] = str(parsed_arguments.hedge_budget)
+    if parsed_arguments.http_backend is not None:
+        os.environ[HTTP_BACKEND_ENVIRONMENT_VARIABLE] = parsed_arguments.http_backend
+    if parsed_arguments.rate_limit is not None:
+        os.environ[RATE_LIMIT_ENVIRONMENT_VARIABLE] = str(parsed_arguments.rate_limit)
+    if parsed_arguments.cache_dir is not None:
+        os.environ[CACHE_DIRECTORY_ENVIRONMENT_VARIABLE] = parsed_arguments.cache_dir
+    if parsed_arguments.output_dir is not None:
+        os.environ[OUTPUT_DIRECTORY_ENVIRONMENT_VARIABLE] = parsed_arguments.output_dir
+
+    if parsed_arguments.no_archive:
+        os.environ[ARCHIVE_ENVIRONMENT_VARIABLE] = '0'
+    if parsed_arguments.no_database:
+        os.environ[DATABASE_ENVIRONMENT_VARIABLE] = '0'
+    if parsed_arguments.no_parse_memo:
+        os.environ[PARSE_MEMO_ENVIRONMENT_VARIABLE] = '0'
+    if parsed_arguments.parse_memo_size is not None:
+        os.environ[PARSE_MEMO_SIZE_ENVIRONMENT_VARIABLE] = str(parsed_arguments.parse_memo_size)
+    if parsed_arguments.no_negative_cache:
+        os.environ[NEGATIVE_CACHE_ENVIRONMENT_VARIABLE] = '0'
+    if parsed_arguments.negative_cache_recheck is not None:
+        os.environ[NEGATIVE_CACHE_RECHECK_ENVIRONMENT_VARIABLE] = str(parsed_arguments.negative_cache_recheck)
+    if parsed_arguments.result_transfer is not None:
+        os.environ[RESULT_TRANSFER_ENVIRONMENT_VARIABLE] = parsed_arguments.result_transfer
+    if parsed_arguments.connect_timeout is not None:
+        os.environ[CONNECT_TIMEOUT_ENVIRONMENT_VARIABLE] = str(parsed_arguments.connect_timeout)
+    if parsed_arguments.read_timeout is not None:
+        os.environ[READ_TIMEOUT_ENVIRONMENT_VARIABLE] = str(parsed_arguments.read_timeout)
+    if parsed_arguments.task_deadline is not None:
+        os.environ[TASK_DEADLINE_ENVIRONMENT_VARIABLE] = str(parsed_arguments.task_deadline)
+    if parsed_arguments.deadline is not None:
+        os.environ[RUN_DEADLINE_ENVIRONMENT_VARIABLE] = str(time.time() + parsed_arguments.deadline)
+
+    if parsed_arguments.stage == 'crawl':
+        return run_crawl_action(parsed_arguments.action, parsed_arguments.target_stage, parsed_arguments.queue, parsed_arguments.shards, parsed_arguments.lease_duration)
+
+    if parsed_arguments.stage == 'summary':
+        streaming_aggregates = read_streaming_aggregates()
+        print(streaming_aggregates.get_summary().to_string())
+        print(streaming_aggregates.get_covariances().to_string())
+        return 0
+
+    if parsed_arguments.stage == 're-extract':
+        os.environ[OFFLINE_ENVIRONMENT_VARIABLE] = '1'
+
+        if parsed_arguments.workers is None:
+            os.environ[N_JOBS_ENVIRONMENT_VARIABLE] = '-1'
+
+        if parsed_arguments.dry_run:
+            print(f"Re-extraction will read from {len(read_archive_index())} archived pages using {get_number_of_workers()} workers and make no requests.")
+            return 0
+
+        return run_stage(parsed_arguments.target_stage, re_extract=True)
+
+    sample_fraction = getattr(parsed_arguments, 'sample', None)
+
+    if parsed_arguments.dry_run:
+        number_of_requests, estimated_duration = plan_run(parsed_arguments.stage, sample_fraction)
+        print(f"The '{parsed_arguments.stage}' stage will make {number_of_requests} requests using {get_number_of_workers()} workers.")
+        print(f"Estimated duration: {estimated_duration:.0f} seconds ({estimated_duration / 3600:.2f} hours).")
+        return 0
+
+    if sample_fraction is not None:
+        return run_stage(parsed_arguments.stage, sample_fraction=sample_fraction, sample_seed=parsed_arguments.sample_seed)
+
+    return run_stage(parsed_arguments.stage, unfinished=getattr(parsed_arguments, 'unfinished', False))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Benchmarks for the DataAcquisition.py script
+
+The benchmarks make requests to a local stand-in server rather than to the
+real websites, so that they can be run as often as needed without putting
+any load on them. Each benchmark prints a comparison of the approaches it
+measures.
+
+Examples
+--------
+>>> python benchmarks/benchmark_DataAcquisition.py hedging
+>>> python benchmarks/benchmark_DataAcquisition.py http2
+>>> python benchmarks/benchmark_DataAcquisition.py streaming
+>>> python benchmarks/benchmark_DataAcquisition.py section
+>>> python benchmarks/benchmark_DataAcquisition.py transfer
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import DataAcquisition
+from stand_in_servers import get_constituency_section_response, start_http1_stand_in_server, start_http2_stand_in_server
+
+def run_fetches(url: str, number_of_requests: int, number_of_threads: int) -> tuple:
+    """
+    Fetches the given url from the given number of threads.
+
+    Returns
+    -------
+    latencies : list
+        The latency of each fetch in seconds.
+    total_time : float
+        The time taken by all of the fetches in seconds.
+    """
+
+    def timed_fetch(request):
+        start_time = time.perf_counter()
+        DataAcquisition.fetch_page(url)
+        return time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=number_of_threads) as executor:
+        latencies = list(executor.map(timed_fetch, range(number_of_requests)))
+
+    return latencies, time.perf_counter() - start_time
+
+def get_percentile(values: list, percentile: float) -> float:
+    """
+    Returns the given percentile of the values.
+    """
+
+    return statistics.quantiles(values, n=100)[int(percentile) - 1]
+
+def benchmark_hedging(number_of_requests: int = 1000, number_of_threads: int = 8, slow_proportion: float = 0.03, percentile: float = 95, budget: float = 0.1, seed: int = 0) -> None:
+    """
+    Compares the p99 latency and the total time of a crawl with and 
+    without hedged requests.
+
+    The stand-in server responds in 10-30ms, except for a proportion of
+    responses which take 0.5-1s, like the occasional very slow school 
+    page.
+    """
+
+    random_number_generator = random.Random(seed)
+    random_lock = threading.Lock()
+
+    def get_latency():
+        with random_lock:
+            if random_number_generator.random() < slow_proportion:
+                return random_number_generator.uniform(0.5, 1.0)
+            return random_number_generator.uniform(0.01, 0.03)
+
+    server = start_http1_stand_in_server(get_latency)
+    url = f"{server.url}/school"
+
+    environment = {DataAcquisition.USER_AGENT_ENVIRONMENT_VARIABLE: 'benchmark', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}
+    results = {}
+
+    try:
+        for name, hedge_environment in (('unhedged', {}), ('hedged', {DataAcquisition.HEDGE_PERCENTILE_ENVIRONMENT_VARIABLE: str(percentile), DataAcquisition.HEDGE_BUDGET_ENVIRONMENT_VARIABLE: str(budget)})):
+            random_number_generator.seed(seed)
+
+            with patch.dict(os.environ, {**environment, **hedge_environment}), patch('DataAcquisition._hedging_policy', None):
+                latencies, total_time = run_fetches(url, number_of_requests, number_of_threads)
+                hedging_policy = DataAcquisition.get_hedging_policy()
+                metrics = hedging_policy.get_metrics() if hedging_policy is not None else None
+
+            results[name] = (get_percentile(latencies, 50), get_percentile(latencies, 99), total_time)
+
+            print(f"{name:>8}: p50 {results[name][0] * 1000:7.1f}ms  p99 {results[name][1] * 1000:7.1f}ms  total {results[name][2]:6.2f}s")
+
+            if metrics is not None:
+                print(f"{'':>8}  hedged {metrics['number_of_hedges']} of {metrics['number_of_requests']} requests, {metrics['number_of_hedge_wins']} hedges responded first")
+    finally:
+        server.shutdown()
+
+    print(f"p99 improved by {1 - results['hedged'][1] / results['unhedged'][1]:.0%} and total time by {1 - results['hedged'][2] / results['unhedged'][2]:.0%}.")
+
+def benchmark_http2(number_of_requests: int = 1000, number_of_threads: int = 32, latency: float = 0.02) -> None:
+    """
+    Compares the p99 latency, the total time and the number of 
+    connections of a crawl made with the 'requests' HTTP/1.1 backend and
+    with the HTTP/2 backend, each from the same number of threads.
+    """
+
+    environment = {DataAcquisition.USER_AGENT_ENVIRONMENT_VARIABLE: 'benchmark', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}
+    results = {}
+
+    for http_backend, start_server in (('requests', start_http1_stand_in_server), ('http2', start_http2_stand_in_server)):
+        server = start_server(lambda: latency)
+
+        try:
+            with patch.dict(os.environ, {**environment, DataAcquisition.HTTP_BACKEND_ENVIRONMENT_VARIABLE: http_backend}), patch('DataAcquisition._http2_client', None):
+                latencies, total_time = run_fetches(f"{server.url}/school", number_of_requests, number_of_threads)
+        finally:
+            server.shutdown()
+
+        results[http_backend] = (get_percentile(latencies, 99), total_time)
+
+        print(f"{http_backend:>8}: p99 {results[http_backend][0] * 1000:7.1f}ms  total {total_time:6.2f}s  {server.number_of_connections} connections for {server.number_of_requests} requests")
+
+    print(f"HTTP/2 changed p99 by {results['http2'][0] / results['requests'][0] - 1:+.0%} and total time by {results['http2'][1] / results['requests'][1] - 1:+.0%}.")
+
+def benchmark_streaming(number_of_requests: int = 20, bytes_per_second: float = 2e6) -> None:
+    """
+    Compares the bytes sent and the time taken to fetch the table 
+    'table#England' of the sample constituency page with and without
+    compression and with and without stopping the download once the 
+    table is complete, over a network limited to the given bandwidth.
+    """
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'test_data', 'uk_constituency_wiki_sample.html'), 'rb') as file:
+        page = file.read()
+
+    environment = {DataAcquisition.USER_AGENT_ENVIRONMENT_VARIABLE: 'benchmark', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}
+    results = {}
+
+    for name, gzip_responses, target_element in (('identity, full page', False, None), ('identity, early stop', False, ('table', 'England')), ('gzip, full page', True, None), ('gzip, early stop', True, ('table', 'England'))):
+        server = start_http1_stand_in_server(body=page, gzip_responses=gzip_responses, bytes_per_second=bytes_per_second)
+
+        try:
+            with patch.dict(os.environ, environment):
+                start_time = time.perf_counter()
+                for request in range(number_of_requests):
+                    content = DataAcquisition.fetch_page(f"{server.url}/constituencies", target_element)
+                total_time = time.perf_counter() - start_time
+        finally:
+            server.shutdown()
+
+        assert b'id="England"' in content and b'</table>' in content[content.index(b'id="England"'):]
+
+        results[name] = (server.number_of_bytes_sent / number_of_requests, total_time / number_of_requests)
+
+        print(f"{name:>20}: {results[name][0] / 1000:6.1f}kB sent  {results[name][1] * 1000:6.1f}ms per page")
+
+    baseline = results['identity, full page']
+    print(f"Bytes sent cut by {1 - results['gzip, early stop'][0] / baseline[0]:.0%} and time per page by {1 - results['gzip, early stop'][1] / baseline[1]:.0%}.")
+
+def benchmark_section(number_of_runs: int = 20) -> None:
+    """
+    Compares the bytes sent and the time taken by 
+    'scrape_parliamentary_constituencies()' when it requests the section
+    of the sample constituency page containing the table and when it 
+    falls back to requesting the whole page.
+    """
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'test_data', 'uk_constituency_wiki_sample.html'), 'rb') as file:
+        page = file.read()
+
+    page_server = start_http1_stand_in_server(body=page)
+    section_server = start_http1_stand_in_server(body=get_constituency_section_response(page))
+    results = {}
+
+    try:
+        for name, section_url in (('whole page', 'http://127.0.0.1:1/unreachable'), ('section', f"{section_server.url}/w/api.php")):
+            with tempfile.TemporaryDirectory() as cache_directory:
+                environment = {DataAcquisition.CACHE_DIRECTORY_ENVIRONMENT_VARIABLE: cache_directory, DataAcquisition.USER_AGENT_ENVIRONMENT_VARIABLE: 'benchmark', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0', DataAcquisition.DATABASE_ENVIRONMENT_VARIABLE: '0'}
+                number_of_bytes_sent = page_server.number_of_bytes_sent + section_server.number_of_bytes_sent
+
+                with patch.dict(os.environ, environment), patch('DataAcquisition.PARLIAMENTARY_DATA_URL', f"{page_server.url}/wiki"), patch('DataAcquisition.PARLIAMENTARY_DATA_SECTION_URL', section_url):
+                    start_time = time.perf_counter()
+                    for run in range(number_of_runs):
+                        constituencies = DataAcquisition.scrape_parliamentary_constituencies()
+                    total_time = time.perf_counter() - start_time
+
+            assert len(constituencies) == 5
+
+            results[name] = ((page_server.number_of_bytes_sent + section_server.number_of_bytes_sent - number_of_bytes_sent) / number_of_runs, total_time / number_of_runs)
+
+            print(f"{name:>10}: {results[name][0] / 1000:6.1f}kB sent  {results[name][1] * 1000:6.1f}ms per scrape")
+    finally:
+        page_server.shutdown()
+        section_server.shutdown()
+
+    print(f"Requesting the section cut bytes sent by {results['whole page'][0] / results['section'][0]:.0f}x and time per scrape by {results['whole page'][1] / results['section'][1]:.0f}x.")
+
+def get_mock_school_data_batch(first_school_urn: int, number_of_schools: int, number_of_measures: int):
+    """
+    Returns a pd.DataFrame shaped like the data returned by 
+    'get_school_data_subset_of_schools()' for the given number of schools.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    random_generator = np.random.default_rng(first_school_urn)
+    school_urns = np.arange(first_school_urn, first_school_urn + number_of_schools)
+
+    school_data = pd.DataFrame(random_generator.normal(size=(number_of_schools, number_of_measures)), columns=[f'measure_{measure}' for measure in range(number_of_measures)])
+    school_data.insert(0, 'type_of_school', 'Academy')
+    school_data.insert(0, 'school_urn', school_urns)
+    school_data.insert(0, 'school_name', [f'School {school_urn}' for school_urn in school_urns])
+
+    return school_data
+
+def benchmark_transfer(number_of_schools: int = 32000, batch_size: int = 1000, number_of_measures: int = 60, number_of_workers: int = 2, number_of_runs: int = 3) -> None:
+    """
+    Compares the time taken to receive and concatenate the batches of 
+    school data made by joblib worker processes when they are returned 
+    through joblib's pickling and when they are spilled to Arrow files by
+    'run_and_spill_result_batch()' and memory-mapped by 
+    'collect_result_batches()'.
+
+    The CPU time of the parent is reported as well as the elapsed time, 
+    since the parent receives the results of every worker on its own 
+    while the conversion to Arrow is shared between the workers. The runs
+    of the two approaches alternate and the fastest of each is reported.
+    Batches smaller than 'RESULT_BATCH_SPILL_MINIMUM_SIZE' are pickled by
+    both approaches.
+    """
+
+    import pandas as pd
+    from joblib import Parallel, delayed
+
+    first_school_urns = range(100000, 100000 + number_of_schools, batch_size)
+    results = {'pickle': [], 'arrow': []}
+
+    with tempfile.TemporaryDirectory() as cache_directory, patch.dict(os.environ, {DataAcquisition.CACHE_DIRECTORY_ENVIRONMENT_VARIABLE: cache_directory}):
+        # Starts the worker processes, so that their start up is not timed
+        Parallel(n_jobs=number_of_workers)(delayed(time.sleep)(0) for worker in range(number_of_workers))
+
+        for run in range(number_of_runs):
+            for name in results:
+                start_time = time.perf_counter()
+                start_cpu_time = time.process_time()
+
+                if name == 'pickle':
+                    school_data_batches = Parallel(n_jobs=number_of_workers)(delayed(get_mock_school_data_batch)(first_school_urn, batch_size, number_of_measures) for first_school_urn in first_school_urns)
+                    school_data = pd.concat(school_data_batches, ignore_index=True)
+                else:
+                    school_data_batches = Parallel(n_jobs=number_of_workers)(delayed(DataAcquisition.run_and_spill_result_batch)(get_mock_school_data_batch, first_school_urn, batch_size, number_of_measures) for first_school_urn in first_school_urns)
+                    school_data = DataAcquisition.collect_result_batches(school_data_batches).reset_index(drop=True)
+
+                results[name].append((time.perf_counter() - start_time, time.process_time() - start_cpu_time))
+
+                assert len(school_data) == number_of_schools
+
+    for name in results:
+        results[name] = (min(elapsed_time for elapsed_time, cpu_time in results[name]), min(cpu_time for elapsed_time, cpu_time in results[name]))
+        print(f"{name:>6}: {results[name][0] * 1000:7.1f}ms elapsed  {results[name][1] * 1000:7.1f}ms of parent CPU for {len(first_school_urns)} batches of {batch_size} schools")
+
+    print(f"Spilling to Arrow files took {results['arrow'][0] / results['pickle'][0]:.2f}x the elapsed time and {results['arrow'][1] / results['pickle'][1]:.2f}x the parent CPU time.")
+
+BENCHMARKS = {
+    'hedging': benchmark_hedging,
+    'http2': benchmark_http2,
+    'streaming': benchmark_streaming,
+    'section': benchmark_section,
+    'transfer': benchmark_transfer,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the DataAcquisition.py script.")
+    parser.add_argument('benchmarks', nargs='*', help=f"The benchmarks to be run, from {tuple(BENCHMARKS)}. Defaults to all of them.")
+    benchmarks = parser.parse_args().benchmarks or list(BENCHMARKS)
+
+    for benchmark in benchmarks:
+        if benchmark not in BENCHMARKS:
+            parser.error(f"Unknown benchmark '{benchmark}'.")
+
+    for benchmark in benchmarks:
+        print(f"Benchmark: {benchmark}")
+        BENCHMARKS[benchmark]()
@@ -0,0 +1,263 @@
+"""
+Local stand-in servers for the tests and benchmarks of DataAcquisition.py
+
+Each server runs in a daemon thread on a free port of 127.0.0.1 and
+responds to every GET request with the same body after a latency, so that
+the fetch layer can be exercised without making requests to the real
+websites.
+"""
+
+import gzip
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_PAGE = b'<html><body><table id="England"><tr><td>0</td></tr></table></body></html>'
+
+def get_constituency_section_response(page: bytes) -> bytes:
+    """
+    Returns the response of the MediaWiki parse endpoint for the section 
+    'England' of the given constituency article.
+
+    The section runs from its heading to the heading of the next section,
+    'Scotland', as it does when it is rendered by MediaWiki.
+
+    Parameters
+    ----------
+    page : bytes
+        The whole constituency article, such as the file 
+        'uk_constituency_wiki_sample.html'.
+
+    Returns
+    -------
+    response : bytes
+        The JSON response containing the section.
+    """
+
+    text = page.decode('utf-8')
+    start = text.rindex('<h3', 0, text.index('id="England">England'))
+    end = text.rindex('<h3', 0, text.index('id="Scotland">Scotland'))
+
+    return json.dumps({'parse': {'title': 'Constituencies of the Parliament of the United Kingdom', 'revid': 1204196556, 'text': text[start:end]}}).encode('utf-8')
+
+class StandInServer:
+    """
+    A running stand-in server.
+
+    Attributes
+    ----------
+    url : str
+        The url of the server.
+    number_of_connections : int
+        The number of connections accepted by the server.
+    number_of_requests : int
+        The number of requests received by the server.
+    number_of_bytes_sent : int
+        The number of bytes of response bodies sent by the server.
+
+    Methods
+    -------
+    shutdown()
+        Stops the server.
+    """
+
+    def __init__(self):
+        self.url = None
+        self.number_of_connections = 0
+        self.number_of_requests = 0
+        self.number_of_bytes_sent = 0
+        self._lock = threading.Lock()
+        self._shutdown = None
+
+    def count_connection(self):
+        with self._lock:
+            self.number_of_connections += 1
+
+    def count_request(self):
+        with self._lock:
+            self.number_of_requests += 1
+
+    def count_bytes_sent(self, number_of_bytes):
+        with self._lock:
+            self.number_of_bytes_sent += number_of_bytes
+
+    def shutdown(self):
+        self._shutdown()
+
+def start_http1_stand_in_server(get_latency=lambda: 0.0, body: bytes = MOCK_PAGE, gzip_responses: bool = False, bytes_per_second: float = None) -> StandInServer:
+    """
+    Starts a local HTTP/1.1 server.
+
+    The body is sent in chunks of 16 KiB, and the rest of it is not sent
+    if the client closes the connection.
+
+    Parameters
+    ----------
+    get_latency : callable, optional
+        Returns the latency of a response in seconds.
+    body : bytes, optional
+        The body of every response.
+    gzip_responses : bool, optional
+        If True, the body is compressed with gzip for clients which 
+        accept it.
+    bytes_per_second : float, optional
+        If given, the body is sent no faster than this, like over a slow 
+        network.
+
+    Returns
+    -------
+    stand_in_server : StandInServer
+        The running server.
+    """
+
+    stand_in_server = StandInServer()
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            stand_in_server.count_connection()
+
+        def handle(self):
+            try:
+                super().handle()
+            except ConnectionResetError:
+                pass
+
+        def do_GET(self):
+            stand_in_server.count_request()
+            time.sleep(get_latency())
+
+            response_body = body
+            is_gzipped = gzip_responses and 'gzip' in self.headers.get('Accept-Encoding', '')
+            if is_gzipped:
+                response_body = gzip.compress(body)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(response_body)))
+            if is_gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.end_headers()
+
+            for start in range(0, len(response_body), 16384):
+                chunk = response_body[start:start + 16384]
+
+                try:
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                    return
+
+                stand_in_server.count_bytes_sent(len(chunk))
+
+                if bytes_per_second is not None:
+                    time.sleep(len(chunk) / bytes_per_second)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stand_in_server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    stand_in_server._shutdown = server.shutdown
+
+    return stand_in_server
+
+def start_http2_stand_in_server(get_latency=lambda: 0.0, body: bytes = MOCK_PAGE) -> StandInServer:
+    """
+    Starts a local cleartext HTTP/2 server, which expects clients to use
+    HTTP/2 with prior knowledge.
+
+    Every stream of a connection is answered from its own thread, so that
+    slow responses do not hold up the other streams of the connection.
+    The body must fit in the initial flow control window of 65,535 bytes.
+
+    Parameters
+    ----------
+    get_latency : callable, optional
+        Returns the latency of a response in seconds.
+    body : bytes, optional
+        The body of every response.
+
+    Returns
+    -------
+    stand_in_server : StandInServer
+        The running server.
+    """
+
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    stand_in_server = StandInServer()
+    listening_socket = socket.create_server(('127.0.0.1', 0))
+    stopped = threading.Event()
+
+    def handle_connection(connection_socket):
+        connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        lock = threading.Lock()
+
+        def respond(stream_id):
+            time.sleep(get_latency())
+
+            with lock:
+                connection.send_headers(stream_id, [(':status', '200'), ('content-type', 'text/html'), ('content-length', str(len(body)))])
+
+                frame_size = connection.max_outbound_frame_size
+                for start in range(0, len(body), frame_size):
+                    connection.send_data(stream_id, body[start:start + frame_size])
+                connection.end_stream(stream_id)
+
+                connection_socket.sendall(connection.data_to_send())
+
+            stand_in_server.count_bytes_sent(len(body))
+
+        with connection_socket:
+            with lock:
+                connection.initiate_connection()
+                connection_socket.sendall(connection.data_to_send())
+
+            while not stopped.is_set():
+                try:
+                    data = connection_socket.recv(65536)
+                except OSError:
+                    break
+
+                if not data:
+                    break
+
+                with lock:
+                    for event in connection.receive_data(data):
+                        if isinstance(event, h2.events.RequestReceived):
+                            stand_in_server.count_request()
+                            threading.Thread(target=respond, args=(event.stream_id,), daemon=True).start()
+
+                    connection_socket.sendall(connection.data_to_send())
+
+    def serve_forever():
+        while not stopped.is_set():
+            try:
+                connection_socket, address = listening_socket.accept()
+            except OSError:
+                break
+
+            stand_in_server.count_connection()
+            threading.Thread(target=handle_connection, args=(connection_socket,), daemon=True).start()
+
+    def shutdown():
+        stopped.set()
+        listening_socket.close()
+
+    threading.Thread(target=serve_forever, daemon=True).start()
+
+    stand_in_server.url = f"http://127.0.0.1:{listening_socket.getsockname()[1]}"
+    stand_in_server._shutdown = shutdown
+
+    return stand_in_server
@@ -2,18 +2,26 @@ import sys
 
 sys.path.append('..')
 
+import subprocess
+
 import pytest 
 import shutil
 from pathlib import Path
 import os
+import time
 import pandas as pd
+import numpy as np
+import json
 from io import StringIO
+from contextlib import closing
 
 import DataAcquisition
 from typing import List
 
 from unittest.mock import patch
 
+from stand_in_servers import MOCK_PAGE, get_constituency_section_response, start_http1_stand_in_server, start_http2_stand_in_server
+
 EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST = {'Aldershot', 'Aldridge-Brownhills', 'Altrincham and Sale West', 'Ashton-under-Lyne', 'Banbury'}
 
 EXPECTED_SINGLE_SCHOOL_PRIMARY_URL = "https://www.compare-school-performance.service.gov.uk/school/104241/st-anne's-catholic-primary-school%2c-streetly/primary"
@@ -22,6 +30,10 @@ EXPECTED_SINGLE_SCHOOL_ABSENCE_AND_PUPIL_URL = "https://www.compare-school-perfo
 
 EXPECTED_ERROR_MESSAGE = "The file 'user_agent.txt' does not exist. Please create a file 'user_agent.txt' in the 'data' directory and enter your user agent."
 
+HEAVY_DEPENDENCIES = ('pandas', 'bs4', 'requests', 'joblib')
+
+IMPORT_TIME_BUDGET_MICROSECONDS = 50000
+
 PARLIAMENTARY_CONSTITUENT_WIKI_URL = "https://en.wikipedia.org/w/index.php?title=Constituencies_of_the_Parliament_of_the_United_Kingdom&oldid=1204196556"
 
 class TestDataAcquisition:
@@ -121,6 +133,62 @@ class TestDataAcquisition:
     test_get_single_school_data_correct_return()
 
     test_get_all_school_data_correct_return()
+
+    test_get_user_agent_environment_variable_set_correct_return()
+
+    test_plan_run_files_exist_correct_return()
+
+    test_plan_run_files_do_not_exist_correct_return()
+
+    test_main_dry_run_correct_output()
+
+    test_import_time_within_budget()
+
+    test_main_dry_run_does_not_import_heavy_dependencies()
+
+    test_get_soup_writes_archive_record()
+
+    test_get_soup_offline_reads_archive_record()
+
+    test_main_re_extract_constituencies_correct_return()
+
+    test_get_single_school_primary_data_mock_page_correct_return()
+
+    test_get_single_school_absence_and_pupil_data_mock_page_correct_return()
+
+    test_get_single_school_data_mock_pages_correct_return()
+
+    test_compile_field_spec_duplicate_field_correct_output()
+
+    test_load_all_school_data_correct_return()
+
+    test_load_all_school_data_does_not_copy_data()
+
+    test_query_schools_constituency_and_measure_correct_return()
+
+    test_query_schools_point_lookup_correct_return()
+
+    test_build_school_query_uses_indexes()
+
+    test_get_shard_adding_shard_moves_few_keys()
+
+    test_run_crawl_worker_releases_expired_lease()
+
+    test_merge_crawl_results_correct_return()
+
+    test_validate_school_data_correct_return()
+
+    test_get_school_data_subset_of_schools_quarantines_invalid_rows()
+
+    test_concurrency_controller_healthy_requests_increase_window()
+
+    test_concurrency_controller_overloaded_requests_decrease_window_once()
+
+    test_concurrency_controller_slow_requests_hold_window()
+
+    test_concurrency_controller_acquire_full_window_correct_return()
+
+    test_fetch_page_too_many_requests_decreases_window()
     """
 
     @pytest.fixture
@@ -170,7 +238,8 @@ class TestDataAcquisition:
         This fixture will be used in the test cases that test functions
         that request the parliamentary constituent web page. Rather than
         returning the actual wiki page, this fixture will return the 
-        mock wiki page 'uk_constituency_wiki_sample.html'.
+        mock wiki page 'uk_constituency_wiki_sample.html', and its section
+        'England' for requests to the MediaWiki parse endpoint.
         """
 
         mock_html_file_path = Path.cwd() / "test_data" / "uk_constituency_wiki_sample.html"
@@ -179,6 +248,74 @@ class TestDataAcquisition:
             mock_html_content = mock_data_file.read()
 
         requests_mock.get(PARLIAMENTARY_CONSTITUENT_WIKI_URL, text=mock_html_content)
+        requests_mock.get(DataAcquisition.PARLIAMENTARY_DATA_SECTION_URL, content=get_constituency_section_response(mock_html_content.encode('utf-8')))
+
+    @pytest.fixture
+    def mock_requests_get_single_school_pages(self, requests_mock):
+        """
+        Mocks the 'requests.get()' function 
+
+        This fixture will be used in the test cases that test functions
+        that request the primary and absence and pupil population pages 
+        for 'St Anne's Catholic Primary School, Streetly'. Rather than 
+        returning the actual pages, this fixture will return the mock 
+        pages 'mock_school_primary_page.html' and 
+        'mock_school_absence_and_pupil_page.html', whose values are the 
+        same as those in the mock data files for this school.
+        """
+
+        mock_primary_file_path = Path.cwd() / "test_data" / "mock_school_primary_page.html"
+        mock_absence_and_pupil_file_path = Path.cwd() / "test_data" / "mock_school_absence_and_pupil_page.html"
+
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, text=mock_primary_file_path.read_text(encoding='utf-8'))
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_ABSENCE_AND_PUPIL_URL, text=mock_absence_and_pupil_file_path.read_text(encoding='utf-8'))
+
+    @pytest.fixture
+    def mock_school_database(self, temp_data_directory):
+        """
+        Creates a database in the temporary 'data' directory containing 
+        the 30 schools in Aldridge-Brownhills and the measures for the 8 
+        schools stored in the file 'mock_get_all_school_data_return.csv'.
+        One further school is added to Aldershot.
+        """
+
+        mock_school_identification_information = pd.read_csv(Path.cwd() / "test_data" / "mock_uk_school_identification_information_test.csv", index_col=0, sep='|')
+        mock_all_school_data = pd.read_csv(Path.cwd() / "test_data" / "mock_get_all_school_data_return.csv", index_col=0, sep='|')
+        mock_aldershot_school = pd.DataFrame({'school_name': ['Mock Aldershot School'], 'school_urn': [999999], 'type_of_school': ['Academy']})
+
+        DataAcquisition.write_constituencies_to_database(sorted(EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST))
+        DataAcquisition.write_schools_to_database('Aldridge-Brownhills', mock_school_identification_information)
+        DataAcquisition.write_schools_to_database('Aldershot', mock_aldershot_school)
+        DataAcquisition.write_school_measures_to_database(mock_all_school_data)
+
+        yield mock_all_school_data
+
+    @pytest.fixture
+    def mock_identification_crawl(self, temp_data_directory):
+        """
+        Creates a crawl of the 'identification' stage for the 5 
+        parliamentary constituencies given in the documentation for this
+        test class, split into 3 shards.
+
+        Rather than scraping the gov.uk website, each constituency is 
+        given one mock school whose URN is the position of the 
+        constituency in alphabetical order.
+        """
+
+        constituencies = sorted(EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST)
+        queue_path = str(temp_data_directory / "crawl_queue.sqlite")
+
+        def mock_scrape_school_identification_information_subset_of_constituencies(parliamentary_constituencies):
+            return pd.DataFrame({
+                'school_name': [f'{constituency} School' for constituency in parliamentary_constituencies],
+                'school_urn': [str(100000 + constituencies.index(constituency)) for constituency in parliamentary_constituencies],
+                'type_of_school': ['Academy' for constituency in parliamentary_constituencies],
+            })
+
+        number_of_shards = DataAcquisition.create_crawl(queue_path, 'identification', [(constituency, [constituency]) for constituency in constituencies], number_of_shards=3)
+
+        with patch('DataAcquisition.scrape_school_identification_information_subset_of_constituencies', side_effect=mock_scrape_school_identification_information_subset_of_constituencies):
+            yield queue_path, number_of_shards
 
     def test_get_user_agent_file_exists_correct_return(self, temp_data_directory):
         """
@@ -606,4 +743,1745 @@ class TestDataAcquisition:
         all_school_data = DataAcquisition.get_all_school_data()
 
         # Assert
-        pd.testing.assert_frame_equal(all_school_data, mock_expected_return_data)
\ No newline at end of file
+        pd.testing.assert_frame_equal(all_school_data, mock_expected_return_data)
+
+    def test_get_user_agent_environment_variable_set_correct_return(self, temp_data_directory):
+        """
+        Tests that 'get_user_agent' returns the user agent given on the
+        command line
+
+        Tests that the function 'get_user_agent' returns the user agent 
+        stored in the environment variable 'UK_SCHOOL_USER_AGENT' when 
+        the file 'user_agent.txt' does not exist.
+        """
+
+        # Arrange
+        expected_user_agent = "Mock User Agent"
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.USER_AGENT_ENVIRONMENT_VARIABLE: expected_user_agent}):
+            user_agent = DataAcquisition.get_user_agent()
+
+        # Assert
+        assert user_agent == expected_user_agent, "get_user_agent() did not return the user agent stored in the environment variable."
+
+    def test_plan_run_files_exist_correct_return(self, temp_data_directory):
+        """
+        Tests that 'plan_run' returns the correct number of requests when 
+        the file 'uk_parliamentary_constituencies.txt' exists.
+
+        The 5 constituencies described in the documentation for this test
+        class should each need one request, and the constituency list 
+        itself should not be requested again.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_uk_parliamentary_constituencies_test.txt"
+        temporary_mock_data_file = temp_data_directory / "uk_parliamentary_constituencies.txt"
+        shutil.copy(permanent_mock_data_file, temporary_mock_data_file)
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.N_JOBS_ENVIRONMENT_VARIABLE: "5"}):
+            constituency_requests, constituency_duration = DataAcquisition.plan_run('constituencies')
+            identification_requests, identification_duration = DataAcquisition.plan_run('identification')
+
+        # Assert
+        assert constituency_requests == 0, "plan_run() counted a request for a file that already exists."
+        assert identification_requests == 5, "plan_run() did not count one request per constituency."
+        assert identification_duration == pytest.approx(5 * DataAcquisition.ESTIMATED_REQUEST_LATENCY / 5), "plan_run() did not return the correct duration."
+
+    def test_plan_run_files_do_not_exist_correct_return(self, temp_data_directory):
+        """
+        Tests that 'plan_run' returns the correct number of requests when 
+        no files exist in the cache directory.
+
+        The estimated number of constituencies and schools should be used
+        and the rate limit should bound the estimated duration.
+        """
+
+        # Arrange
+        expected_requests = 1 + DataAcquisition.ESTIMATED_NUMBER_OF_CONSTITUENCIES + 2 + 2 * DataAcquisition.ESTIMATED_NUMBER_OF_SCHOOLS
+        environment = {DataAcquisition.N_JOBS_ENVIRONMENT_VARIABLE: "100", DataAcquisition.RATE_LIMIT_ENVIRONMENT_VARIABLE: "2"}
+
+        # Act
+        with patch.dict(os.environ, environment):
+            number_of_requests, estimated_duration = DataAcquisition.plan_run('schools')
+
+        # Assert
+        assert number_of_requests == expected_requests, "plan_run() did not return the correct number of requests."
+        assert estimated_duration == pytest.approx(expected_requests / 2), "plan_run() did not respect the rate limit."
+
+    def test_main_dry_run_correct_output(self, temp_data_directory, requests_mock, capsys):
+        """
+        Tests that 'main' with the '--dry-run' option prints the plan for
+        the run without making any requests.
+
+        'requests_mock' raises an exception for any request that has not 
+        been registered, so any request made would fail this test.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_uk_parliamentary_constituencies_test.txt"
+        temporary_mock_data_file = temp_data_directory / "uk_parliamentary_constituencies.txt"
+        shutil.copy(permanent_mock_data_file, temporary_mock_data_file)
+
+        # Act
+        with patch.dict(os.environ, {}):
+            exit_code = DataAcquisition.main(['identification', '--dry-run', '--workers', '1', '--cache-dir', 'data'])
+
+        # Assert
+        output = capsys.readouterr().out
+        assert exit_code == 0, "main() did not return an exit code of 0."
+        assert "5 requests" in output, "main() did not print the number of requests."
+        assert requests_mock.call_count == 0, "main() made a request during a dry run."
+
+    def test_import_time_within_budget(self):
+        """
+        Tests that importing 'DataAcquisition' is fast
+
+        Runs 'python -X importtime' in a new interpreter and checks that
+        the cumulative import time of 'DataAcquisition' is within 
+        IMPORT_TIME_BUDGET_MICROSECONDS, and that none of the heavy 
+        dependencies were imported.
+        """
+
+        # Arrange
+        repository_directory = Path.cwd().parent
+        command = [sys.executable, '-X', 'importtime', '-c', 'import DataAcquisition']
+
+        # Act
+        completed_process = subprocess.run(command, cwd=repository_directory, capture_output=True, text=True, check=True)
+
+        # Assert
+        import_times = {}
+        for line in completed_process.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_time, cumulative_time, module_name = line[len('import time:'):].split('|')
+            import_times[module_name.strip()] = int(cumulative_time)
+
+        assert import_times['DataAcquisition'] < IMPORT_TIME_BUDGET_MICROSECONDS, f"Importing DataAcquisition took {import_times['DataAcquisition']}us."
+        for dependency in HEAVY_DEPENDENCIES:
+            assert dependency not in import_times, f"Importing DataAcquisition imported {dependency}."
+
+    def test_main_dry_run_does_not_import_heavy_dependencies(self, temp_data_directory):
+        """
+        Tests that a dry run of the 'schools' stage does not import any of
+        the heavy dependencies, even when the cached files exist.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_uk_school_identification_information_test.csv"
+        temporary_mock_data_file = temp_data_directory / "uk_school_identification_information.csv"
+        shutil.copy(permanent_mock_data_file, temporary_mock_data_file)
+
+        code = f"import sys; sys.path.append('..'); import DataAcquisition; DataAcquisition.main(['schools', '--dry-run']); print(sorted(set({HEAVY_DEPENDENCIES!r}) & set(sys.modules)))"
+
+        # Act
+        completed_process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+
+        # Assert
+        assert completed_process.stdout.splitlines()[-1] == '[]', "A dry run imported a heavy dependency."
+
+    def test_get_soup_writes_archive_record(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that 'get_soup' appends the fetched page to the raw HTML 
+        archive
+
+        The record should be found through the archive index and its body
+        should be identical to the body of the response.
+        """
+
+        # Arrange
+        dummy_url = 'http://dummy.com'
+        mock_content = b"<p>Mock Content</p>"
+        requests_mock.get(dummy_url, content=mock_content)
+
+        # Act
+        DataAcquisition.get_soup(dummy_url)
+        archived_content = DataAcquisition.read_archive_record(dummy_url)
+
+        # Assert
+        assert archived_content == mock_content, "get_soup() did not archive the fetched page."
+
+    def test_get_soup_offline_reads_archive_record(self, temp_data_directory, requests_mock):
+        """
+        Tests that 'get_soup' reads the page from the raw HTML archive in
+        offline mode, without making any requests.
+        """
+
+        # Arrange
+        dummy_url = 'http://dummy.com'
+        DataAcquisition.write_archive_record('http://other.com', b"<p>Other Content</p>")
+        DataAcquisition.write_archive_record(dummy_url, b"<p>Mock Content</p>")
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.OFFLINE_ENVIRONMENT_VARIABLE: '1'}):
+            soup = DataAcquisition.get_soup(dummy_url)
+
+        # Assert
+        assert soup.find("p").text == "Mock Content", "get_soup() did not return the archived page."
+        assert requests_mock.call_count == 0, "get_soup() made a request in offline mode."
+
+    def test_main_re_extract_constituencies_correct_return(self, temp_data_directory, requests_mock):
+        """
+        Tests that 'main' with the 're-extract constituencies' command 
+        recreates 'uk_parliamentary_constituencies.txt' from the raw HTML
+        archive without making any requests. 
+
+        The file should contain all of the parliamentary constituencies 
+        given in the documentation for this test class.
+        """
+
+        # Arrange
+        mock_html_file_path = Path.cwd() / "test_data" / "uk_constituency_wiki_sample.html"
+        DataAcquisition.write_archive_record(PARLIAMENTARY_CONSTITUENT_WIKI_URL, mock_html_file_path.read_bytes())
+
+        # Act
+        with patch.dict(os.environ, {}):
+            exit_code = DataAcquisition.main(['re-extract', 'constituencies'])
+
+        # Assert
+        assert exit_code == 0, "main() did not return an exit code of 0."
+        assert set(DataAcquisition.read_parliamentary_constituencies()) == EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST, "main() did not re-extract the correct list"
+        assert requests_mock.call_count == 0, "main() made a request while re-extracting."
+
+    def test_get_single_school_primary_data_mock_page_correct_return(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_single_school_pages):
+        """
+        Tests 'get_single_school_primary_data' return is correct when the
+        primary page is replaced by the mock page 'mock_school_primary_page.html'.
+
+        The pd.DataFrame returned should be the same as the pd.DataFrame
+        stored in the file 'mock_get_single_primary_data_test.csv', 
+        without the England averages.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_get_single_primary_data_test.csv"
+        mock_school_primary_data = pd.read_csv(permanent_mock_data_file, index_col=0).drop(columns=list(DataAcquisition.COMPILED_SCHOOL_PRIMARY_ENGLAND_FIELD_SPEC[1]))
+
+        # Act
+        school_primary_data = DataAcquisition.get_single_school_primary_data("St Anne's Catholic Primary School, Streetly", "104241")
+
+        # Assert
+        pd.testing.assert_frame_equal(school_primary_data, mock_school_primary_data)
+
+    def test_get_single_school_absence_and_pupil_data_mock_page_correct_return(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_single_school_pages):
+        """
+        Tests 'get_single_school_absence_and_pupil_data' return is correct
+        when the absence and pupil population page is replaced by the mock
+        page 'mock_school_absence_and_pupil_page.html'.
+
+        The pd.DataFrame returned should be the same as the pd.DataFrame
+        stored in the file 'mock_get_single_school_absence_and_pupil_data_test.csv',
+        without the England averages, followed by the local authority code
+        in the school's DfE number. The mock page also contains a row that
+        is not in the field spec, which should be ignored.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_get_single_school_absence_and_pupil_data_test.csv"
+        mock_school_absence_and_pupil_data = pd.read_csv(permanent_mock_data_file, index_col=0).drop(columns=list(DataAcquisition.COMPILED_SCHOOL_ABSENCE_AND_PUPIL_ENGLAND_FIELD_SPEC[1])).assign(local_authority_code=335)
+
+        # Act
+        school_absence_and_pupil_data = DataAcquisition.get_single_school_absence_and_pupil_data("St Anne's Catholic Primary School, Streetly", "104241")
+
+        # Assert
+        pd.testing.assert_frame_equal(school_absence_and_pupil_data, mock_school_absence_and_pupil_data)
+
+    def test_get_single_school_data_mock_pages_correct_return(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_single_school_pages):
+        """
+        Tests 'get_single_school_data' returns the absence and pupil data
+        and local authority code followed by the primary results data, 
+        without the England averages, when both pages are replaced by the
+        mock pages. 
+        """
+
+        # Arrange
+        permanent_mock_absence_and_pupil_data_file = Path.cwd() / "test_data" / "mock_get_single_school_absence_and_pupil_data_test.csv"
+        permanent_mock_primary_data_file = Path.cwd() / "test_data" / "mock_get_single_primary_data_test.csv"
+        mock_school_data = pd.concat([pd.read_csv(permanent_mock_absence_and_pupil_data_file, index_col=0).assign(local_authority_code=335), pd.read_csv(permanent_mock_primary_data_file, index_col=0)], axis=1).drop(columns=list(DataAcquisition.ENGLAND_FIELDS))
+
+        # Act
+        school_data = DataAcquisition.get_single_school_data("St Anne's Catholic Primary School, Streetly", "104241")
+
+        # Assert
+        pd.testing.assert_frame_equal(school_data, mock_school_data)
+
+    def test_compile_field_spec_duplicate_field_correct_output(self):
+        """
+        Tests that 'compile_field_spec' raises a ValueError when the same
+        field is given for two different cells.
+        """
+
+        # Arrange
+        field_spec = {'Girls on roll': {'school': '%girls_school'}, 'Boys on roll': {'school': '%girls_school'}}
+
+        # Act
+        with pytest.raises(ValueError):
+            DataAcquisition.compile_field_spec(field_spec)
+
+        # Assert
+
+    def test_load_all_school_data_correct_return(self, temp_data_directory):
+        """
+        Tests that 'load_all_school_data' returns the requested columns of
+        the data written by 'write_all_school_data'.
+
+        Uses the data stored in the file 'mock_get_all_school_data_return.csv'.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_get_all_school_data_return.csv"
+        mock_all_school_data = pd.read_csv(permanent_mock_data_file, index_col=0, sep='|')
+        DataAcquisition.write_all_school_data(mock_all_school_data)
+
+        columns = ['school_urn', '%eal_students_school']
+
+        # Act
+        all_school_data = DataAcquisition.load_all_school_data(columns)
+
+        # Assert
+        assert list(all_school_data.columns) == columns, "load_all_school_data() did not return the requested columns."
+        pd.testing.assert_frame_equal(all_school_data.astype(mock_all_school_data[columns].dtypes), mock_all_school_data[columns])
+
+    def test_load_all_school_data_does_not_copy_data(self, temp_data_directory):
+        """
+        Tests that 'load_all_school_data' returns a view on the 
+        memory-mapped file rather than a copy of the data.
+
+        If the data were copied, pyarrow would allocate memory for it.
+        """
+
+        # Arrange
+        pyarrow = pytest.importorskip('pyarrow')
+        mock_all_school_data = pd.DataFrame({'school_urn': range(100000), '%eal_students_school': [float(i % 100) for i in range(100000)]})
+        DataAcquisition.write_all_school_data(mock_all_school_data)
+        allocated_bytes_before = pyarrow.total_allocated_bytes()
+
+        # Act
+        all_school_data = DataAcquisition.load_all_school_data()
+
+        # Assert
+        allocated_bytes = pyarrow.total_allocated_bytes() - allocated_bytes_before
+        assert allocated_bytes < mock_all_school_data.memory_usage().sum() / 100, "load_all_school_data() copied the data."
+        assert all_school_data['%eal_students_school'].sum() == mock_all_school_data['%eal_students_school'].sum(), "load_all_school_data() did not return the correct data."
+
+    def test_query_schools_constituency_and_measure_correct_return(self, mock_school_database):
+        """
+        Tests that 'query_schools' returns the schools in a constituency
+        whose measure is within the given range.
+
+        The schools returned should be the schools stored in the file 
+        'mock_get_all_school_data_return.csv' with at least 10% of pupils
+        with English as an additional language.
+        """
+
+        # Arrange
+        mock_all_school_data = mock_school_database
+        expected_school_urns = sorted(mock_all_school_data.loc[mock_all_school_data['%eal_students_school'] >= 10, 'school_urn'])
+
+        # Act
+        schools = DataAcquisition.query_schools('Aldridge-Brownhills', measure_ranges={'%eal_students_school': (10, None)})
+
+        # Assert
+        assert list(schools['school_urn']) == expected_school_urns, "query_schools() did not return the correct schools."
+        assert (schools['%eal_students_school'] >= 10).all(), "query_schools() returned a school outside the measure range."
+        assert (schools['parliamentary_constituency'] == 'Aldridge-Brownhills').all(), "query_schools() returned a school in the wrong constituency."
+
+    def test_query_schools_point_lookup_correct_return(self, mock_school_database):
+        """
+        Tests that 'query_schools' returns the correct school when it is 
+        given a URN.
+        """
+
+        # Arrange
+
+        # Act
+        schools = DataAcquisition.query_schools(school_urn=999999)
+
+        # Assert
+        assert len(schools) == 1, "query_schools() did not return exactly one school."
+        assert schools.loc[0, 'school_name'] == 'Mock Aldershot School', "query_schools() did not return the correct school."
+        assert schools.loc[0, 'parliamentary_constituency'] == 'Aldershot', "query_schools() did not return the correct constituency."
+
+    def test_build_school_query_uses_indexes(self, mock_school_database):
+        """
+        Tests that the queries built by 'build_school_query' are answered
+        using indexes rather than by scanning a table. 
+        """
+
+        # Arrange
+        filters = [
+            {'parliamentary_constituency': 'Aldridge-Brownhills'},
+            {'type_of_school': 'Academy'},
+            {'school_urn': 104241},
+            {'measure_ranges': {'%eal_students_school': (30, None)}},
+        ]
+
+        # Act
+        query_plans = []
+        for query_filter in filters:
+            query, parameters = DataAcquisition.build_school_query(**query_filter)
+            with DataAcquisition.closing(DataAcquisition.connect_to_database()) as connection:
+                query_plans.append(' '.join(row[-1] for row in connection.execute('EXPLAIN QUERY PLAN ' + query, parameters)))
+
+        # Assert
+        for query_filter, query_plan in zip(filters, query_plans):
+            assert 'SCAN' not in query_plan, f"The query for {query_filter} scans a table: {query_plan}"
+
+    def test_get_shard_adding_shard_moves_few_keys(self):
+        """
+        Tests that adding a shard to the consistent hash ring only moves 
+        the keys that are assigned to the new shard.
+
+        Roughly 1/17 of the keys should move when going from 16 to 17 
+        shards, and every key that moves should move to the new shard.
+        """
+
+        # Arrange
+        keys = [str(school_urn) for school_urn in range(100000, 110000)]
+        hash_ring = DataAcquisition.build_hash_ring(16)
+        larger_hash_ring = DataAcquisition.build_hash_ring(17)
+
+        # Act
+        shards = [DataAcquisition.get_shard(key, hash_ring) for key in keys]
+        larger_shards = [DataAcquisition.get_shard(key, larger_hash_ring) for key in keys]
+
+        # Assert
+        moved_shards = [larger_shard for shard, larger_shard in zip(shards, larger_shards) if shard != larger_shard]
+        assert set(moved_shards) == {16}, "get_shard() moved keys between the existing shards."
+        assert len(moved_shards) < 2 * len(keys) / 17, "get_shard() moved too many keys."
+
+    def test_run_crawl_worker_releases_expired_lease(self, mock_identification_crawl):
+        """
+        Tests that a shard leased by a worker that died is processed by 
+        another worker once the lease has expired, and that the dead 
+        worker can no longer complete it.
+        """
+
+        # Arrange
+        queue_path, expected_number_of_shards = mock_identification_crawl
+        dead_worker_shard_id = DataAcquisition.lease_shard(queue_path, 'dead-worker', lease_duration=-1)
+
+        # Act
+        number_of_shards = DataAcquisition.run_crawl_worker(queue_path, 'live-worker', poll_interval=0)
+        stored = DataAcquisition.complete_shard(queue_path, dead_worker_shard_id, 'dead-worker', pd.DataFrame())
+
+        # Assert
+        assert number_of_shards == expected_number_of_shards, "run_crawl_worker() did not complete every shard."
+        assert stored == False, "complete_shard() stored the result of an expired lease."
+
+    def test_merge_crawl_results_correct_return(self, mock_identification_crawl):
+        """
+        Tests that 'merge_crawl_results' returns one row for each 
+        constituency, sorted by URN, when the shards are processed by two
+        workers.
+        """
+
+        # Arrange
+        queue_path, number_of_shards = mock_identification_crawl
+        first_shard_id = DataAcquisition.lease_shard(queue_path, 'first-worker')
+        DataAcquisition.complete_shard(queue_path, first_shard_id, 'first-worker', DataAcquisition.process_shard(*DataAcquisition.read_shard(queue_path, first_shard_id)))
+        DataAcquisition.run_crawl_worker(queue_path, 'second-worker', poll_interval=0)
+
+        # Act
+        crawl_result = DataAcquisition.merge_crawl_results(queue_path)
+
+        # Assert
+        assert list(crawl_result['school_urn']) == [str(100000 + index) for index in range(5)], "merge_crawl_results() did not return the schools sorted by URN."
+
+    def test_validate_school_data_correct_return(self):
+        """
+        Tests that 'validate_school_data' splits the valid and invalid 
+        rows correctly and describes why each invalid row failed.
+
+        Uses copies of the data for 'St Anne's Catholic Primary School, 
+        Streetly' stored in the mock data files, whose England average for
+        the expected standard is 0.
+        """
+
+        # Arrange
+        mock_school_absence_and_pupil_data = pd.read_csv(Path.cwd() / "test_data" / "mock_get_single_school_absence_and_pupil_data_test.csv", index_col=0)
+        mock_school_primary_data = pd.read_csv(Path.cwd() / "test_data" / "mock_get_single_primary_data_test.csv", index_col=0)
+        mock_school_data = pd.concat([pd.concat([mock_school_absence_and_pupil_data, mock_school_primary_data], axis=1)] * 5, ignore_index=True)
+
+        mock_school_data.loc[1:, '%students_meeting_expected_standard_england'] = 60
+        mock_school_data.loc[2, '%eal_students_school'] = 120.0
+        mock_school_data.loc[3, 'maths_band'] = 'GREAT'
+        mock_school_data.loc[4, 'writing_progress_score'] = 8.0
+
+        expected_validation_errors = [
+            '%students_meeting_expected_standard_england is not greater than 0',
+            '%eal_students_school is not between 0 and 100',
+            'maths_band is not a known band',
+            'writing_progress_score is outside writing_progress_score_confidence_interval',
+        ]
+
+        # Act
+        valid_school_data, invalid_school_data = DataAcquisition.validate_school_data(mock_school_data)
+
+        # Assert
+        assert list(valid_school_data.index) == [1], "validate_school_data() did not return the correct valid rows."
+        assert list(invalid_school_data['validation_errors']) == expected_validation_errors, "validate_school_data() did not describe the failed checks correctly."
+
+    def test_get_school_data_subset_of_schools_quarantines_invalid_rows(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_single_school_pages, requests_mock):
+        """
+        Tests that 'get_school_data_subset_of_schools' writes rows that 
+        fail validation to the quarantine file instead of returning them.
+
+        The mock primary page for 'St Anne's Catholic Primary School, 
+        Streetly' is changed to give a local authority average of 0 for 
+        the expected standard, so the school should be quarantined.
+        """
+
+        # Arrange
+        mock_primary_page = (Path.cwd() / "test_data" / "mock_school_primary_page.html").read_text(encoding='utf-8')
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, text=mock_primary_page.replace('<span class="value">59%</span>', '<span class="value">0%</span>'))
+        school_identification_information = pd.DataFrame({'school_name': ["St Anne's Catholic Primary School, Streetly"], 'school_urn': [104241], 'type_of_school': ['Maintained school']})
+
+        # Act
+        school_data = DataAcquisition.get_school_data_subset_of_schools(school_identification_information)
+
+        # Assert
+        quarantined_school_data = pd.read_json(temp_data_directory_with_mock_user_agent_file / "uk_school_data_quarantine.jsonl", lines=True)
+        assert school_data.empty, "get_school_data_subset_of_schools() returned a row that failed validation."
+        assert list(quarantined_school_data['school_urn']) == [104241], "get_school_data_subset_of_schools() did not quarantine the invalid row."
+
+    def test_concurrency_controller_healthy_requests_increase_window(self):
+        """
+        Tests that the window of a 'ConcurrencyController' increases 
+        additively, by roughly 1 for every window's worth of requests, 
+        while the latency and error rate are healthy.
+        """
+
+        # Arrange
+        concurrency_controller = DataAcquisition.ConcurrencyController(initial_window=4, latency_target=1.0)
+        windows = []
+
+        # Act
+        for request in range(40):
+            start_time = concurrency_controller.acquire()
+            concurrency_controller.release(start_time, overloaded=False, end_time=start_time + 0.1)
+            windows.append(concurrency_controller.window)
+
+        # Assert
+        assert windows == sorted(windows), "The window did not increase with every healthy request."
+        assert 8 < windows[-1] < 12, "The window did not increase additively."
+
+    def test_concurrency_controller_overloaded_requests_decrease_window_once(self):
+        """
+        Tests that the window of a 'ConcurrencyController' is halved when
+        requests are overloaded, and that it is only halved once for the
+        requests that were in flight at the same time.
+        """
+
+        # Arrange
+        concurrency_controller = DataAcquisition.ConcurrencyController(initial_window=8)
+        start_times = [concurrency_controller.acquire() for request in range(8)]
+
+        # Act
+        for start_time in start_times:
+            concurrency_controller.release(start_time, overloaded=True, end_time=start_time + 0.1)
+
+        # Assert
+        assert concurrency_controller.window == 4, "The window was not halved exactly once."
+        assert concurrency_controller.get_metrics()['error_rate'] == 1, "The error rate was not recorded."
+
+    def test_concurrency_controller_slow_requests_hold_window(self):
+        """
+        Tests that the window of a 'ConcurrencyController' does not 
+        increase when the 95th percentile latency is above its target.
+        """
+
+        # Arrange
+        concurrency_controller = DataAcquisition.ConcurrencyController(initial_window=4, latency_target=1.0)
+
+        # Act
+        for request in range(20):
+            start_time = concurrency_controller.acquire()
+            concurrency_controller.release(start_time, overloaded=False, end_time=start_time + 5.0)
+
+        # Assert
+        assert concurrency_controller.window == 4, "The window increased while the latency was above its target."
+
+    def test_concurrency_controller_acquire_full_window_correct_return(self):
+        """
+        Tests that 'ConcurrencyController.acquire' does not allow more 
+        requests in flight than the window.
+        """
+
+        # Arrange
+        concurrency_controller = DataAcquisition.ConcurrencyController(initial_window=2)
+        concurrency_controller.acquire()
+        concurrency_controller.acquire()
+
+        # Act
+        start_time = concurrency_controller.acquire(timeout=0)
+
+        # Assert
+        assert start_time is None, "acquire() allowed more requests in flight than the window."
+        assert concurrency_controller.get_metrics()['in_flight'] == 2, "acquire() did not count the requests in flight."
+
+    def test_fetch_page_too_many_requests_decreases_window(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that 'fetch_page' reports a 429 response to the concurrency
+        controller when adaptive concurrency is enabled.
+        """
+
+        # Arrange
+        dummy_url = 'http://dummy.com'
+        requests_mock.get(dummy_url, status_code=429, text="Too Many Requests")
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.ADAPTIVE_CONCURRENCY_ENVIRONMENT_VARIABLE: '8'}), patch('DataAcquisition._concurrency_controller', None):
+            DataAcquisition.fetch_page(dummy_url)
+            metrics = DataAcquisition.get_concurrency_controller().get_metrics()
+
+        # Assert
+        assert metrics['window'] == 2, "fetch_page() did not report the 429 response to the concurrency controller."
+        assert metrics['in_flight'] == 0, "fetch_page() did not release the request."
+
+    def test_hedging_policy_hedge_delay_correct_return(self):
+        """
+        Tests that a 'HedgingPolicy' does not hedge until enough latencies
+        have been recorded, and then hedges after the given percentile of
+        the recent latencies.
+        """
+
+        # Arrange
+        hedging_policy = DataAcquisition.HedgingPolicy(percentile=90, minimum_samples=10)
+
+        # Act
+        hedge_delay_before_samples = hedging_policy.get_hedge_delay()
+        for latency in range(1, 11):
+            hedging_policy.record_latency(latency / 10)
+        hedge_delay = hedging_policy.get_hedge_delay()
+
+        # Assert
+        assert hedge_delay_before_samples is None, "get_hedge_delay() hedged before enough latencies were recorded."
+        assert hedge_delay == 1.0, "get_hedge_delay() did not return the 90th percentile of the latencies."
+
+    def test_hedging_policy_try_hedge_within_budget(self):
+        """
+        Tests that a 'HedgingPolicy' does not hedge more than its budget 
+        of the requests made.
+        """
+
+        # Arrange
+        hedging_policy = DataAcquisition.HedgingPolicy(budget=0.1)
+
+        # Act
+        hedges = []
+        for request in range(100):
+            hedging_policy.record_request()
+            hedges.append(hedging_policy.try_hedge())
+
+        # Assert
+        assert sum(hedges) == 10, "try_hedge() did not keep the hedges within the budget."
+        assert hedging_policy.get_metrics()['number_of_hedges'] == 10, "try_hedge() did not count the hedges."
+
+    def test_fetch_page_slow_request_is_hedged(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that 'fetch_page' returns the response of the duplicate 
+        request when hedging is enabled and the original request is slow.
+        """
+
+        # Arrange
+        dummy_url = 'http://dummy.com'
+        hedging_policy = DataAcquisition.HedgingPolicy(percentile=95, budget=1.0, minimum_samples=1)
+        hedging_policy.record_latency(0.01)
+        requests_made = []
+
+        def mock_download_page(url, headers, cancel_event=None, target_element=None, timeouts=None):
+            requests_made.append(url)
+            if len(requests_made) == 1:
+                cancel_event.wait(timeout=5)
+                return None, None
+            return 200, b"fast response"
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.HEDGE_PERCENTILE_ENVIRONMENT_VARIABLE: '95'}), patch('DataAcquisition._hedging_policy', hedging_policy), patch('DataAcquisition.download_page', side_effect=mock_download_page):
+            start_time = DataAcquisition.time.monotonic()
+            content = DataAcquisition.fetch_page(dummy_url)
+            elapsed_time = DataAcquisition.time.monotonic() - start_time
+
+        # Assert
+        assert content == b"fast response", "fetch_page() did not return the response of the duplicate request."
+        assert len(requests_made) == 2, "fetch_page() did not send exactly one duplicate request."
+        assert elapsed_time < 1, "fetch_page() waited for the slow request."
+        assert hedging_policy.get_metrics()['number_of_hedge_wins'] == 1, "fetch_page() did not count the hedge win."
+
+    def test_fetch_page_http2_backend_multiplexes_requests(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that the HTTP/2 backend of 'fetch_page' makes concurrent 
+        requests over at most 'HTTP2_MAXIMUM_CONNECTIONS' connections to 
+        a local HTTP/2 stand-in server.
+        """
+
+        # Arrange
+        pytest.importorskip('httpx')
+        pytest.importorskip('h2')
+        from concurrent.futures import ThreadPoolExecutor
+
+        server = start_http2_stand_in_server(lambda: 0.05)
+        urls = [f"{server.url}/school/{school_urn}" for school_urn in range(16)]
+
+        # Act
+        try:
+            with patch.dict(os.environ, {DataAcquisition.HTTP_BACKEND_ENVIRONMENT_VARIABLE: 'http2', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}), patch('DataAcquisition._http2_client', None):
+                with ThreadPoolExecutor(max_workers=16) as executor:
+                    contents = list(executor.map(DataAcquisition.fetch_page, urls))
+        finally:
+            server.shutdown()
+
+        # Assert
+        assert contents == [MOCK_PAGE] * 16, "fetch_page() did not return the body of every page."
+        assert server.number_of_requests == 16, "fetch_page() did not make one request for every page."
+        assert server.number_of_connections <= DataAcquisition.HTTP2_MAXIMUM_CONNECTIONS, "fetch_page() did not multiplex the requests over a few connections."
+
+    def test_fetch_page_http2_backend_connection_error_raises_requests_error(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that the HTTP/2 backend of 'fetch_page' raises connection 
+        errors as 'requests.ConnectionError', like the default backend.
+        """
+
+        # Arrange
+        pytest.importorskip('httpx')
+        pytest.importorskip('h2')
+        import requests
+
+        server = start_http2_stand_in_server()
+        server.shutdown()
+
+        # Act and Assert
+        with patch.dict(os.environ, {DataAcquisition.HTTP_BACKEND_ENVIRONMENT_VARIABLE: 'http2'}), patch('DataAcquisition._http2_client', None):
+            with pytest.raises(requests.ConnectionError):
+                DataAcquisition.fetch_page(f"{server.url}/school")
+
+    def test_target_element_detector_nested_element_split_chunks(self):
+        """
+        Tests that a 'TargetElementDetector' finds the closing tag of the
+        target element, and not of an element nested in it, when the page
+        is split into chunks of a single byte.
+        """
+
+        # Arrange
+        page = b'<table id="Wales"><tr><td>1</td></tr></table><table class="wikitable" id="England"><tr><td><table><tr><td>2</td></tr></table></td></tr></table><p>rest of the page</p>'
+        target_element_detector = DataAcquisition.TargetElementDetector('table', 'England')
+
+        # Act
+        number_of_bytes_read = 0
+        for byte in range(len(page)):
+            number_of_bytes_read += 1
+            if target_element_detector.feed(page[byte:byte + 1]):
+                break
+
+        # Assert
+        assert page[:number_of_bytes_read].endswith(b'</td></tr></table>'), "The detector did not stop at the closing tag of the target element."
+        assert number_of_bytes_read == page.index(b'<p>'), "The detector stopped at the closing tag of a nested element."
+
+    def test_fetch_page_target_element_stops_download(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that 'fetch_page' closes the connection once the target 
+        element is complete, so that the rest of the page is not sent.
+        """
+
+        # Arrange
+        page = b'<html><body><table id="England"><tr><td>Aldershot</td></tr></table>' + b'<p>filler</p>' * 100000 + b'</body></html>'
+        server = start_http1_stand_in_server(body=page, bytes_per_second=4e6)
+
+        # Act
+        try:
+            with patch.dict(os.environ, {DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}):
+                content = DataAcquisition.fetch_page(f"{server.url}/constituencies", target_element=('table', 'England'))
+        finally:
+            server.shutdown()
+
+        # Assert
+        assert b'<td>Aldershot</td></tr></table>' in content, "fetch_page() did not return the target element."
+        assert server.number_of_bytes_sent < len(page) / 10, "fetch_page() did not stop the download once the target element was complete."
+
+    def test_fetch_page_gzip_response_correct_return(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that 'fetch_page' accepts gzip compressed responses and 
+        returns their decompressed body.
+        """
+
+        # Arrange
+        with open('test_data/uk_constituency_wiki_sample.html', 'rb') as file:
+            page = file.read()
+        server = start_http1_stand_in_server(body=page, gzip_responses=True)
+
+        # Act
+        try:
+            with patch.dict(os.environ, {DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}):
+                content = DataAcquisition.fetch_page(f"{server.url}/constituencies")
+        finally:
+            server.shutdown()
+
+        # Assert
+        assert content == page, "fetch_page() did not return the decompressed body."
+        assert server.number_of_bytes_sent < len(page) / 2, "fetch_page() did not accept a compressed response."
+
+    def test_write_all_school_data_normalises_averages(self, temp_data_directory):
+        """
+        Tests that 'write_all_school_data' writes the local authority and 
+        England averages to their own files rather than for every school,
+        and that 'load_all_school_data' joins them back when they are 
+        requested.
+
+        Uses the data stored in the file 'mock_get_all_school_data_return.csv',
+        whose schools share one set of local authority averages, with all 
+        of the schools in the same local authority.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_get_all_school_data_return.csv"
+        mock_all_school_data = pd.read_csv(permanent_mock_data_file, index_col=0, sep='|').assign(local_authority_code=335)
+        columns = ['school_urn', '%students_meeting_expected_standard_local_authority', 'average_score_maths_england']
+
+        # Act
+        output_path = DataAcquisition.write_all_school_data(mock_all_school_data)
+        all_school_data = DataAcquisition.load_all_school_data(columns)
+
+        # Assert
+        school_facts = pd.read_csv(output_path, index_col=0)
+        local_authority_averages = pd.read_csv(temp_data_directory / DataAcquisition.LOCAL_AUTHORITY_AVERAGES_FILE_NAME)
+        assert not set(school_facts.columns) & set(DataAcquisition.LOCAL_AUTHORITY_FIELDS + DataAcquisition.ENGLAND_FIELDS), "write_all_school_data() wrote the averages for every school."
+        assert len(local_authority_averages) == 1, "write_all_school_data() did not write each set of local authority averages once."
+        assert list(all_school_data.columns) == columns, "load_all_school_data() did not return the requested columns."
+        assert list(all_school_data[columns[1]].astype(float).fillna(-1)) == list(mock_all_school_data[columns[1]].fillna(-1)), "load_all_school_data() did not join the local authority averages."
+        assert (all_school_data[columns[2]] == 104).all(), "load_all_school_data() did not join the England averages."
+
+    def test_normalise_school_data_local_authorities_with_same_averages_distinct(self):
+        """
+        Tests that 'normalise_school_data' gives schools in different 
+        local authorities different ids, even if their local authority 
+        averages are the same, and keeps the averages in the fact table 
+        of schools whose local authority is not known.
+
+        Uses the data stored in the file 'mock_get_all_school_data_return.csv',
+        whose schools share one set of local authority averages.
+        """
+
+        # Arrange
+        permanent_mock_data_file = Path.cwd() / "test_data" / "mock_get_all_school_data_return.csv"
+        mock_all_school_data = pd.read_csv(permanent_mock_data_file, index_col=0, sep='|')
+        local_authority_codes = [335, 336] * len(mock_all_school_data)
+        mock_all_school_data['local_authority_code'] = local_authority_codes[:len(mock_all_school_data)]
+
+        # Act
+        school_facts, local_authority_averages, _ = DataAcquisition.normalise_school_data(mock_all_school_data)
+        unknown_school_facts, unknown_local_authority_averages, _ = DataAcquisition.normalise_school_data(mock_all_school_data.assign(local_authority_code=None))
+
+        # Assert
+        local_authority_ids = school_facts['local_authority_id'].dropna()
+        assert len(local_authority_ids) > 0 and (local_authority_ids == mock_all_school_data.loc[local_authority_ids.index, 'local_authority_code']).all(), "normalise_school_data() did not key the schools on the code of their local authority."
+        assert sorted(local_authority_averages['local_authority_id']) == [335, 336], "normalise_school_data() merged local authorities with the same averages."
+        assert unknown_local_authority_averages is None, "normalise_school_data() normalised the averages of schools with no local authority."
+        assert set(DataAcquisition.LOCAL_AUTHORITY_FIELDS) <= set(unknown_school_facts.columns), "normalise_school_data() lost the averages of schools with no local authority."
+
+    def test_extract_school_absence_and_pupil_fields_local_authority_code(self):
+        """
+        Tests that 'extract_school_absence_and_pupil_fields' returns the 
+        local authority code in the school's DfE number, and None for a 
+        page without a DfE number.
+
+        Uses the page stored in the file 'mock_school_absence_and_pupil_page.html'.
+        """
+
+        # Arrange
+        from bs4 import BeautifulSoup
+
+        page = (Path.cwd() / "test_data" / "mock_school_absence_and_pupil_page.html").read_text()
+        page_without_dfe_number = page.replace('<dt>DfE number</dt><dd>335/3356</dd>', '')
+
+        # Act
+        fields = DataAcquisition.extract_school_absence_and_pupil_fields(BeautifulSoup(page, 'html.parser'))
+        fields_without_dfe_number = DataAcquisition.extract_school_absence_and_pupil_fields(BeautifulSoup(page_without_dfe_number, 'html.parser'))
+
+        # Assert
+        assert fields['local_authority_code'] == 335, "extract_school_absence_and_pupil_fields() did not return the local authority code."
+        assert fields_without_dfe_number['local_authority_code'] is None, "extract_school_absence_and_pupil_fields() returned a code for a page without a DfE number."
+
+    def test_get_england_averages_fetched_once(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that 'get_england_averages' scrapes the England averages 
+        from the pages of the first school only once, and reads them from
+        the file 'uk_england_averages.csv' afterwards.
+
+        The England average for the expected standard on the mock primary
+        page is changed from 0 to 60 so that it passes validation.
+        """
+
+        # Arrange
+        pd.DataFrame({'school_name': ["St Anne's Catholic Primary School, Streetly"], 'school_urn': [104241], 'type_of_school': ['Maintained school']}).to_csv(temp_data_directory_with_mock_user_agent_file / 'uk_school_identification_information.csv')
+        mock_primary_page = (Path.cwd() / "test_data" / "mock_school_primary_page.html").read_text(encoding='utf-8')
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, text=mock_primary_page.replace('<span class="mobile-label">england</span><span class="value">0%</span>', '<span class="mobile-label">england</span><span class="value">60%</span>'))
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_ABSENCE_AND_PUPIL_URL, text=(Path.cwd() / "test_data" / "mock_school_absence_and_pupil_page.html").read_text(encoding='utf-8'))
+
+        # Act
+        england_averages = DataAcquisition.get_england_averages()
+        cached_england_averages = DataAcquisition.get_england_averages()
+
+        # Assert
+        assert requests_mock.call_count == 2, "get_england_averages() did not fetch the pages of one school once."
+        assert list(england_averages.columns) == list(DataAcquisition.ENGLAND_FIELDS), "get_england_averages() did not return every England average."
+        assert england_averages.at[0, '%students_meeting_expected_standard_england'] == 60, "get_england_averages() did not return the England averages."
+        pd.testing.assert_frame_equal(cached_england_averages, england_averages, check_dtype=False)
+
+    def test_streaming_aggregates_merged_batches_correct_return(self):
+        """
+        Tests that the mean, standard deviation, quantiles and covariance
+        of 'StreamingAggregates' updated in batches and merged match those
+        computed from all of the data at once.
+        """
+
+        # Arrange
+        random_generator = np.random.default_rng(0)
+        eal_students = random_generator.uniform(0, 60, 1000)
+        school_data = pd.DataFrame({'%eal_students_school': eal_students, 'reading_progress_score': 0.05 * eal_students + random_generator.normal(0, 2, 1000)})
+        first_streaming_aggregates = DataAcquisition.StreamingAggregates()
+        second_streaming_aggregates = DataAcquisition.StreamingAggregates()
+
+        # Act
+        for start in range(0, 600, 50):
+            first_streaming_aggregates.update(school_data.iloc[start:start + 50])
+        second_streaming_aggregates.update(school_data.iloc[600:])
+        first_streaming_aggregates.merge(DataAcquisition.StreamingAggregates.from_dict(json.loads(json.dumps(second_streaming_aggregates.to_dict()))))
+        summary = first_streaming_aggregates.get_summary()
+        covariances = first_streaming_aggregates.get_covariances()
+
+        # Assert
+        assert summary.at['%eal_students_school', 'count'] == 1000, "StreamingAggregates did not count every value."
+        assert summary.at['%eal_students_school', 'mean'] == pytest.approx(eal_students.mean()), "StreamingAggregates did not return the mean."
+        assert summary.at['%eal_students_school', 'std'] == pytest.approx(eal_students.std(ddof=1)), "StreamingAggregates did not return the standard deviation."
+        assert summary.at['%eal_students_school', '50%'] == pytest.approx(np.median(eal_students), rel=0.02), "StreamingAggregates did not estimate the median to within its relative accuracy."
+        assert covariances.at['reading_progress_score', 'covariance'] == pytest.approx(np.cov(school_data.to_numpy().T)[0, 1]), "StreamingAggregates did not return the covariance."
+        assert covariances.at['reading_progress_score', 'correlation'] == pytest.approx(school_data.corr().iat[0, 1]), "StreamingAggregates did not return the correlation."
+
+    def test_read_streaming_aggregates_merges_process_checkpoints(self, temp_data_directory):
+        """
+        Tests that 'read_streaming_aggregates' merges the checkpoints 
+        written by 'update_streaming_aggregates' in different processes.
+        """
+
+        # Arrange
+        school_data = pd.DataFrame({'school_urn': [1, 2, 3, 4], 'school_overall_absence': [4.0, 5.0, None, 7.0]})
+
+        # Act
+        with patch('os.getpid', return_value=1):
+            DataAcquisition.update_streaming_aggregates(school_data.iloc[:2])
+        with patch('os.getpid', return_value=2):
+            DataAcquisition.update_streaming_aggregates(school_data.iloc[2:])
+        summary = DataAcquisition.read_streaming_aggregates().get_summary()
+
+        # Assert
+        assert len(os.listdir(temp_data_directory / DataAcquisition.STREAMING_AGGREGATES_DIRECTORY_NAME)) == 2, "update_streaming_aggregates() did not checkpoint each process separately."
+        assert summary.at['school_overall_absence', 'count'] == 3, "read_streaming_aggregates() did not merge the checkpoints."
+        assert summary.at['school_overall_absence', 'mean'] == pytest.approx(16 / 3), "read_streaming_aggregates() did not merge the checkpoints."
+
+    def test_update_streaming_aggregates_concurrent_threads_counts_every_batch(self, temp_data_directory):
+        """
+        Tests that batches added by many threads of a process at the same 
+        time are all counted in the checkpoint of the process.
+        """
+
+        # Arrange
+        from concurrent.futures import ThreadPoolExecutor
+
+        school_data = pd.DataFrame({'school_urn': range(200), 'school_overall_absence': [float(i % 10) for i in range(200)]})
+
+        # Act
+        with patch('DataAcquisition._streaming_aggregates', None), ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(lambda i: DataAcquisition.update_streaming_aggregates(school_data.iloc[[i]]), range(200)))
+
+        summary = DataAcquisition.read_streaming_aggregates().get_summary()
+
+        # Assert
+        assert summary.at['school_overall_absence', 'count'] == 200, "update_streaming_aggregates() lost the batches of some threads."
+        assert summary.at['school_overall_absence', 'mean'] == pytest.approx(4.5), "update_streaming_aggregates() lost the batches of some threads."
+
+    def test_update_streaming_aggregates_reused_worker_starts_again_after_clear(self, temp_data_directory):
+        """
+        Tests that a worker process whose checkpoint was removed by 
+        'clear_streaming_aggregates' in another process, as when joblib 
+        reuses its workers for a new run, does not add the batches of the
+        earlier run to the new run.
+        """
+
+        # Arrange
+        import shutil
+
+        school_data = pd.DataFrame({'school_urn': [1, 2, 3], 'school_overall_absence': [4.0, 5.0, 6.0]})
+
+        # Act
+        with patch('DataAcquisition._streaming_aggregates', None):
+            DataAcquisition.update_streaming_aggregates(school_data)
+
+            # The parent's 'clear_streaming_aggregates()' only removes the 
+            # checkpoints, not the aggregates in the worker's memory
+            shutil.rmtree(temp_data_directory / DataAcquisition.STREAMING_AGGREGATES_DIRECTORY_NAME)
+            DataAcquisition.update_streaming_aggregates(school_data.iloc[:1])
+
+        summary = DataAcquisition.read_streaming_aggregates().get_summary()
+
+        # Assert
+        assert summary.at['school_overall_absence', 'count'] == 1, "update_streaming_aggregates() added the batches of an earlier run."
+
+    def test_scrape_parliamentary_constituencies_section_fetch_correct_return(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that 'scrape_parliamentary_constituencies' obtains the 
+        constituencies from the section of the article returned by the 
+        MediaWiki parse endpoint, which is served by a local stand-in 
+        server, without requesting the whole article.
+        """
+
+        # Arrange
+        page = (Path.cwd() / "test_data" / "uk_constituency_wiki_sample.html").read_bytes()
+        server = start_http1_stand_in_server(body=get_constituency_section_response(page))
+
+        # Act
+        try:
+            with patch('DataAcquisition.PARLIAMENTARY_DATA_SECTION_URL', f"{server.url}/w/api.php"), patch('DataAcquisition.PARLIAMENTARY_DATA_URL', 'http://127.0.0.1:1/unreachable'):
+                parliamentary_constituent_list = DataAcquisition.scrape_parliamentary_constituencies()
+        finally:
+            server.shutdown()
+
+        # Assert
+        assert set(parliamentary_constituent_list) == EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST, "scrape_parliamentary_constituencies() did not return correct list"
+        assert server.number_of_bytes_sent * 10 < len(page), "scrape_parliamentary_constituencies() did not request only the section of the article."
+
+    def test_scrape_parliamentary_constituencies_section_error_falls_back_to_page(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_parliamentary_constituent_data, requests_mock):
+        """
+        Tests that 'scrape_parliamentary_constituencies' requests the whole
+        article when the MediaWiki parse endpoint returns an error.
+        """
+
+        # Arrange
+        requests_mock.get(DataAcquisition.PARLIAMENTARY_DATA_SECTION_URL, status_code=503, text='Service Unavailable')
+
+        # Act
+        parliamentary_constituent_list = DataAcquisition.scrape_parliamentary_constituencies()
+
+        # Assert
+        assert set(parliamentary_constituent_list) == EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST, "scrape_parliamentary_constituencies() did not return correct list"
+        assert [request.url for request in requests_mock.request_history] == [DataAcquisition.PARLIAMENTARY_DATA_SECTION_URL, PARLIAMENTARY_CONSTITUENT_WIKI_URL], "scrape_parliamentary_constituencies() did not fall back to the whole article."
+
+    def test_extract_page_unchanged_page_is_not_parsed_again(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_single_school_pages):
+        """
+        Tests that 'get_single_school_primary_data' reuses the record 
+        memoised for a page whose content has not changed, and parses 
+        the page again once the extractor version is changed.
+        """
+
+        # Arrange
+        school_name = "St Anne's Catholic Primary School, Streetly"
+
+        # Act
+        with patch('DataAcquisition.extract_fields', wraps=DataAcquisition.extract_fields) as mock_extract_fields:
+            school_primary_data = DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            memoised_school_primary_data = DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            number_of_parses = mock_extract_fields.call_count
+
+            with patch('DataAcquisition.EXTRACTOR_VERSION', DataAcquisition.EXTRACTOR_VERSION + 1):
+                DataAcquisition.get_single_school_primary_data(school_name, '104241')
+
+        # Assert
+        metrics = DataAcquisition.get_parse_memo_metrics()
+        pd.testing.assert_frame_equal(memoised_school_primary_data, school_primary_data)
+        assert number_of_parses == 1, "get_single_school_primary_data() parsed an unchanged page again."
+        assert mock_extract_fields.call_count == 2, "get_single_school_primary_data() did not parse the page again for a new extractor version."
+        assert (metrics['number_of_hits'], metrics['number_of_misses']) == (1, 2), "get_parse_memo_metrics() did not count the hits and misses."
+
+    def test_extract_page_evicts_least_recently_used_records(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that 'extract_page' evicts the least recently used records 
+        once the parse memo is larger than its largest size.
+        """
+
+        # Arrange
+        urls = [f'https://www.compare-school-performance.service.gov.uk/school/{school_urn}/mock-school/absence-and-pupil-population' for school_urn in range(20)]
+        for school_urn, url in enumerate(urls):
+            requests_mock.get(url, text=f'<table><tr><th>Overall absence</th><td headers="school">{school_urn}.5%</td></tr></table>')
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.PARSE_MEMO_SIZE_ENVIRONMENT_VARIABLE: str(1000 / 2**20)}):
+            records = [DataAcquisition.extract_page(url, 'school_absence_and_pupil') for url in urls]
+            DataAcquisition.extract_page(urls[-1], 'school_absence_and_pupil')
+            DataAcquisition.extract_page(urls[0], 'school_absence_and_pupil')
+
+        # Assert
+        metrics = DataAcquisition.get_parse_memo_metrics()
+        assert [record['school_overall_absence'] for record in records] == [school_urn + 0.5 for school_urn in range(20)], "extract_page() did not return the extracted records."
+        assert metrics['number_of_evictions'] > 0 and metrics['size'] <= 1000, "extract_page() did not evict records beyond the largest size."
+        assert (metrics['number_of_hits'], metrics['number_of_misses']) == (1, 21), "extract_page() did not evict the least recently used records."
+
+    def test_extract_page_hits_written_in_batches(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that 'extract_page' does not write to the parse memo for 
+        every hit, but writes the hits once 'PARSE_MEMO_HIT_BATCH_SIZE' 
+        of them are pending, and that 'get_parse_memo_metrics' counts the
+        pending hits.
+        """
+
+        # Arrange
+        import sqlite3
+
+        url = 'https://www.compare-school-performance.service.gov.uk/school/1/mock-school/absence-and-pupil-population'
+        requests_mock.get(url, text='<table><tr><th>Overall absence</th><td headers="school">1.5%</td></tr></table>')
+
+        def get_stored_hits():
+            with closing(sqlite3.connect(DataAcquisition.get_cache_path(DataAcquisition.PARSE_MEMO_FILE_NAME))) as connection:
+                return connection.execute("SELECT value FROM parse_memo_counters WHERE name = 'hits'").fetchone()[0]
+
+        # Act
+        with patch('DataAcquisition.PARSE_MEMO_HIT_BATCH_SIZE', 3):
+            for _ in range(3):
+                DataAcquisition.extract_page(url, 'school_absence_and_pupil')
+            stored_hits_before_batch = get_stored_hits()
+
+            DataAcquisition.extract_page(url, 'school_absence_and_pupil')
+            stored_hits_after_batch = get_stored_hits()
+
+            DataAcquisition.extract_page(url, 'school_absence_and_pupil')
+            metrics = DataAcquisition.get_parse_memo_metrics()
+
+        # Assert
+        assert stored_hits_before_batch == 0, "extract_page() wrote to the parse memo before a batch of hits was pending."
+        assert stored_hits_after_batch == 3, "extract_page() did not write a full batch of hits."
+        assert (metrics['number_of_hits'], metrics['number_of_misses']) == (4, 1), "get_parse_memo_metrics() did not count the pending hits."
+
+    def test_run_and_spill_result_batch_writes_parse_memo_hits(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that the parse memo hits of a batch of work are written to
+        the memo when the batch ends, so a worker process that makes no 
+        more misses does not lose them.
+        """
+
+        # Arrange
+        import sqlite3
+
+        url = 'https://www.compare-school-performance.service.gov.uk/school/1/mock-school/absence-and-pupil-population'
+        requests_mock.get(url, text='<table><tr><th>Overall absence</th><td headers="school">1.5%</td></tr></table>')
+        DataAcquisition.extract_page(url, 'school_absence_and_pupil')
+        DataAcquisition.get_parse_memo_metrics()
+
+        # Act
+        DataAcquisition.run_and_spill_result_batch(lambda: [DataAcquisition.extract_page(url, 'school_absence_and_pupil') for _ in range(3)])
+
+        with closing(sqlite3.connect(DataAcquisition.get_cache_path(DataAcquisition.PARSE_MEMO_FILE_NAME))) as connection:
+            stored_hits = connection.execute("SELECT value FROM parse_memo_counters WHERE name = 'hits'").fetchone()[0]
+
+        # Assert
+        assert stored_hits == 3, "run_and_spill_result_batch() did not write the parse memo hits of the batch."
+
+    def test_select_stratified_sample_reproducible_and_nested(self):
+        """
+        Tests that 'select_stratified_sample' samples the given fraction of
+        every stratum, rounded up, returns the same sample for the same 
+        seed and returns a sample containing the sample of any smaller 
+        fraction.
+        """
+
+        # Arrange
+        sampling_frame = pd.DataFrame({
+            'school_name': [f'School {school_urn}' for school_urn in range(100001, 100041)],
+            'school_urn': list(range(100001, 100041)),
+            'type_of_school': ['Academy', 'Maintained school'] * 20,
+            'parliamentary_constituency': ['Aldershot'] * 10 + ['Banbury'] * 30,
+        })
+
+        # Act
+        small_sample = DataAcquisition.select_stratified_sample(sampling_frame, 0.2, sample_seed=1)
+        repeated_small_sample = DataAcquisition.select_stratified_sample(sampling_frame, 0.2, sample_seed=1)
+        large_sample = DataAcquisition.select_stratified_sample(sampling_frame, 0.5, sample_seed=1)
+        other_seed_sample = DataAcquisition.select_stratified_sample(sampling_frame, 0.5, sample_seed=2)
+
+        # Assert
+        stratum_sample_sizes = small_sample.groupby(['parliamentary_constituency', 'type_of_school']).size()
+        pd.testing.assert_frame_equal(repeated_small_sample, small_sample)
+        assert list(stratum_sample_sizes) == [1, 1, 3, 3], "select_stratified_sample() did not sample the fraction of every stratum."
+        assert set(small_sample['school_urn']) <= set(large_sample['school_urn']), "select_stratified_sample() did not return a sample containing the smaller sample."
+        assert set(other_seed_sample['school_urn']) != set(large_sample['school_urn']), "select_stratified_sample() did not use the seed."
+
+    def test_get_all_school_data_sample_top_up_fetches_new_schools(self, temp_data_directory):
+        """
+        Tests that 'get_all_school_data' with a sample fraction only 
+        fetches the data for the sampled schools, gives them sampling 
+        weights summing to the number of schools in the sampling frame, 
+        and only fetches the schools added to the sample when the sample 
+        is topped up, while the streaming aggregates describe the whole 
+        topped up sample.
+        """
+
+        # Arrange
+        pd.DataFrame({
+            'school_name': [f'School {school_urn}' for school_urn in range(100001, 100021)],
+            'school_urn': list(range(100001, 100021)),
+            'type_of_school': ['Academy', 'Maintained school'] * 10,
+            'parliamentary_constituency': ['Aldershot'] * 8 + ['Banbury'] * 12,
+        }).to_csv(temp_data_directory / 'uk_school_identification_information.csv')
+
+        fetched_school_urns = []
+
+        def mock_get_school_data_subset_of_schools(school_identification_information):
+            fetched_school_urns.extend(school_identification_information['school_urn'])
+            school_data = school_identification_information[['school_name', 'school_urn', 'type_of_school']].assign(school_overall_absence=5.0)
+            DataAcquisition.update_streaming_aggregates(school_data)
+            return school_data
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.N_JOBS_ENVIRONMENT_VARIABLE: "1"}), patch('DataAcquisition.get_school_data_subset_of_schools', side_effect=mock_get_school_data_subset_of_schools):
+            school_sample_data = DataAcquisition.get_all_school_data(sample_fraction=0.25)
+            number_of_initially_fetched_schools = len(fetched_school_urns)
+            topped_up_school_sample_data = DataAcquisition.get_all_school_data(sample_fraction=0.5)
+
+        summary = DataAcquisition.read_streaming_aggregates().get_summary()
+
+        # Assert
+        assert number_of_initially_fetched_schools == len(school_sample_data) == 6, "get_all_school_data() did not fetch only the sampled schools."
+        assert len(fetched_school_urns) == len(set(fetched_school_urns)) == len(topped_up_school_sample_data) == 10, "get_all_school_data() fetched schools that had already been fetched."
+        assert school_sample_data['sampling_weight'].sum() == pytest.approx(20), "get_all_school_data() did not return sampling weights summing to the number of schools."
+        assert topped_up_school_sample_data['sampling_weight'].sum() == pytest.approx(20), "get_all_school_data() did not return sampling weights summing to the number of schools."
+        assert summary.at['school_overall_absence', 'count'] == 10, "get_all_school_data() did not include the schools fetched before the top up in the streaming aggregates."
+
+    @pytest.mark.parametrize("cache_file_contents", [b'', b'# uk-school-cache version=1 sha256=0\nAldershot\n'])
+    def test_get_parliamentary_constituencies_invalid_file_is_rebuilt(self, temp_data_directory_with_mock_user_agent_file, mock_requests_get_parliamentary_constituent_data, cache_file_contents):
+        """
+        Tests that 'get_parliamentary_constituencies()' scrapes the 
+        constituencies again when the file 
+        'uk_parliamentary_constituencies.txt' is empty, like the file left 
+        by an interrupted run, or does not match its checksum, and that 
+        the rebuilt file passes its check.
+        """
+
+        # Arrange
+        cache_file_path = temp_data_directory_with_mock_user_agent_file / "uk_parliamentary_constituencies.txt"
+        cache_file_path.write_bytes(cache_file_contents)
+
+        # Act
+        parliamentary_constituent_list = DataAcquisition.get_parliamentary_constituencies()
+
+        # Assert
+        assert set(parliamentary_constituent_list) == EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST, "get_parliamentary_constituencies() did not rebuild the invalid file."
+        assert set(DataAcquisition.read_cache_file(str(cache_file_path)).splitlines()) == EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST, "get_parliamentary_constituencies() did not write a valid file."
+
+    def test_get_parliamentary_constituencies_concurrent_calls_scrape_once(self, temp_data_directory):
+        """
+        Tests that concurrent calls to 'get_parliamentary_constituencies()' 
+        scrape the constituencies only once, with the other calls waiting 
+        for the file and reading it.
+        """
+
+        # Arrange
+        from concurrent.futures import ThreadPoolExecutor
+
+        def mock_scrape_parliamentary_constituencies():
+            time.sleep(0.2)
+            DataAcquisition.write_cache_file(str(temp_data_directory / "uk_parliamentary_constituencies.txt"), 'Aldershot\nBanbury\n')
+            return ['Aldershot', 'Banbury']
+
+        # Act
+        with patch('DataAcquisition.scrape_parliamentary_constituencies', side_effect=mock_scrape_parliamentary_constituencies) as mock_scrape:
+            with ThreadPoolExecutor(4) as executor:
+                parliamentary_constituent_lists = list(executor.map(lambda _: DataAcquisition.get_parliamentary_constituencies(), range(4)))
+
+        # Assert
+        assert mock_scrape.call_count == 1, "get_parliamentary_constituencies() scraped the constituencies more than once."
+        assert all(parliamentary_constituent_list == ['Aldershot', 'Banbury'] for parliamentary_constituent_list in parliamentary_constituent_lists), "get_parliamentary_constituencies() did not return the scraped constituencies."
+
+    def test_collect_result_batches_arrow_and_pickled_batches_correct_return(self, temp_data_directory):
+        """
+        Tests that 'collect_result_batches()' returns the same pd.DataFrame 
+        for the batches spilled to Arrow files by 
+        'run_and_spill_result_batch()' as pd.concat does for the batches 
+        themselves, including when a batch cannot be converted to Arrow, 
+        that it deletes the Arrow files, and that small batches are not
+        spilled.
+        """
+
+        # Arrange
+        school_data_batches = [
+            pd.DataFrame({'school_urn': [100001, 100002], 'school_name': ['School A', 'School B'], 'school_overall_absence': [5.0, np.nan]}),
+            None,
+            pd.DataFrame({'school_urn': [100003], 'school_name': ['School C'], 'school_overall_absence': [4.5]}, index=[2]),
+        ]
+        mixed_school_data_batch = pd.DataFrame({'school_urn': [100004], 'school_name': ['School D'], 'school_overall_absence': ['SUPP']}).astype(object)
+        mixed_school_data_batch.loc[1] = [100005, 'School E', 3.5]
+
+        # Act
+        with patch('DataAcquisition.RESULT_BATCH_SPILL_MINIMUM_SIZE', 0):
+            spilled_batches = [DataAcquisition.run_and_spill_result_batch(lambda batch: batch, batch) for batch in school_data_batches]
+            spilled_batch_paths = [batch for batch in spilled_batches if isinstance(batch, str)]
+            collected_school_data = DataAcquisition.collect_result_batches(spilled_batches)
+
+            mixed_spilled_batches = [DataAcquisition.run_and_spill_result_batch(lambda batch: batch, batch) for batch in school_data_batches + [mixed_school_data_batch]]
+            mixed_collected_school_data = DataAcquisition.collect_result_batches(mixed_spilled_batches)
+
+        small_spilled_batch = DataAcquisition.run_and_spill_result_batch(lambda batch: batch, school_data_batches[0])
+
+        # Assert
+        assert len(spilled_batch_paths) == 2, "run_and_spill_result_batch() did not write the batches to Arrow files."
+        pd.testing.assert_frame_equal(collected_school_data, pd.concat([batch for batch in school_data_batches if batch is not None]))
+        assert isinstance(mixed_spilled_batches[-1], pd.DataFrame), "run_and_spill_result_batch() did not return a batch which cannot be converted to Arrow."
+        assert mixed_collected_school_data['school_overall_absence'].tolist()[-2:] == ['SUPP', 3.5] and len(mixed_collected_school_data) == 5, "collect_result_batches() did not concatenate the pickled batch."
+        assert not os.listdir(temp_data_directory / DataAcquisition.RESULT_BATCHES_DIRECTORY_NAME), "collect_result_batches() did not delete the Arrow files."
+        assert isinstance(small_spilled_batch, pd.DataFrame), "run_and_spill_result_batch() spilled a batch smaller than RESULT_BATCH_SPILL_MINIMUM_SIZE."
+
+    def test_fetch_page_stalled_request_times_out_and_is_counted(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that 'fetch_page()' gives up on a request that stalls after 
+        the read timeout, counts the timeout against its endpoint, and 
+        makes no request once the deadline of the run has passed.
+        """
+
+        # Arrange
+        import requests
+
+        stand_in_server = start_http1_stand_in_server(get_latency=lambda: 2.0)
+        environment = {DataAcquisition.READ_TIMEOUT_ENVIRONMENT_VARIABLE: '0.2', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}
+
+        # Act
+        try:
+            with patch.dict(os.environ, environment):
+                start_time = time.monotonic()
+                with pytest.raises(requests.Timeout):
+                    DataAcquisition.fetch_page(f"{stand_in_server.url}/school/100001/primary")
+                elapsed_time = time.monotonic() - start_time
+
+                with patch.dict(os.environ, {DataAcquisition.RUN_DEADLINE_ENVIRONMENT_VARIABLE: str(time.time() - 1)}), pytest.raises(TimeoutError):
+                    DataAcquisition.fetch_page(f"{stand_in_server.url}/school/100001/primary")
+        finally:
+            stand_in_server.shutdown()
+
+        # Assert
+        assert elapsed_time < 1.5, "fetch_page() waited for the stalled request."
+        assert DataAcquisition.get_timeout_counts() == {f"{stand_in_server.url.split('//')[1]}/primary": 1}, "get_timeout_counts() did not count the timeout against its endpoint."
+        assert stand_in_server.number_of_requests == 1, "fetch_page() made a request after the deadline."
+
+    def test_retry_unfinished_work_adds_timed_out_schools(self, temp_data_directory):
+        """
+        Tests that a school whose request times out is recorded as 
+        unfinished rather than stopping 'get_all_school_data()', and that 
+        'retry_unfinished_work()' obtains it and adds it to the data 
+        written by the earlier run and to its streaming aggregates.
+        """
+
+        # Arrange
+        import requests
+
+        pd.DataFrame({
+            'school_name': ['School A', 'School B', 'School C'],
+            'school_urn': [100001, 100002, 100003],
+            'type_of_school': ['Academy', 'Academy', 'Maintained school'],
+        }).to_csv(temp_data_directory / 'uk_school_identification_information.csv')
+
+        requested_school_urns = []
+
+        def mock_get_single_school_data(school_name, school_urn):
+            requested_school_urns.append(school_urn)
+            if requested_school_urns.count('100002') == 1 and school_urn == '100002':
+                raise requests.ReadTimeout("Read timed out.")
+            return pd.DataFrame({'school_overall_absence': [float(school_urn[-1])]})
+
+        environment = {DataAcquisition.N_JOBS_ENVIRONMENT_VARIABLE: "1", DataAcquisition.DATABASE_ENVIRONMENT_VARIABLE: '0'}
+
+        # Act
+        with patch.dict(os.environ, environment), patch('DataAcquisition.get_single_school_data', side_effect=mock_get_single_school_data), patch('DataAcquisition.get_england_averages', return_value=None):
+            all_school_data = DataAcquisition.get_all_school_data()
+            unfinished_items = DataAcquisition.read_unfinished_work('schools')
+            DataAcquisition.write_all_school_data(all_school_data, None)
+
+            retry_counts = DataAcquisition.retry_unfinished_work('schools')
+            retried_school_data = DataAcquisition.load_all_school_data()
+            summary = DataAcquisition.read_streaming_aggregates().get_summary()
+
+        # Assert
+        assert all_school_data['school_urn'].tolist() == [100001, 100003], "get_all_school_data() did not skip the school that timed out."
+        assert unfinished_items == [('100002', ['School B', '100002', 'Academy'])], "get_all_school_data() did not record the school that timed out."
+        assert retry_counts == (1, 0), "retry_unfinished_work() did not finish the unfinished school."
+        assert sorted(retried_school_data['school_urn'].tolist()) == [100001, 100002, 100003], "retry_unfinished_work() did not add the school to the written data."
+        assert DataAcquisition.read_unfinished_work('schools') == [], "retry_unfinished_work() did not remove the finished school."
+        assert summary.at['school_overall_absence', 'count'] == 3, "retry_unfinished_work() did not add the retried school to the streaming aggregates of the earlier run."
+
+    def test_record_unfinished_work_waits_for_rewrite(self, temp_data_directory):
+        """
+        Tests that 'record_unfinished_work' waits while the file 
+        'unfinished_work.jsonl' is locked by 'remove_unfinished_work', so
+        that an item recorded while the file is rewritten is not lost.
+        """
+
+        # Arrange
+        import threading
+
+        unfinished_work_path = DataAcquisition.get_cache_path(DataAcquisition.UNFINISHED_WORK_FILE_NAME)
+        DataAcquisition.record_unfinished_work('schools', [('100001', ['School A', '100001', 'Academy'], 'timeout')])
+        recorded_before = time.time()
+        recorder = threading.Thread(target=DataAcquisition.record_unfinished_work, args=('schools', [('100002', ['School B', '100002', 'Academy'], 'timeout')]))
+
+        # Act
+        with DataAcquisition.lock_cache_file(unfinished_work_path):
+            recorder.start()
+            recorder.join(0.2)
+            recorded_while_locked = recorder.is_alive()
+
+            # The file is rewritten as in 'remove_unfinished_work()'
+            with open(unfinished_work_path, 'r', encoding='utf-8') as file:
+                lines = [line for line in file if json.loads(line)['time'] >= recorded_before]
+            with open(unfinished_work_path, 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+
+        recorder.join()
+
+        # Assert
+        assert recorded_while_locked, "record_unfinished_work() appended to the file while it was being rewritten."
+        assert DataAcquisition.read_unfinished_work('schools') == [('100002', ['School B', '100002', 'Academy'])], "record_unfinished_work() lost the item recorded while the file was rewritten."
+
+    def test_get_single_school_primary_data_empty_page_skipped_until_recheck(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that a school page found to have no data is not requested 
+        again until the recheck interval has passed, and that an empty 
+        page of a 503 response is not recorded.
+        """
+
+        # Arrange
+        school_name = "St Anne's Catholic Primary School, Streetly"
+        empty_page = '<html><body><p>There is no data for this school.</p></body></html>'
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, text=empty_page, status_code=404)
+        unavailable_url = DataAcquisition.get_single_school_primary_url(school_name, '104242')
+        requests_mock.get(unavailable_url, text=empty_page, status_code=503)
+
+        # Act
+        with patch('DataAcquisition._negative_cache_filter', None):
+            school_primary_data = DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            skipped_school_primary_data = DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            number_of_requests = requests_mock.call_count
+
+            with patch.dict(os.environ, {DataAcquisition.NEGATIVE_CACHE_RECHECK_ENVIRONMENT_VARIABLE: '0'}):
+                DataAcquisition.get_single_school_primary_data(school_name, '104241')
+
+            DataAcquisition.get_single_school_primary_data(school_name, '104242')
+            DataAcquisition.get_single_school_primary_data(school_name, '104242')
+
+        # Assert
+        metrics = DataAcquisition.get_negative_cache_metrics()
+        assert school_primary_data.isna().all(axis=None) and skipped_school_primary_data.isna().all(axis=None), "get_single_school_primary_data() returned data for an empty page."
+        assert list(skipped_school_primary_data.columns) == list(school_primary_data.columns), "get_single_school_primary_data() did not return every column for a skipped page."
+        assert number_of_requests == 1, "get_single_school_primary_data() requested a page known to have no data."
+        assert requests_mock.call_count == 4, "get_single_school_primary_data() did not request the page again after the recheck interval, or skipped a 503 response."
+        assert (metrics['number_of_skips'], metrics['number_of_known_empty_pages']) == (1, 1), "get_negative_cache_metrics() did not count the skips and known empty pages."
+
+    def test_get_single_school_primary_data_negative_cache_needs_no_data_markers_and_extractor_version(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that a page whose fields are all shown as suppressed is 
+        recorded as having no data and skipped until the extractor version
+        is changed, and that a page on which none of the fields were found
+        is not recorded.
+        """
+
+        # Arrange
+        school_name = "St Anne's Catholic Primary School, Streetly"
+        suppressed_page = '<table><tr><th>Reading progress score</th><td headers="band">SUPP</td><td headers="score">SUPP</td><td headers="confidence-interval">SUPP</td></tr></table>'
+        changed_layout_page = '<html><body><p>This page has a new layout.</p></body></html>'
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, text=suppressed_page)
+        changed_layout_url = DataAcquisition.get_single_school_primary_url(school_name, '104242')
+        requests_mock.get(changed_layout_url, text=changed_layout_page)
+
+        # Act
+        with patch('DataAcquisition._negative_cache_filter', None):
+            DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            number_of_suppressed_page_requests = requests_mock.call_count
+
+            with patch('DataAcquisition.EXTRACTOR_VERSION', DataAcquisition.EXTRACTOR_VERSION + 1):
+                DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            number_of_suppressed_page_requests_after_new_version = requests_mock.call_count
+
+            DataAcquisition.get_single_school_primary_data(school_name, '104242')
+            DataAcquisition.get_single_school_primary_data(school_name, '104242')
+
+        # Assert
+        assert number_of_suppressed_page_requests == 1, "get_single_school_primary_data() requested a page shown to have no data."
+        assert number_of_suppressed_page_requests_after_new_version == 2, "get_single_school_primary_data() skipped a page found empty by an earlier extractor version."
+        assert requests_mock.call_count == 4, "get_single_school_primary_data() recorded a page on which no fields were found as having no data."
+
+    def test_get_single_school_primary_data_suppressed_school_with_local_authority_averages_is_cached(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that a page on which the school's own results are suppressed
+        is recorded as having no data, even though it shows the local 
+        authority averages, and is not requested again.
+        """
+
+        # Arrange
+        school_name = "St Anne's Catholic Primary School, Streetly"
+        suppressed_page = (
+            '<table><tr><th>Reading progress score</th><td headers="band">SUPP</td><td headers="score">SUPP</td><td headers="confidence-interval">SUPP</td></tr></table>'
+            '<table><tr><th>Pupils meeting the expected standard in reading, writing and maths</th><td headers="school">SUPP</td><td headers="la">59%</td><td headers="england">60%</td></tr>'
+            '<tr><th>Average score in reading</th><td headers="school">NP</td><td headers="la">105</td><td headers="england">105</td></tr></table>'
+        )
+        requests_mock.get(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, text=suppressed_page)
+
+        # Act
+        with patch('DataAcquisition._negative_cache_filter', None):
+            school_primary_data = DataAcquisition.get_single_school_primary_data(school_name, '104241')
+            DataAcquisition.get_single_school_primary_data(school_name, '104241')
+
+        # Assert
+        assert school_primary_data.at[0, 'average_score_reading_local_authority'] == 105, "get_single_school_primary_data() did not extract the local authority averages."
+        assert requests_mock.call_count == 1, "get_single_school_primary_data() requested a suppressed school's page again because of its local authority averages."
+
+    def test_bloom_filter_no_false_negatives_and_false_positive_rate(self):
+        """
+        Tests that a 'BloomFilter' contains every key added to it, and 
+        that about the given proportion of other keys are false positives.
+        """
+
+        # Arrange
+        bloom_filter = DataAcquisition.BloomFilter(1000, false_positive_rate=0.01)
+        keys = [DataAcquisition.get_negative_cache_key(str(100000 + i), 'school_primary', '1', '2022/2023') for i in range(1000)]
+        other_keys = [DataAcquisition.get_negative_cache_key(str(200000 + i), 'school_primary', '1', '2022/2023') for i in range(10000)]
+
+        # Act
+        for key in keys:
+            bloom_filter.add(key)
+
+        false_positive_rate = sum(key in bloom_filter for key in other_keys) / len(other_keys)
+
+        # Assert
+        assert all(key in bloom_filter for key in keys), "BloomFilter did not contain a key added to it."
+        assert false_positive_rate < 0.02, "BloomFilter gave more false positives than its false positive rate."
+        assert bloom_filter.number_of_keys == 1000, "BloomFilter did not count the keys added to it."
+
+    def test_plan_run_negative_cache_is_read_only(self, temp_data_directory):
+        """
+        Tests that 'plan_run' does not create the negative cache, and that
+        it does not count the school pages known to have no data.
+        """
+
+        # Arrange
+        expected_requests = 1 + DataAcquisition.ESTIMATED_NUMBER_OF_CONSTITUENCIES + 2 + 2 * DataAcquisition.ESTIMATED_NUMBER_OF_SCHOOLS
+        negative_cache_path = temp_data_directory / DataAcquisition.NEGATIVE_CACHE_FILE_NAME
+
+        # Act
+        number_of_requests, estimated_duration = DataAcquisition.plan_run('schools')
+        negative_cache_created = negative_cache_path.exists()
+
+        with closing(DataAcquisition.connect_to_negative_cache()) as connection:
+            with connection:
+                connection.execute('INSERT INTO negative_results VALUES (?, ?, ?, ?, ?)', ('104241', 'school_primary', DataAcquisition.get_extractor_version('school_primary'), '2022/2023', DataAcquisition.time.time()))
+
+        number_of_requests_with_negative_cache, estimated_duration = DataAcquisition.plan_run('schools')
+
+        # Assert
+        assert not negative_cache_created, "plan_run() created the negative cache."
+        assert number_of_requests == expected_requests, "plan_run() did not return the correct number of requests."
+        assert number_of_requests_with_negative_cache == expected_requests - 1, "plan_run() counted a page known to have no data."
+
+    def test_get_school_data_subset_of_schools_offline_records_unarchived_schools(self, temp_data_directory, requests_mock):
+        """
+        Tests that 'get_school_data_subset_of_schools' in offline mode 
+        records a school whose pages are not in the raw HTML archive as 
+        unfinished, and still obtains the archived schools.
+        """
+
+        # Arrange
+        school_name = "St Anne's Catholic Primary School, Streetly"
+        DataAcquisition.write_archive_record(EXPECTED_SINGLE_SCHOOL_PRIMARY_URL, (Path.cwd() / "test_data" / "mock_school_primary_page.html").read_bytes())
+        DataAcquisition.write_archive_record(EXPECTED_SINGLE_SCHOOL_ABSENCE_AND_PUPIL_URL, (Path.cwd() / "test_data" / "mock_school_absence_and_pupil_page.html").read_bytes())
+
+        school_identification_information = pd.DataFrame({
+            'school_name': [school_name, 'Unarchived School'],
+            'school_urn': [104241, 100001],
+            'type_of_school': ['Academy', 'Academy'],
+        })
+
+        environment = {DataAcquisition.OFFLINE_ENVIRONMENT_VARIABLE: '1', DataAcquisition.DATABASE_ENVIRONMENT_VARIABLE: '0'}
+
+        # Act
+        with patch.dict(os.environ, environment):
+            school_data = DataAcquisition.get_school_data_subset_of_schools(school_identification_information)
+
+        with open(temp_data_directory / DataAcquisition.UNFINISHED_WORK_FILE_NAME, 'r', encoding='utf-8') as file:
+            reasons = [json.loads(line)['reason'] for line in file]
+
+        # Assert
+        assert school_data['school_urn'].tolist() == [104241], "get_school_data_subset_of_schools() did not obtain the archived school."
+        assert DataAcquisition.read_unfinished_work('schools') == [('100001', ['Unarchived School', '100001', 'Academy'])], "get_school_data_subset_of_schools() did not record the unarchived school."
+        assert reasons == ['not_archived'], "get_school_data_subset_of_schools() did not record why the school was not finished."
+        assert requests_mock.call_count == 0, "get_school_data_subset_of_schools() made a request in offline mode."
+
+    def test_write_archive_record_concurrent_threads_correct_records(self, temp_data_directory):
+        """
+        Tests that the records written to the raw HTML archive by many 
+        threads of a process at the same time can each be read back.
+        """
+
+        # Arrange
+        from concurrent.futures import ThreadPoolExecutor
+
+        pages = {f'http://dummy.com/{i}': f"<p>Mock Content {i}</p>".encode('utf-8') * (i + 1) for i in range(200)}
+
+        # Act
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(lambda page: DataAcquisition.write_archive_record(*page), pages.items()))
+
+        archived_pages = {url: DataAcquisition.read_archive_record(url) for url in pages}
+
+        # Assert
+        assert archived_pages == pages, "write_archive_record() wrote an index entry that does not point to its record."
+
+    def test_run_crawl_worker_renews_lease_of_slow_shard(self, mock_identification_crawl):
+        """
+        Tests that a worker renews the lease of a shard that takes longer
+        than the lease duration, so that the shard is not leased to 
+        another worker while it is processed and is stored once.
+        """
+
+        # Arrange
+        import threading
+
+        queue_path, number_of_shards = mock_identification_crawl
+        constituencies = sorted(EXPECTED_PARLIAMENTARY_CONSTITUENT_LIST)
+        DataAcquisition.create_crawl(queue_path, 'identification', [(constituency, [constituency]) for constituency in constituencies], number_of_shards=1)
+        mock_scrape = DataAcquisition.scrape_school_identification_information_subset_of_constituencies
+
+        def slow_scrape_school_identification_information_subset_of_constituencies(parliamentary_constituencies):
+            time.sleep(0.2)
+            return mock_scrape(parliamentary_constituencies)
+
+        number_of_completed_shards = []
+
+        # Act
+        with patch('DataAcquisition.scrape_school_identification_information_subset_of_constituencies', side_effect=slow_scrape_school_identification_information_subset_of_constituencies):
+            worker = threading.Thread(target=lambda: number_of_completed_shards.append(DataAcquisition.run_crawl_worker(queue_path, 'slow-worker', lease_duration=0.5, poll_interval=0)))
+            worker.start()
+            time.sleep(0.7)
+            other_worker_shard_id = DataAcquisition.lease_shard(queue_path, 'other-worker', lease_duration=0.5)
+            worker.join()
+
+        crawl_result = DataAcquisition.merge_crawl_results(queue_path)
+
+        # Assert
+        assert other_worker_shard_id is None, "run_crawl_worker() did not renew the lease of a shard that took longer than the lease."
+        assert number_of_completed_shards == [1], "run_crawl_worker() did not store the result of the slow shard."
+        assert list(crawl_result['school_urn']) == [str(100000 + index) for index in range(5)], "merge_crawl_results() did not return every school of the slow shard."
+
+    def test_validate_school_data_suppressed_measures_are_valid(self):
+        """
+        Tests that 'validate_school_data' keeps a school whose measures 
+        are shown as suppressed or not published in the valid rows, with
+        those measures missing, and still finds the invalid rows.
+        """
+
+        # Arrange
+        mock_school_absence_and_pupil_data = pd.read_csv(Path.cwd() / "test_data" / "mock_get_single_school_absence_and_pupil_data_test.csv", index_col=0)
+        mock_school_primary_data = pd.read_csv(Path.cwd() / "test_data" / "mock_get_single_primary_data_test.csv", index_col=0)
+        mock_school_data = pd.concat([pd.concat([mock_school_absence_and_pupil_data, mock_school_primary_data], axis=1)] * 2, ignore_index=True)
+
+        mock_school_data['%students_meeting_expected_standard_england'] = 60
+        mock_school_data = mock_school_data.astype(object)
+        mock_school_data.loc[0, ['writing_progress_score', 'writing_progress_score_confidence_interval', 'maths_band', '%eal_students_school']] = ['SUPP', 'SUPP', 'NP', 'LOWCOV']
+        mock_school_data.loc[1, '%eal_students_school'] = 'unknown'
+
+        # Act
+        valid_school_data, invalid_school_data = DataAcquisition.validate_school_data(mock_school_data)
+
+        # Assert
+        assert list(valid_school_data.index) == [0], "validate_school_data() did not keep the school with suppressed measures."
+        assert valid_school_data.loc[0, ['writing_progress_score', 'writing_progress_score_confidence_interval', 'maths_band', '%eal_students_school']].isna().all(), "validate_school_data() did not replace the suppressed measures by missing values."
+        assert list(invalid_school_data['validation_errors']) == ['%eal_students_school is not numeric'], "validate_school_data() did not find the invalid row."
+        assert mock_school_data.loc[0, 'writing_progress_score'] == 'SUPP', "validate_school_data() changed the data it was given."
+
+    def test_fetch_page_unexpected_error_releases_request(self, temp_data_directory_with_mock_user_agent_file, requests_mock):
+        """
+        Tests that 'fetch_page' releases a request from the concurrency 
+        controller when it raises an error other than a timeout, without
+        reporting it as overloaded.
+        """
+
+        # Arrange
+        import requests
+
+        dummy_url = 'http://dummy.com'
+        requests_mock.get(dummy_url, exc=requests.exceptions.ChunkedEncodingError("Connection broken."))
+
+        # Act
+        with patch.dict(os.environ, {DataAcquisition.ADAPTIVE_CONCURRENCY_ENVIRONMENT_VARIABLE: '8'}), patch('DataAcquisition._concurrency_controller', None):
+            with pytest.raises(requests.exceptions.ChunkedEncodingError):
+                DataAcquisition.fetch_page(dummy_url)
+
+            metrics = DataAcquisition.get_concurrency_controller().get_metrics()
+
+        # Assert
+        assert metrics['in_flight'] == 0, "fetch_page() did not release the request."
+        assert metrics['error_rate'] == 0, "fetch_page() reported an error other than a timeout as overloaded."
+
+    def test_fetch_page_hedge_cancels_request_waiting_for_headers(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that 'fetch_page' makes the original request of a hedged 
+        fetch from the calling thread, and that once the duplicate request
+        responds it returns without waiting for the original request, 
+        which is still waiting for its response headers.
+        """
+
+        # Arrange
+        import threading
+
+        latencies = iter([3.0])
+        server = start_http1_stand_in_server(get_latency=lambda: next(latencies, 0.0))
+        hedging_policy = DataAcquisition.HedgingPolicy(percentile=95, budget=1.0, minimum_samples=1)
+        hedging_policy.record_latency(0.01)
+        request_threads = []
+        download_page = DataAcquisition.download_page
+
+        def recording_download_page(*arguments, **keyword_arguments):
+            request_threads.append(threading.current_thread())
+            return download_page(*arguments, **keyword_arguments)
+
+        # Act
+        try:
+            with patch.dict(os.environ, {DataAcquisition.HEDGE_PERCENTILE_ENVIRONMENT_VARIABLE: '95', DataAcquisition.ARCHIVE_ENVIRONMENT_VARIABLE: '0'}), patch('DataAcquisition._hedging_policy', hedging_policy), patch('DataAcquisition.download_page', side_effect=recording_download_page):
+                start_time = time.monotonic()
+                content = DataAcquisition.fetch_page(f"{server.url}/school")
+                elapsed_time = time.monotonic() - start_time
+        finally:
+            server.shutdown()
+
+        # Assert
+        assert content == MOCK_PAGE, "fetch_page() did not return the response of the duplicate request."
+        assert elapsed_time < 1, "fetch_page() waited for the request that was still waiting for its headers."
+        assert request_threads[0] is threading.current_thread(), "fetch_page() did not make the original request from the calling thread."
+        assert len(request_threads) == 2 and request_threads[1] is not threading.current_thread(), "fetch_page() did not make the duplicate request from the thread pool."
+
+    def test_read_archive_record_truncated_record_only_for_same_target(self, temp_data_directory_with_mock_user_agent_file):
+        """
+        Tests that a page whose download was stopped after its target 
+        element is archived as truncated, and is only read back from the 
+        archive for the same target element.
+        """
+
+        # Arrange
+        body = b'<html><body><table id="England"><tr><td>1</td></tr></table>' + b'<p>Rest of the page</p>' * 5000 + b'</body></html>'
+        server = start_http1_stand_in_server(body=body)
+        url = f"{server.url}/constituency"
+
+        # Act
+        try:
+            content = DataAcquisition.fetch_page(url, target_element=('table', 'England'))
+        finally:
+            server.shutdown()
+
+        with patch.dict(os.environ, {DataAcquisition.OFFLINE_ENVIRONMENT_VARIABLE: '1'}):
+            archived_content = DataAcquisition.get_page_content(url, target_element=('table', 'England'))
+
+            with pytest.raises(DataAcquisition.ArchiveMissError):
+                DataAcquisition.get_page_content(url)
+
+            with pytest.raises(DataAcquisition.ArchiveMissError):
+                DataAcquisition.get_page_content(url, target_element=('div', 'establishment-list-view'))
+
+        # Assert
+        assert len(content) < len(body), "fetch_page() did not stop the download after the target element."
+        assert archived_content == content, "get_page_content() did not read the truncated record for the same target element."